@@ -0,0 +1,126 @@
+"""
+Command line interface for casskit.
+
+Manage the on-disk data cache:
+
+    casskit cache ls
+    casskit cache verify [--offline]
+    casskit cache prune [--older-than DAYS] [--dry-run] [--offline]
+
+Entries whose source has a different ETag than when they were cached are
+reported as stale, unless ``--offline``.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from .io.config import CACHE_DIR
+from .io.utils import (
+    cache_version,
+    file_checksum,
+    read_manifests,
+    remove_cache,
+    source_changed,
+)
+
+__author__ = "t-silvers"
+__copyright__ = "t-silvers"
+__license__ = "MIT"
+
+
+def parse_args(args: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="casskit", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache = commands.add_parser("cache", help="Manage the data cache")
+    cache.add_argument("--cache-dir", type=Path, default=CACHE_DIR,
+                       help=f"Cache directory (default: {CACHE_DIR})")
+    cache_commands = cache.add_subparsers(dest="cache_command", required=True)
+    cache_commands.add_parser("ls", help="List cache entries")
+    verify = cache_commands.add_parser(
+        "verify", help="Check cache entries against their checksums and sources")
+    prune = cache_commands.add_parser(
+        "prune", help="Remove entries that are missing, corrupt, stale, from "
+                      "another casskit release, or older than --older-than days")
+    prune.add_argument("--older-than", type=float, default=None, metavar="DAYS")
+    prune.add_argument("--dry-run", action="store_true")
+    for command in (verify, prune):
+        command.add_argument("--offline", action="store_true",
+                             help="Do not check sources for changes")
+
+    return parser.parse_args(args)
+
+def cache_ls(cache_dir: Path) -> int:
+    for path, manifest in read_manifests(cache_dir).items():
+        print(f"{manifest.get('size', 0) / 1e6:>10.1f} MB  "
+              f"{manifest.get('created', '?'):<19}  "
+              f"{manifest.get('version', '?'):<8}  "
+              f"{path.relative_to(cache_dir)}")
+
+    return 0
+
+def cache_verify(cache_dir: Path, offline: bool = False) -> int:
+    n_bad = 0
+    for path, manifest in read_manifests(cache_dir).items():
+        status = _entry_status(path, manifest, offline)
+        if status != "ok":
+            n_bad += 1
+            print(f"{status:<8}  {path.relative_to(cache_dir)}")
+
+    print(f"{n_bad} bad entries")
+    return int(n_bad > 0)
+
+def cache_prune(cache_dir: Path, older_than: float = None, dry_run: bool = False,
+                offline: bool = False) -> int:
+    version = cache_version()
+    for path, manifest in read_manifests(cache_dir).items():
+        status = _entry_status(path, manifest, offline)
+        if status == "ok" and manifest.get("version") != version:
+            status = "outdated"
+
+        if status == "ok" and older_than is not None:
+            age = time.time() - path.stat().st_mtime
+            status = "expired" if age > older_than * 24 * 60 * 60 else status
+
+        if status != "ok":
+            print(f"{'Would remove' if dry_run else 'Removing'} ({status}): "
+                  f"{path.relative_to(cache_dir)}")
+            if not dry_run:
+                remove_cache(path)
+
+    return 0
+
+def _entry_status(path: Path, manifest: dict, offline: bool = False) -> str:
+    if not path.exists():
+        return "missing"
+
+    if manifest.get("sha256") and file_checksum(path) != manifest["sha256"]:
+        return "corrupt"
+
+    if not offline and source_changed(path):
+        return "stale"
+
+    return "ok"
+
+def main(args: List[str]) -> int:
+    args = parse_args(args)
+    if args.command == "cache":
+        if args.cache_command == "ls":
+            return cache_ls(args.cache_dir)
+
+        elif args.cache_command == "verify":
+            return cache_verify(args.cache_dir, args.offline)
+
+        elif args.cache_command == "prune":
+            return cache_prune(args.cache_dir, args.older_than, args.dry_run,
+                               args.offline)
+
+def run():
+    """Entry point for console_scripts."""
+    sys.exit(main(sys.argv[1:]))
+
+if __name__ == "__main__":
+    run()
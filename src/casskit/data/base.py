@@ -1,9 +1,247 @@
 from abc import ABC
+from functools import cached_property
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
 
 class BaseOmic(ABC):
-    def __init__(self, data):
-        self.data = data
-        
+    """Omic data, backed by a pandas frame, a NumPy array or an Arrow table.
+
+    Matrices have explicit ``samples`` and ``features`` axes, and may be
+    stored either way round: ``sample_axis`` is the axis of the stored
+    data along which samples run, 0 for samples as rows, or 1 for samples
+    as columns, as in Xena tables. Reading them in the other orientation
+    (``to_numpy``, ``to_pandas``) and selecting contiguous samples or
+    features (``select``) are views of NumPy-backed data, and slices of
+    Arrow tables, rather than copies. Arrays may be memory-mapped, see
+    ``from_npy``.
+
+    Other tables, e.g. segments or mutations, have no axes
+    (``sample_axis=None``), and are kept as given.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame, numpy.ndarray or pyarrow.Table
+    samples, features : array-like, optional
+        Labels, by default from the frame, or positions.
+    sample_axis : {0, 1, None}
+    """
+    def __init__(self, data, samples=None, features=None, sample_axis: Optional[int] = 0):
+        self.values = data
+        self.sample_axis = sample_axis
+        if sample_axis is None:
+            return
+
+        if isinstance(data, pd.DataFrame):
+            rows, columns = data.index, data.columns
+        elif isinstance(data, pa.Table):
+            rows, columns = pd.RangeIndex(data.num_rows), pd.Index(data.column_names)
+        else:
+            rows, columns = map(pd.RangeIndex, data.shape)
+
+        if sample_axis == 1:
+            rows, columns = columns, rows
+        self.samples = rows if samples is None else pd.Index(samples)
+        self.features = columns if features is None else pd.Index(features)
+
+    @classmethod
+    def from_xena(cls, table, strip_version: bool = True):
+        """Omic from a Xena matrix: a feature ID column, then one column per sample.
+
+        The table is kept as stored, with samples as columns, so Arrow
+        tables are not copied.
+        """
+        if isinstance(table, pa.Table):
+            features = pd.Index(table.column(0).to_pandas())
+            values = table.drop_columns(table.column_names[:1])
+            samples = values.column_names
+        else:
+            features = pd.Index(table.iloc[:, 0])
+            values = table.iloc[:, 1:]
+            samples = values.columns
+
+        if strip_version:
+            features = features.str.split(".").str[0]
+
+        return cls(values, samples=samples, features=features, sample_axis=1)
+
+    @classmethod
+    def from_npy(cls, path, samples=None, features=None, sample_axis: int = 0):
+        """Omic backed by a memory-mapped ``.npy`` array, e.g. from ``numpy.save``."""
+        return cls(np.load(path, mmap_mode="r"), samples=samples,
+                   features=features, sample_axis=sample_axis)
+
+    @cached_property
+    def data(self) -> pd.DataFrame:
+        """Samples by features frame, or the table itself if it has no axes.
+
+        Built on first access and kept, as it copies Arrow-backed matrices;
+        see ``to_pandas`` for other orientations.
+        """
+        if self.sample_axis is None:
+            if isinstance(self.values, pa.Table):
+                return self.values.to_pandas()
+            return self.values
+
+        return self.to_pandas()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Number of samples and of features."""
+        return len(self.samples), len(self.features)
+
+    def to_numpy(self, sample_axis: int = 0) -> np.ndarray:
+        """Values with samples along ``sample_axis``.
+
+        A view of NumPy-backed data, or of single-dtype frames; Arrow tables
+        are copied once, chunk by chunk, into a column-major array.
+        """
+        self._check_axes()
+        if isinstance(self.values, pa.Table):
+            values = _arrow_to_numpy(self.values)
+        else:
+            values = np.asarray(self.values)
+
+        return values if sample_axis == self.sample_axis else values.T
+
+    def to_pandas(self, sample_axis: int = 0) -> pd.DataFrame:
+        """Frame with samples along ``sample_axis``.
+
+        Zero-copy for NumPy-backed data, and for Arrow tables read as
+        stored, whose columns are then Arrow-backed.
+        """
+        self._check_axes()
+        rows, columns = self.samples, self.features
+        if sample_axis == 1:
+            rows, columns = columns, rows
+
+        if isinstance(self.values, pa.Table) and sample_axis == self.sample_axis:
+            frame = self.values.to_pandas(types_mapper=pd.ArrowDtype)
+            frame.index, frame.columns = rows, columns
+            return frame
+
+        return pd.DataFrame(self.to_numpy(sample_axis), index=rows,
+                            columns=columns, copy=False)
+
+    def select(self, samples=None, features=None):
+        """Omic restricted to ``samples`` and ``features`` labels, in order.
+
+        Contiguous selections are views or slices of the stored data.
+        """
+        self._check_axes()
+        values = self.values
+        labels = {"samples": self.samples, "features": self.features}
+        for name, selection in [("samples", samples), ("features", features)]:
+            if selection is None:
+                continue
+
+            positions = labels[name].get_indexer(selection)
+            if (positions < 0).any():
+                raise KeyError(f"{np.count_nonzero(positions < 0)} {name} not found")
+
+            axis = self.sample_axis if name == "samples" else 1 - self.sample_axis
+            values = _take(values, _as_slice(positions), axis)
+            labels[name] = labels[name][positions]
+
+        return type(self)(values, sample_axis=self.sample_axis, **labels)
+
+    def _check_axes(self):
+        if self.sample_axis is None:
+            raise ValueError(f"{type(self).__name__} has no sample and feature axes")
+
+
 class BaseMultiOmic(ABC):
-    pass
\ No newline at end of file
+    """Omics loaded lazily, once each, and aligned to shared samples.
+
+    Each omic is loaded on first access, with ``ds[omic]``, and memoized.
+    If ``omics`` is given, every omic is restricted to the samples shared
+    by those omics, which are found from their sample IDs alone before any
+    values are loaded. Subclasses implement ``omic_samples`` and
+    ``load_omic``.
+    """
+    def __init__(self, omics: Optional[Sequence[str]] = None):
+        self.omics = omics
+        self._loaded = {}
+
+    def __getitem__(self, omic: str) -> BaseOmic:
+        if omic not in self._loaded:
+            self._loaded[omic] = self.load_omic(omic, samples=self.samples)
+
+        return self._loaded[omic]
+
+    @property
+    def samples(self) -> Optional[pd.Index]:
+        """Samples shared by ``omics``, in the order of the first."""
+        if self.omics is None:
+            return None
+
+        if not hasattr(self, "_samples"):
+            samples = None
+            for omic in self.omics:
+                omic_samples = pd.Index(self.omic_samples(omic)).unique()
+                samples = (omic_samples if samples is None
+                           else samples[samples.isin(omic_samples)])
+            self._samples = samples
+
+        return self._samples
+
+    def omic_samples(self, omic: str) -> pd.Index:
+        """Sample IDs of an omic, without loading its values."""
+        raise NotImplementedError
+
+    def load_omic(self, omic: str, samples: Optional[pd.Index] = None) -> BaseOmic:
+        """Load an omic, restricted to ``samples`` if given."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Forget loaded omics, shared samples and anything cached from them."""
+        self._loaded.clear()
+        self.__dict__.pop("_samples", None)
+        for cls in type(self).__mro__:
+            for name, attr in vars(cls).items():
+                if isinstance(attr, cached_property):
+                    self.__dict__.pop(name, None)
+
+
+def _as_slice(positions: np.ndarray):
+    """Positions as a slice, if they are contiguous and increasing."""
+    if positions.size and positions[-1] - positions[0] == positions.size - 1 \
+            and (np.diff(positions) > 0).all():
+        return slice(positions[0], positions[-1] + 1)
+
+    return positions
+
+def _arrow_to_numpy(table: pa.Table) -> np.ndarray:
+    """Columns of an Arrow table as a 2D Fortran-ordered array, copied once."""
+    types = [field.type.to_pandas_dtype() for field in table.schema]
+    dtype = np.result_type(*types) if types else np.dtype(np.float64)
+    if any(column.null_count for column in table.itercolumns()):
+        dtype = np.result_type(dtype, np.float64)
+
+    out = np.empty((table.num_rows, table.num_columns), dtype=dtype, order="F")
+    for j, column in enumerate(table.itercolumns()):
+        offset = 0
+        for chunk in column.chunks:
+            out[offset:offset+len(chunk), j] = chunk.to_numpy(zero_copy_only=False)
+            offset += len(chunk)
+
+    return out
+
+def _take(values, positions, axis: int):
+    """Positions (or a slice) along an axis of a frame, array or Arrow table."""
+    if isinstance(values, pa.Table):
+        if axis == 1:
+            if isinstance(positions, slice):
+                positions = range(positions.start, positions.stop)
+            return values.select(np.asarray(positions).tolist())
+        if isinstance(positions, slice):
+            return values.slice(positions.start, positions.stop - positions.start)
+        return values.take(positions)
+
+    if isinstance(values, pd.DataFrame):
+        return values.iloc[:, positions] if axis else values.iloc[positions]
+
+    return values[:, positions] if axis else values[positions]
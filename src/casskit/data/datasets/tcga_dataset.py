@@ -1,4 +1,11 @@
-from ..io import get_tcga
+from functools import cached_property
+
+from ...io import (
+    CommonRegionMatrix,
+    get_tcga,
+    get_tcga_samples,
+    get_tcga_segment_index,
+)
 from ..omic import (
     CopyNumberVariation,
     MessengerRNA,
@@ -8,37 +15,59 @@ from ..multiomic import BaseMultiOmic
 
 
 class TCGADataSet(BaseMultiOmic):
-    """Light preprocessing."""
-    def __init__(self, cancer):
+    """Light preprocessing.
+
+    Omics are loaded from the local cache on first access and memoized.
+    Pass ``omics`` (keys of ``TCGA_OMICS``) to align every omic to the
+    samples they share, e.g. ``TCGADataSet(cancer, ["htseq_counts", "cnv"])``.
+    """
+    def __init__(self, cancer, omics=None):
+        super().__init__(omics)
         self.cancer = cancer
 
+    def omic_samples(self, omic):
+        return get_tcga_samples(self.cancer, TCGA_OMICS[omic][0])
+
+    def load_omic(self, omic, samples=None):
+        data_name, prepare = TCGA_OMICS[omic]
+        if samples is not None:
+            samples = samples.tolist()
+
+        return prepare(get_tcga(data_name, self.cancer, samples=samples, arrow=True))
+
     ######################
     ## COPY NUMBER DATA ##
     ######################
 
     @property
     def cnv_data(self):
-        prepared_cnv = prepare_cnv(
-            get_tcga("cnv", self.cancer)
-        )
-        cnv_data = CopyNumberVariation(prepared_cnv)
-        return cnv_data
+        return self["cnv"]
 
     @property
     def gistic_data(self):
-        prepared_gistic = prepare_gistic(
-            get_tcga("gistic", self.cancer)
-        )
-        gistic_data = CopyNumberVariation(prepared_gistic)
-        return gistic_data
+        return self["gistic"]
 
     @property
     def masked_cnv_data(self):
-        prepared_masked_cnv = prepare_masked_cnv(
-            get_tcga("masked_cnv", self.cancer)
-        )
-        masked_cnv_data = CopyNumberVariation(prepared_masked_cnv)
-        return masked_cnv_data
+        return self["masked_cnv"]
+
+    @cached_property
+    def cnv_index(self):
+        """Interval index for point queries of cnv segment values."""
+        return get_tcga_segment_index(self.cancer, "cnv")
+
+    @cached_property
+    def masked_cnv_index(self):
+        return get_tcga_segment_index(self.cancer, "masked_cnv")
+
+    @cached_property
+    def cnv_regions(self):
+        """cnv over minimal common regions, stored as runs of segments."""
+        return CommonRegionMatrix.from_segments(self.cnv_data.data)
+
+    @cached_property
+    def masked_cnv_regions(self):
+        return CommonRegionMatrix.from_segments(self.masked_cnv_data.data)
 
     #####################
     ## EXPRESSION DATA ##
@@ -46,19 +75,11 @@ class TCGADataSet(BaseMultiOmic):
 
     @property
     def htseq_counts_data(self):
-        prepared_htseq_counts = prepare_htseq_counts(
-            get_tcga("htseq_counts", self.cancer)
-        )
-        htseq_counts_data = MessengerRNA(prepared_htseq_counts)
-        return htseq_counts_data
+        return self["htseq_counts"]
 
     @property
     def htseq_fpkm_uq_data(self):
-        prepared_htseq_fpkm_uq = prepare_htseq_fpkm_uq(
-            get_tcga("htseq_fpkm-uq", self.cancer)
-        )
-        htseq_fpkm_uq_data = MessengerRNA(prepared_htseq_fpkm_uq)
-        return htseq_fpkm_uq_data
+        return self["htseq_fpkm_uq"]
 
     ###################
     ## MUTATION DATA ##
@@ -66,82 +87,79 @@ class TCGADataSet(BaseMultiOmic):
 
     @property
     def muse_snv_data(self):
-        prepared_muse_snv = prepare_muse_snv(
-            get_tcga("muse_snv", self.cancer)
-        )
-        prepared_muse_snv_data = SomaticMutation(prepared_muse_snv)
-        return prepared_muse_snv_data
+        return self["muse_snv"]
 
     @property
     def mutect2_snv_data(self):
-        prepared_mutect2_snv = prepare_mutect2_snv(
-            get_tcga("mutect2_snv", self.cancer)
-        )
-        prepared_mutect2_snv_data = SomaticMutation(prepared_mutect2_snv)
-        return prepared_mutect2_snv_data
+        return self["mutect2_snv"]
 
     @property
     def somaticsniper_snv_data(self):
-        prepared_somaticsniper_snv = prepare_somaticsniper_snv(
-            get_tcga("somaticsniper_snv", self.cancer)
-        )
-        prepared_somaticsniper_snv_data = SomaticMutation(prepared_somaticsniper_snv)
-        return prepared_somaticsniper_snv_data
+        return self["somaticsniper_snv"]
 
 ###################
 ## MUTATION DATA ##
 ###################
 
+# Matrices keep the Arrow table read from the cache, samples as columns;
+# segment and mutation tables are converted to pandas.
+
 def prepare_muse_snv(raw_muse_snv_data):
-    return raw_muse_snv_data
+    return SomaticMutation(raw_muse_snv_data.to_pandas(), sample_axis=None)
 
 def prepare_mutect2_snv(raw_mutect2_snv_data):
-    mutect2_snv_data = (raw_mutect2_snv_data
+    mutect2_snv_data = (raw_mutect2_snv_data.to_pandas()
                         .rename(columns=dict(Sample_ID="sample_id",
                                              gene="gene_name",
                                              chrom="Chromosome",
                                              start="Start",
                                              end="End"))
                         .drop(["ref", "alt", "Amino_Acid_Change"], axis=1))
-    return mutect2_snv_data
+    return SomaticMutation(mutect2_snv_data, sample_axis=None)
 
 def prepare_somaticsniper_snv(raw_somaticsniper_snv_data):
-    return raw_somaticsniper_snv_data
+    return SomaticMutation(raw_somaticsniper_snv_data.to_pandas(), sample_axis=None)
 
 ######################
 ## COPY NUMBER DATA ##
 ######################
 
 def prepare_cnv(raw_cnv_data):
-    cnv_data = (raw_cnv_data
+    cnv_data = (raw_cnv_data.to_pandas()
                 .rename(columns=dict(Chrom="Chromosome",
                                      sample="sample_id")))
     cnv_data["Chromosome"] = cnv_data["Chromosome"].apply(lambda x: "chr" + str(x))
-    return cnv_data
+    return CopyNumberVariation(cnv_data, sample_axis=None)
 
 def prepare_gistic(raw_gistic_data):
     # TODO: Fails with pancancer data
-    gistic_data = raw_gistic_data.set_index("Gene Symbol").transpose()
-    gistic_data.columns = map(lambda x: x.split(".")[0], gistic_data.columns)
-    return gistic_data
+    return CopyNumberVariation.from_xena(raw_gistic_data)
 
 def prepare_masked_cnv(raw_masked_cnv_data):
-    masked_cnv_data = (raw_masked_cnv_data
+    masked_cnv_data = (raw_masked_cnv_data.to_pandas()
                        .rename(columns=dict(Chrom="Chromosome",
                                             sample="sample_id")))
     masked_cnv_data["Chromosome"] = masked_cnv_data["Chromosome"].apply(lambda x: "chr" + str(x))
-    return masked_cnv_data
+    return CopyNumberVariation(masked_cnv_data, sample_axis=None)
 
 #####################
 ## EXPRESSION DATA ##
 #####################
 
 def prepare_htseq_counts(raw_htseq_counts):
-    htseq_counts = raw_htseq_counts.set_index("Ensembl_ID").transpose()
-    htseq_counts.columns = map(lambda x: x.split(".")[0], htseq_counts.columns)
-    return htseq_counts
+    return MessengerRNA.from_xena(raw_htseq_counts)
 
 def prepare_htseq_fpkm_uq(raw_htseq_fpkm_uq):
-    htseq_fpkm_uq = raw_htseq_fpkm_uq.set_index("Ensembl_ID").transpose()
-    htseq_fpkm_uq.columns = map(lambda x: x.split(".")[0], htseq_fpkm_uq.columns)
-    return htseq_fpkm_uq
+    return MessengerRNA.from_xena(raw_htseq_fpkm_uq)
+
+# Omic name: (TCGA data name, preparation)
+TCGA_OMICS = {
+    "cnv": ("cnv", prepare_cnv),
+    "gistic": ("gistic", prepare_gistic),
+    "masked_cnv": ("masked_cnv", prepare_masked_cnv),
+    "htseq_counts": ("htseq_counts", prepare_htseq_counts),
+    "htseq_fpkm_uq": ("htseq_fpkm-uq", prepare_htseq_fpkm_uq),
+    "muse_snv": ("muse_snv", prepare_muse_snv),
+    "mutect2_snv": ("mutect2_snv", prepare_mutect2_snv),
+    "somaticsniper_snv": ("somaticsniper_snv", prepare_somaticsniper_snv),
+}
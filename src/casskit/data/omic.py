@@ -1,32 +1,14 @@
-import pandas as pd
-
 from .base import BaseOmic
 
 
 class CopyNumberVariation(BaseOmic):
-    def __init__(
-        self,
-        data: pd.DataFrame,
-    ):
-        super().__init__(data)
+    """Copy-number, as segments or as samples by genes."""
 
 class MessengerRNA(BaseOmic):
-    def __init__(
-        self,
-        data: pd.DataFrame,
-    ):
-        super().__init__(data)
+    """Expression, samples by genes."""
 
 class Protein(BaseOmic):
-    def __init__(
-        self,
-        data: pd.DataFrame,
-    ):
-        super().__init__(data)
+    """Protein abundance, samples by proteins."""
 
 class SomaticMutation(BaseOmic):
-    def __init__(
-        self,
-        data: pd.DataFrame,
-    ):
-        super().__init__(data)
+    """Somatic mutation calls."""
@@ -1,11 +1,11 @@
 from abc import ABC, abstractclassmethod
 from typing import Dict, List
 
-import dask.dataframe as dd
 import numpy as np
 import pandas as pd
 
 from ..utils import simulate_ids
+from ....io import SegmentIndex
 
 
 class GRNBuilder(ABC):
@@ -57,38 +57,24 @@ class cneQTLGRNBuilder(GRNBuilder):
         self.eqtls = cneqtls
 
     def simulate_eqtl_design(self, *args, **kwargs):
-        # Required for dask pivoting
-        data = self.data.copy()
-        eqtls = self.eqtls.copy()
-        data["sample_id"] = data["sample_id"].astype("category")
-        eqtls["gene_id__eqtl__Chromosome__Position"] = \
-            (eqtls["gene_id"] + "__" 
-             + eqtls["eqtl"] + "__" 
-             + eqtls["Chromosome"] + "__" 
-             + eqtls["Start_cneqtl"].astype(str)
-             ).astype("category")
-
-        # Convert to dask
-        cneqtls_dd = dd.from_pandas(eqtls, npartitions=4)
-        copynumber_dd = dd.from_pandas(data, npartitions=4)
-        cneqtl_design_dd = dd.merge(cneqtls_dd, copynumber_dd, on="Chromosome")
-        cneqtl_design_dd = (cneqtl_design_dd
-                        .query("Start_cneqtl >= Start & Start_cneqtl <= End")
-                        .pivot_table(index="gene_id__eqtl__Chromosome__Position",
-                                    columns="sample_id",
-                                    values="value"))
-        cneqtl_design = cneqtl_design_dd.compute()
-
-        # Fix index from dask constraints
-        predask_idx = cneqtl_design.index.str.split("__", expand=True)
-        predask_idx.names = ["gene_id", "eqtl", "Chromosome", "Position"]
-        
-        # Restore dtypes for numeric
-        position_idx = predask_idx.levels[3].astype(int)
-        predask_idx = predask_idx.set_levels(position_idx, level="Position")
-        
-        # Set index
-        cneqtl_design = cneqtl_design.set_index(predask_idx)
+        # Look up every sample's segment value at each cneQTL position
+        index = SegmentIndex.from_segments(self.data)
+        cneqtl_design = []
+        for chrom, eqtls in self.eqtls.groupby("Chromosome", sort=False):
+            design = index.values_at(chrom, eqtls["Start_cneqtl"])
+            design.index = pd.MultiIndex.from_arrays(
+                [eqtls["gene_id"], eqtls["eqtl"], eqtls["Chromosome"],
+                 eqtls["Start_cneqtl"].astype(int)],
+                names=["gene_id", "eqtl", "Chromosome", "Position"]
+            )
+            cneqtl_design.append(design)
+
+        # Match pivot_table: average duplicates, drop loci and samples without values
+        cneqtl_design = (pd.concat(cneqtl_design)
+                         .astype(float)
+                         .groupby(level=[0, 1, 2, 3]).mean()
+                         .dropna(how="all")
+                         .dropna(axis=1, how="all"))
         self.design = cneqtl_design
 
 class muteQTLGRNBuilder(GRNBuilder):
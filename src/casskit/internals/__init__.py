@@ -1,3 +1,5 @@
+import atexit
+
 from .cache import CassKitCacheManager
 from .logger import CassKitLogManager
 
@@ -6,6 +8,7 @@ from .logger import CassKitLogManager
 _cache_manager = CassKitCacheManager()
 _logger_manager = CassKitLogManager()
 _logger = _logger_manager.get_logger()
+atexit.register(_cache_manager.flush)
 
 
 def set_cache_dir(new_dir):
@@ -20,6 +23,19 @@ def clear_cache():
 def cache_size():
     return _cache_manager.cache_size()
 
+def set_max_cache_size(max_bytes, policy="lru"):
+    """Bound the cache, evicting least recently/frequently used files.
+
+    Reads and writes of ``casskit.io`` caches under the cache directory
+    update the index that eviction is driven by.
+    """
+    from ..io.utils import CACHE_CALLBACKS
+
+    _cache_manager.set_max_bytes(max_bytes, policy)
+    if _cache_manager.on_cache_event not in CACHE_CALLBACKS:
+        CACHE_CALLBACKS.append(_cache_manager.on_cache_event)
+    _cache_manager.evict()
+
 def set_log_dir(new_dir):
     _logger_manager.set_log_dir(new_dir)
 
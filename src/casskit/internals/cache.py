@@ -1,6 +1,12 @@
+from contextlib import contextmanager
 import os
 from pathlib import Path
-import shutil
+import sqlite3
+import threading
+import time
+
+from ..io.config import CACHE_DIR
+from ..io.utils import cache_files, manifest_path, read_manifests, remove_cache
 
 try:
     from pypath.share import settings
@@ -10,20 +16,47 @@ except ImportError:
 
 
 class CassKitCacheManager:
-    def __init__(self, cache_dir=None):
-        if cache_dir is not None:
-            self.cache_dir = Path(cache_dir)
-        else:
-            self.cache_dir = Path(os.getenv('PKG_CACHE', Path.home() / '.demo_pkg_casche'))
+    """Manage the cache directory, optionally within a size budget.
 
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    The cache directory defaults to ``casskit.io.config.CACHE_DIR``, where
+    the loaders write. It may be shared with other applications, so only
+    casskit caches, i.e. files with a manifest (see
+    ``casskit.io.utils.write_manifest``), are tracked, evicted or cleared.
+
+    Cached files are tracked in an on-disk index of their size, last access
+    time and number of hits, created on first use. Files are sized and
+    evicted together with their checksum, manifest and derived files, such
+    as the segment index (see ``casskit.io.utils.cache_files``). When
+    ``max_bytes`` is set, registering a file that takes the cache over
+    budget evicts the least recently (``"lru"``) or least frequently
+    (``"lfu"``) used files first.
+
+    Accesses are recorded in memory and written to the index in batches, at
+    most every ``TOUCH_INTERVAL`` seconds and before evicting, so that reads
+    served from memory do not each write to disk.
+    """
+    INDEX_NAME = ".casskit_index.sqlite"
+    TOUCH_INTERVAL = 30.0
+    POLICIES = {
+        "lru": "last_access ASC",
+        "lfu": "hits ASC, last_access ASC",
+    }
+
+    def __init__(self, cache_dir=None, max_bytes=None, policy="lru"):
+        self.cache_dir = Path(CACHE_DIR if cache_dir is None else cache_dir)
+        self.set_max_bytes(max_bytes, policy)
+        self._index_ready = False
+        self._touched = {}
+        self._flushed = time.time()
+        self._touch_lock = threading.Lock()
 
     def get_cache_dir(self):
         return str(self.cache_dir)
 
     def set_cache_dir(self, new_dir):
+        self.flush()
         self.cache_dir = Path(new_dir)
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index_ready = False
 
         # If using pypath, match its cache directory
         # TODO: This should only be implemented if the use is using pypath via cass-kit.
@@ -32,9 +65,188 @@ class CassKitCacheManager:
             settings.setup(cachedir=Path(new_dir) / 'pypath',
                         pickle_dir=Path(new_dir) / 'pypath' / 'pickles')
 
+    def set_max_bytes(self, max_bytes=None, policy="lru"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Expected policy to be one of {set(self.POLICIES)!r}")
+
+        self.max_bytes = max_bytes
+        self.policy = policy
+
     def clear_cache(self):
-        shutil.rmtree(self.cache_dir)
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        """Remove all casskit caches, leaving other files in the directory."""
+        with self._touch_lock:
+            self._touched = {}
+
+        for path in read_manifests(self.cache_dir):
+            remove_cache(path)
+
+        if self.index_path.exists():
+            self.index_path.unlink()
+        self._index_ready = False
 
     def cache_size(self):
-        return sum(f.stat().st_size for f in self.cache_dir.glob('**/*') if f.is_file())
\ No newline at end of file
+        """Total size of tracked files, read from the index."""
+        with self._connect() as con:
+            return con.execute("SELECT total FROM size").fetchone()[0]
+
+    @property
+    def index_path(self):
+        return self.cache_dir / self.INDEX_NAME
+
+    def register(self, path):
+        """Track a new or rewritten cache file, then evict to fit the budget."""
+        path = Path(path)
+        if not self._tracks(path):
+            return
+
+        with self._connect() as con:
+            self._insert(con, path)
+
+        self.evict(protect=path)
+
+    def touch(self, path):
+        """Record an access to a cache file, to be written by ``flush``."""
+        path = Path(path)
+        if not self._tracks(path):
+            return
+
+        key, now = self._key(path), time.time()
+        with self._touch_lock:
+            __, hits = self._touched.get(key, (None, 0))
+            self._touched[key] = (now, hits + 1)
+            due = now - self._flushed >= self.TOUCH_INTERVAL
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write recorded accesses to the index.
+
+        Files accessed but not yet indexed, e.g. written by another process,
+        are registered.
+        """
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed = time.time()
+
+        if not touched:
+            return
+
+        missing = []
+        with self._connect() as con:
+            for key, (last_access, hits) in touched.items():
+                updated = con.execute(
+                    "UPDATE files SET last_access = ?, hits = hits + ? "
+                    "WHERE path = ?", (last_access, hits, key)
+                ).rowcount
+                if updated == 0:
+                    missing.append(self.cache_dir / key)
+
+        for path in missing:
+            if path.exists():
+                self.register(path)
+
+    def evict(self, max_bytes=None, protect=None):
+        """Remove files, coldest first, until the cache fits in ``max_bytes``.
+
+        Files being written (with a ``.lock`` next to them) and ``protect``
+        are kept. Returns the paths removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return []
+
+        self.flush()
+
+        protect = None if protect is None else self._key(Path(protect))
+        evicted = []
+        with self._connect() as con:
+            total = con.execute("SELECT total FROM size").fetchone()[0]
+            candidates = con.execute(
+                f"SELECT path FROM files ORDER BY {self.POLICIES[self.policy]}"
+            ).fetchall()
+            for (key, ) in candidates:
+                if total <= max_bytes:
+                    break
+
+                path = self.cache_dir / key
+                if key == protect or path.with_name(path.name + ".lock").exists():
+                    continue
+
+                total -= self._forget(con, key)
+                remove_cache(path)
+                evicted.append(path)
+
+        return evicted
+
+    def reindex(self):
+        """Rebuild the index from a walk of the cache directory."""
+        with self._connect() as con:
+            con.execute("DELETE FROM files")
+            con.execute("UPDATE size SET total = 0")
+            for f in read_manifests(self.cache_dir):
+                if f.is_file() and self._tracks(f):
+                    self._insert(con, f)
+
+    def on_cache_event(self, path, event):
+        """Callback for ``casskit.io`` cache reads and writes."""
+        if event == "write":
+            self.register(path)
+        elif event == "read":
+            self.touch(path)
+
+    def _tracks(self, path):
+        """Whether a file belongs in the index: a casskit cache with a manifest."""
+        try:
+            path.resolve().relative_to(self.cache_dir.resolve())
+        except ValueError:
+            return False
+
+        return manifest_path(path).exists()
+
+    def _key(self, path):
+        return Path(os.path.relpath(path.resolve(), self.cache_dir.resolve())).as_posix()
+
+    def _insert(self, con, path):
+        key = self._key(path)
+        size = sum(f.stat().st_size for f in cache_files(path))
+        self._forget(con, key)
+        con.execute("INSERT INTO files VALUES (?, ?, ?, 1)", (key, size, time.time()))
+        con.execute("UPDATE size SET total = total + ?", (size, ))
+
+    def _forget(self, con, key):
+        """Drop a file from the index, returning its tracked size."""
+        row = con.execute("SELECT size FROM files WHERE path = ?", (key, )).fetchone()
+        if row is None:
+            return 0
+
+        con.execute("DELETE FROM files WHERE path = ?", (key, ))
+        con.execute("UPDATE size SET total = total - ?", (row[0], ))
+        return row[0]
+
+    @contextmanager
+    def _connect(self):
+        if not self._index_ready:
+            self._init_index()
+
+        con = sqlite3.connect(self.index_path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _init_index(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        is_new = not self.index_path.exists()
+        self._index_ready = True
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS files ("
+                        "path TEXT PRIMARY KEY, size INTEGER, "
+                        "last_access REAL, hits INTEGER)")
+            con.execute("CREATE TABLE IF NOT EXISTS size (total INTEGER)")
+            if con.execute("SELECT COUNT(*) FROM size").fetchone()[0] == 0:
+                con.execute("INSERT INTO size VALUES (0)")
+
+        if is_new:
+            self.reindex()
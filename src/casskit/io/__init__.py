@@ -3,7 +3,20 @@ from pkgutil import extend_path
 from .annot import build_ensembl_cache, get_ensembl
 from .funcannot import build_funcannot_cache, get_funcannot
 from .pcawg import build_pcawg, get_pcawg, PCAWGDataSet
-from .tcga import build_tcga_cache, get_tcga
+from .segments import (
+    CommonRegionMatrix,
+    SegmentIndex,
+    aneuploidy_score,
+    segments_to_gene_matrix,
+    summarize_copynumber,
+)
+from .tcga import (
+    build_tcga_cache,
+    get_tcga,
+    get_tcga_samples,
+    get_tcga_segment_index,
+)
+from .utils import clear_memory_cache, set_memory_cache_size
 
 
 __all__ = [
@@ -13,8 +26,17 @@ __all__ = [
     "get_funcannot",
     "build_tcga_cache",
     "get_tcga",
+    "get_tcga_samples",
+    "get_tcga_segment_index",
+    "SegmentIndex",
+    "CommonRegionMatrix",
+    "segments_to_gene_matrix",
+    "summarize_copynumber",
+    "aneuploidy_score",
     "build_pcawg",
     "get_pcawg",
     "PCAWGDataSet",
+    "clear_memory_cache",
+    "set_memory_cache_size",
 ]
 __path__ = extend_path(__path__, __name__)
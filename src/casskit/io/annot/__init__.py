@@ -1,19 +1,23 @@
 from pkgutil import extend_path
 
 from .centromere import Centromere, annotate_chrom_arm
+from .cytoband import Cytoband
 from .ensembl import (
     get_ensembl_tss,
     build_ensembl_cache,
     get_ensembl,
+    get_ensembl_gene_ids,
     annotate_genes
 )
 
 __all__ = [
     "Centromere",
     "annotate_chrom_arm",
+    "Cytoband",
     "get_ensembl_tss",
     "build_ensembl_cache",
     "get_ensembl",
+    "get_ensembl_gene_ids",
     "annotate_genes",
 ]
 __path__ = extend_path(__path__, __name__)
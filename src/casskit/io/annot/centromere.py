@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 
 from ..base import DataURLMixin
@@ -9,6 +10,9 @@ from ..config import CACHE_DIR
 from ..utils import cache_on_disk
 
 
+ARMS = ["p", "cen", "q"]
+
+
 @dataclass
 class Centromere(DataURLMixin):
     UCSC_URLS = {
@@ -22,7 +26,10 @@ class Centromere(DataURLMixin):
     data: pd.DataFrame = field(init=False)
     
     def set_cache(self, cache_dir):        
-        self.path_cache = Path(cache_dir, f"centromeres_{self.assembly}.pkl")
+        self.path_cache = self.keyed_cache(
+            Path(cache_dir, f"centromeres_{self.assembly}.pkl"),
+            url=self.UCSC_URLS[self.assembly],
+        )
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
 
@@ -64,8 +71,31 @@ class Centromere(DataURLMixin):
         # Parse data
         self.data = self.fetch()
 
-def annotate_chrom_arm(data, assembly):
-    """Annotate chromosome arm."""
+def annotate_chrom_arm(data, assembly, split=False):
+    """Annotate chromosome arm.
+
+    Segments are labelled ``p`` or ``q`` by the arm they lie on, or ``cen``
+    if they lie within the centromere. Segments spanning the centromere are
+    labelled with both arms, one row each. Rows on chromosomes without a
+    centromere in ``assembly`` are dropped.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Segments with ``Chromosome``, ``Start`` and ``End`` columns.
+    assembly : str
+        Genome assembly of the centromere coordinates.
+    split : bool
+        If True, clip arm rows to their arm, so that a segment spanning the
+        centromere becomes a p piece ending at the centromere start and a q
+        piece starting at the centromere end. Otherwise, both rows keep the
+        coordinates of the whole segment.
+
+    Returns
+    -------
+    pd.DataFrame
+        ``data`` with a categorical ``arm`` column.
+    """
     # Input checks
     if not isinstance(data, pd.DataFrame):
         raise TypeError("data must be a pandas DataFrame")
@@ -80,23 +110,35 @@ def annotate_chrom_arm(data, assembly):
         raise ValueError("data must have a 'End' column")
     
     # Fetch centromere data
-    cen_data = (Centromere(assembly).data
-                # Downcast to save memory
-                .assign(Chromosome=lambda x: x.Chromosome.astype("category"),
-                        cen_start=lambda x: x.pop("Start").astype("float"),
-                        cen_end=lambda x: x.pop("End").astype("float")))
+    cen_data = Centromere(assembly).data.set_index("Chromosome")
     
-    # Add arm annotation
-    return (data
-            .merge(cen_data)
-            .assign(arm=lambda df:
-                df.apply(lambda x: \
-                    ["p"] if (x.Start <= x.cen_start) & (x.End < x.cen_end) else 
-                    ["q"] if (x.End >= x.cen_end) & (x.Start > x.cen_start) else
-                    ["cen"] if (x.Start > x.cen_start) & (x.End < x.cen_end) else
-                    # Spans both arms
-                    ["p", "q"], axis=1)
-            )
-            .explode("arm")
-            .assign(arm=lambda x: x.arm.astype("category"))
-            .drop(["cen_start", "cen_end"], axis=1))
\ No newline at end of file
+    # Look up each row's centromere, dropping chromosomes without one
+    cen_start = data["Chromosome"].map(cen_data["Start"]).to_numpy(dtype=float)
+    cen_end = data["Chromosome"].map(cen_data["End"]).to_numpy(dtype=float)
+    keep = ~np.isnan(cen_start)
+    data = data.loc[keep].reset_index(drop=True)
+    cen_start, cen_end = cen_start[keep], cen_end[keep]
+    start = data["Start"].to_numpy()
+    end = data["End"].to_numpy()
+
+    # Codes into ARMS; spanning segments get both arms, p first
+    on_p = (start <= cen_start) & (end < cen_end)
+    on_q = (end >= cen_end) & (start > cen_start)
+    on_cen = (start > cen_start) & (end < cen_end)
+    spans = ~(on_p | on_q | on_cen)
+    arm = np.select([on_p, on_q, on_cen], [0, 2, 1], default=0)
+
+    rows = np.repeat(np.arange(len(data)), np.where(spans, 2, 1))
+    codes = arm[rows]
+    codes[1:][rows[1:] == rows[:-1]] = 2
+
+    annotated = data.iloc[rows]
+    annotated = annotated.assign(arm=pd.Categorical.from_codes(codes, ARMS))
+    if split:
+        cen_start, cen_end = cen_start[rows], cen_end[rows]
+        annotated["Start"] = np.where(codes == 2, np.maximum(start[rows], cen_end),
+                                      start[rows]).astype(start.dtype)
+        annotated["End"] = np.where(codes == 0, np.minimum(end[rows], cen_start),
+                                    end[rows]).astype(end.dtype)
+
+    return annotated
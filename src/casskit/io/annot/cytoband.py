@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from ..base import DataURLMixin
+from ..config import CACHE_DIR
+from ..utils import cache_on_disk
+
+
+@dataclass
+class Cytoband(DataURLMixin):
+    """Cytogenetic bands from UCSC, as 1-based closed intervals."""
+    UCSC_URLS = {
+        "hg19": "http://hgdownload.cse.ucsc.edu/goldenPath/hg19/database/cytoBand.txt.gz",
+        "hg37": "http://hgdownload.cse.ucsc.edu/goldenPath/hg19/database/cytoBand.txt.gz",
+        "hg38": "http://hgdownload.soe.ucsc.edu/goldenPath/hg38/database/cytoBand.txt.gz",
+    }
+
+    assembly: str
+    cache_dir: Optional[Path] = None
+    data: pd.DataFrame = field(init=False)
+
+    def set_cache(self, cache_dir):
+        self.path_cache = self.keyed_cache(
+            Path(cache_dir, f"cytobands_{self.assembly}.pkl"),
+            url=self.UCSC_URLS[self.assembly],
+        )
+        self.read_cache = lambda cache: pd.read_pickle(cache)
+        self.write_cache = lambda data, cache: data.to_pickle(cache)
+
+    @cache_on_disk
+    def fetch(self):
+        url = self.UCSC_URLS[self.assembly]
+        print(url)
+        return (pd.read_csv(url, sep="\t", usecols=[0, 1, 2, 3],
+                            names=["Chromosome", "Start", "End", "band"],
+                            compression="gzip")
+                # UCSC intervals are 0-based, half-open
+                .assign(Start=lambda x: x["Start"] + 1,
+                        band=lambda x: x["Chromosome"] + x["band"].fillna(""))
+                .reset_index(drop=True))
+
+    def __post_init__(self):
+        if self.cache_dir is None:
+            self.cache_dir = CACHE_DIR
+
+        self.set_cache(self.cache_dir)
+
+        # Parse data
+        self.data = self.fetch()
@@ -1,6 +1,7 @@
+from dataclasses import dataclass, field
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import warnings
 
 import numpy as np
@@ -8,9 +9,10 @@ import pandas as pd
 import pyensembl
 import pyranges as pr
 
+from ..base import DataURLMixin
 from ..config import CACHE_DIR
 from ..descriptors import OneOf
-from ..utils import cache_on_disk
+from ..utils import cache_in_memory, cache_on_disk
 
 
 class EnsemblData:
@@ -75,9 +77,24 @@ class EnsemblData:
         return cls(assembly).cached_subset
 
     @classmethod
+    @cache_in_memory
     def to_df(cls, assembly: str = "GRCh37"):
         return cls(assembly).cached_subset.df
 
+    @classmethod
+    @cache_in_memory
+    def get_gene_ids(
+        cls,
+        assembly: str = "GRCh37",
+        biotypes: Tuple[str, ...] = ("protein_coding",),
+    ) -> pd.Index:
+        """Sorted IDs of genes of the given biotypes.
+
+        Cached on disk by ``EnsemblGeneIDs``, and in memory as a (frozen)
+        index.
+        """
+        return pd.Index(EnsemblGeneIDs(assembly, tuple(biotypes)).data["gene_id"])
+
     @classmethod
     def get_tss(cls, assembly: str = "GRCh37"):
         return cls(assembly).cached_tss
@@ -127,14 +144,60 @@ class EnsemblData:
                                      ).df
 
 
+@dataclass
+class EnsemblGeneIDs(DataURLMixin):
+    """Sorted IDs of Ensembl genes of the given biotypes.
+
+    The cache is keyed on the release, its GTF and the biotypes, and is
+    checked before the GTF is downloaded or parsed.
+    """
+    assembly: str = "GRCh37"
+    biotypes: Tuple[str, ...] = ("protein_coding",)
+    cache_dir: Optional[Path] = None
+    data: pd.DataFrame = field(init=False)
+
+    @property
+    def release(self) -> int:
+        return EnsemblData.PYENSEMBL_ASSEMBLIES[self.assembly]
+
+    def set_cache(self, cache_dir):
+        self.path_cache = self.keyed_cache(
+            Path(cache_dir, f"ensembl_{self.assembly}_{self.release}_gene_ids.parquet"),
+            url=pyensembl.EnsemblRelease(self.release).gtf_url,
+            release=self.release,
+            biotypes=self.biotypes,
+        )
+        self.read_cache = lambda cache: pd.read_parquet(cache)
+        self.write_cache = lambda data, cache: data.to_parquet(cache, engine="pyarrow")
+
+    @cache_on_disk
+    def fetch(self) -> pd.DataFrame:
+        genes = EnsemblData(self.assembly, self.cache_dir).cached_subset.df
+        return (genes.loc[genes["gene_biotype"].isin(self.biotypes), ["gene_id"]]
+                .astype(str)
+                .drop_duplicates()
+                .sort_values("gene_id", ignore_index=True))
+
+    def __post_init__(self):
+        if self.cache_dir is None:
+            self.cache_dir = CACHE_DIR
+
+        self.biotypes = tuple(sorted(set(self.biotypes)))
+        self.set_cache(self.cache_dir)
+        self.data = self.fetch()
+
+
 get_ensembl_tss = EnsemblData.get_tss
-""""""
+"""Shortcut for EnsemblData.get_tss"""
 
 build_ensembl_cache = EnsemblData.build_caches
-""""""
+"""Shortcut for EnsemblData.build_caches"""
 
 get_ensembl = EnsemblData.to_df
-""""""
+"""Shortcut for EnsemblData.to_df"""
+
+get_ensembl_gene_ids = EnsemblData.get_gene_ids
+"""Shortcut for EnsemblData.get_gene_ids"""
 
 annotate_genes = EnsemblData.annotate_df
-""""""
\ No newline at end of file
+"""Shortcut for EnsemblData.annotate_df"""
\ No newline at end of file
@@ -3,17 +3,21 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from contextlib import suppress
 from functools import wraps
-from typing import Callable
+from pathlib import Path
+from typing import Callable, Optional
 import urllib
 
 import pandas as pd
 
 from .config import HEADER
+from .utils import cache_key_path, cache_params
 
 
 class DataURLMixin(ABC):
     """Mixin for data loaders that fetch data from a URL."""
     header = HEADER
+    # Rebuild the cache when the URL's ETag changes, for "latest" URLs
+    check_source = False
     
     @abstractmethod
     def fetch(self) -> pd.DataFrame:
@@ -23,6 +27,16 @@ class DataURLMixin(ABC):
     def set_cache(self):
         pass
 
+    def keyed_cache(self, path: Path, url: Optional[str] = None, **params) -> Path:
+        """Key a cache path on loader parameters, source URL and version.
+
+        Stores the key parameters as ``self.cache_params``, which
+        ``cache_on_disk`` records in the cache manifest.
+        """
+        url = getattr(self, "url", None) if url is None else url
+        self.cache_params = cache_params(url, **params)
+        return cache_key_path(path, self.cache_params)
+
     def safe_fetch(f: Callable) -> Callable:
         @wraps(f)
         def wrapper(self, *args, **kwargs):
@@ -10,6 +10,18 @@ try:
 except KeyError:
     CACHE_DIR = DEFAULT_CACHE
 
+# Byte budget of the in-process cache in front of the disk cache
+try:
+    MEMORY_CACHE_BYTES = int(float(os.environ["CASSKIT_MEMORY_CACHE_BYTES"]))
+except KeyError:
+    MEMORY_CACHE_BYTES = 2 * 1024**3
+
+# Rows per chunk (and parquet row group) when streaming large downloads
+STREAM_CHUNKSIZE = 5_000
+
+# Seconds after which a cache lock left by another host is considered stale
+CACHE_LOCK_STALE = 6 * 60 * 60
+
 HEADER = {
     "User-Agent": ("Mozilla/5.0 (Macintosh;"
                    "Intel Mac OS X 10_14_6)"
@@ -41,6 +41,7 @@ class ElsevierLink(DataURLMixin):
         if cache_name is None:
             print(self)
 
-        self.path_cache = Path(cache_dir, f"{cache_name}.pkl")
+        self.path_cache = self.keyed_cache(Path(cache_dir, f"{cache_name}.pkl"),
+                                           skiprows=self.skiprows)
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
@@ -33,6 +33,7 @@ class BioGRID(DataURLMixin):
     cache_dir: Optional[Path] = field(init=True, default=CACHE_DIR)
     url: str = BIOGRID_URL
     organism: str = "Homo sapiens"
+    check_source = True
     
     @cache_on_disk
     def fetch(self) -> pd.DataFrame:
@@ -53,7 +54,8 @@ class BioGRID(DataURLMixin):
                 ]))
 
     def set_cache(self, cache_dir: Path) -> Path:
-        self.path_cache = Path(cache_dir, f"biogrid.pkl")
+        self.path_cache = self.keyed_cache(Path(cache_dir, "biogrid.pkl"),
+                                           organism=self.organism)
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
 
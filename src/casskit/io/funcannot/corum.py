@@ -37,7 +37,8 @@ class CORUM(DataURLMixin):
                 .explode(column='subunits_gene_name'))
 
     def set_cache(self, cache_dir: Path) -> Path:
-        self.path_cache = Path(cache_dir, "corum.pkl")
+        self.path_cache = self.keyed_cache(Path(cache_dir, "corum.pkl"),
+                                           organism=self.organism)
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
 
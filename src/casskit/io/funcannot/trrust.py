@@ -26,7 +26,7 @@ class TRRUST(DataURLMixin):
                 .pipe(column_janitor))
 
     def set_cache(self, cache_dir: Path) -> Path:
-        self.path_cache = Path(cache_dir, "trrust.pkl")
+        self.path_cache = self.keyed_cache(Path(cache_dir, "trrust.pkl"))
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
 
@@ -7,4 +7,11 @@ PCAWG_XENA_DATASETS = {
     "rnaseq": PCAWGData("tophat_star_fpkm_uq.v2_aliquot_gl.sp.log", "rnaseq"),
     "copynumber": PCAWGData("20170119_final_consensus_copynumber_sp", "copynumber"),
     "phenotype": PCAWGData("project_code_sp", "phenotype"),
-}
\ No newline at end of file
+}
+
+# Xena data types, which fix column types when streaming
+PCAWG_XENA_TYPES = {
+    "rnaseq": "genomicMatrix",
+    "copynumber": "genomicSegment",
+    "phenotype": "clinicalMatrix",
+}
@@ -9,11 +9,17 @@ from typing import Dict, Optional
 import numpy as np
 import pandas as pd
 
-from .pcawg_config import PCAWG_XENA_DATASETS, PCAWGData
+from .pcawg_config import PCAWG_XENA_DATASETS, PCAWG_XENA_TYPES, PCAWGData
 from ..base import DataURLMixin
-from ..config import CACHE_DIR
+from ..config import CACHE_DIR, STREAM_CHUNKSIZE
 from ..descriptors import OneOf
-from ..utils import cache_on_disk, check_package_version
+from ..utils import (
+    cache_on_disk,
+    check_package_version,
+    open_text_stream,
+    stream_to_parquet,
+    xena_stream_dtype,
+)
 
 
 class PCAWGXenaLoader(DataURLMixin):
@@ -23,11 +29,19 @@ class PCAWGXenaLoader(DataURLMixin):
         self,
         pcawg_data: PCAWGData,
         cache_dir: Optional[Path] = CACHE_DIR,
+        stream: bool = False,
+        chunksize: int = STREAM_CHUNKSIZE,
+        cache_only: bool = False,
     ):
         check_package_version("pyarrow")
         self.omic = pcawg_data.omic
         self.stem = pcawg_data.stem
         self.set_cache(cache_dir)
+
+        # Convert download to parquet in chunks of rows, bounding memory
+        self.stream = stream
+        self.chunksize = chunksize
+        self.cache_only = cache_only
         self.raw_data = self.fetch()
 
     @property
@@ -42,9 +56,22 @@ class PCAWGXenaLoader(DataURLMixin):
     def _fetch(self, url) -> pd.DataFrame:
         print("Fetching from, ", url)
         return pd.read_csv(url, sep="\t")
-    
+
+    def stream_cache(self, cache: Path) -> None:
+        """Stream the download into the parquet cache, chunk by chunk."""
+        data_type = PCAWG_XENA_TYPES.get(self.omic)
+
+        print("Streaming from, ", self.url)
+        with open_text_stream(self.url, None, self.header) as handle:
+            columns = handle.readline().rstrip("\n").split("\t")
+            stream_to_parquet(handle, cache, chunksize=self.chunksize,
+                              sep="\t", header=None, names=columns,
+                              dtype=xena_stream_dtype(columns, data_type))
+
     def set_cache(self, cache_dir: Path) -> Path:
-        self.path_cache = Path(cache_dir, f"PCAWG.{self.omic}.raw.parquet")
+        self.path_cache = self.keyed_cache(
+            Path(cache_dir, f"PCAWG.{self.omic}.raw.parquet")
+        )
         self.read_cache = lambda cache: pd.read_parquet(cache)
         self.write_cache = lambda data, cache: data.to_parquet(cache, engine="pyarrow")
 
@@ -56,11 +83,14 @@ class PCAWGXenaLoader(DataURLMixin):
     def build_cache(
         cls,
         cache_dir: Path = CACHE_DIR,
-        overwrite: bool = False
+        overwrite: bool = False,
+        stream: bool = True,
+        chunksize: int = STREAM_CHUNKSIZE,
     ) -> None:
         for pcawg_data in PCAWG_XENA_DATASETS.values():
             print(f"Building {pcawg_data}")
-            cls(pcawg_data, cache_dir).raw_data
+            cls(pcawg_data, cache_dir, stream=stream,
+                chunksize=chunksize, cache_only=True)
 
 get_pcawg = PCAWGXenaLoader.get
 """Shortcut for TCGAXenaLoader.build_cache"""
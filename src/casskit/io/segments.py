@@ -0,0 +1,787 @@
+# Author: Thomas R. Silvers <thomas.silvers.1@gmail.com>
+# License: MIT
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .annot.centromere import ARMS, annotate_chrom_arm
+from .annot.cytoband import Cytoband
+from .descriptors import OneOf
+from .utils import atomic_path, cache_lock, is_valid_cache, notify_cache
+
+
+__all__ = [
+    "CommonRegionMatrix",
+    "SegmentIndex",
+    "aneuploidy_score",
+    "segment_index_path",
+    "segments_to_gene_matrix",
+    "summarize_copynumber",
+]
+
+
+class SegmentIndex:
+    """Sorted interval index over copy-number segments.
+
+    Segments are sorted by chromosome, sample and start, and each chromosome
+    is searched with a single ``np.searchsorted`` over a combined
+    ``(sample, start)`` key. Lookups of any number of (sample, position)
+    pairs therefore take log time each and run as one vectorized call.
+
+    Segments of a sample are assumed not to overlap, as in segment tables
+    from Xena. Coordinates are inclusive at both ends. Chromosomes are named
+    with a ``chr`` prefix, which is added to queries that lack it.
+
+    Example
+    -------
+    >>> index = SegmentIndex.from_segments(cnv_data)
+    >>> index.values_at("chr8", [127735434, 128000000])
+    """
+    SHIFT = 32
+
+    def __init__(
+        self,
+        chromosomes: np.ndarray,
+        samples: np.ndarray,
+        offsets: np.ndarray,
+        keys: np.ndarray,
+        ends: np.ndarray,
+        values: np.ndarray,
+    ):
+        self.chromosomes = np.asarray(chromosomes, dtype=str)
+        self.samples = np.asarray(samples, dtype=str)
+        self.offsets = offsets
+        self.keys = keys
+        self.ends = ends
+        self.values = values
+
+        self._chrom_codes = {c: i for i, c in enumerate(self.chromosomes)}
+        self._sample_codes = pd.Index(self.samples)
+
+    @classmethod
+    def from_segments(
+        cls,
+        segments: pd.DataFrame,
+        chrom_col: str = "Chromosome",
+        start_col: str = "Start",
+        end_col: str = "End",
+        sample_col: str = "sample_id",
+        value_col: str = "value",
+    ) -> SegmentIndex:
+        """Build the index from a segment table."""
+        # Rename categories rather than rows, which are many more
+        chroms = pd.Categorical(segments[chrom_col])
+        chroms = chroms.rename_categories(_with_chr(pd.Series(chroms.categories)))
+        samples = pd.Categorical(segments[sample_col])
+        starts = segments[start_col].to_numpy(dtype=np.int64)
+        if starts.min(initial=0) < 0 or starts.max(initial=0) >= 1 << cls.SHIFT:
+            raise ValueError(f"Positions must be in [0, 2**{cls.SHIFT})")
+
+        keys = (samples.codes.astype(np.int64) << cls.SHIFT) | starts
+        order = np.lexsort((keys, chroms.codes))
+        chrom_codes = chroms.codes[order]
+        offsets = np.searchsorted(chrom_codes,
+                                  np.arange(len(chroms.categories) + 1))
+
+        return cls(
+            chromosomes=np.asarray(chroms.categories),
+            samples=np.asarray(samples.categories.astype(str)),
+            offsets=offsets,
+            keys=keys[order],
+            ends=segments[end_col].to_numpy(dtype=np.int64)[order],
+            values=segments[value_col].to_numpy(dtype=np.float32)[order],
+        )
+
+    def value_at(
+        self,
+        chromosome: str,
+        positions: Union[int, Iterable[int]],
+        samples: Union[str, Iterable[str]],
+    ) -> np.ndarray:
+        """Segment value of each sample at each position.
+
+        ``positions`` and ``samples`` are broadcast against each other, so
+        pass equal-length arrays for paired queries, or a column and a row
+        for every combination. NaN where no segment covers the position.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        samples = np.asarray(samples, dtype=str)
+        codes = self._sample_codes.get_indexer(samples.ravel()).reshape(samples.shape)
+
+        return self._lookup(chromosome, positions, codes)
+
+    def values_at(
+        self,
+        chromosome: str,
+        positions: Iterable[int],
+        samples: Optional[Iterable[str]] = None,
+        block_size: int = 1 << 22,
+    ) -> pd.DataFrame:
+        """Values of all (or the given) samples at positions on a chromosome.
+
+        Returns a positions x samples frame. Queries are run in blocks of
+        about ``block_size`` lookups to bound memory.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        samples = self.samples if samples is None else np.asarray(samples, dtype=str)
+        codes = self._sample_codes.get_indexer(samples)
+
+        # Increasing queries let searchsorted narrow each search from the last
+        out = np.empty((codes.size, positions.size), dtype=np.float32)
+        order = np.argsort(positions, kind="stable")
+        step = max(1, block_size // max(1, positions.size))
+        for i in range(0, codes.size, step):
+            out[i:i+step, order] = self._lookup(chromosome,
+                                                positions[None, order],
+                                                codes[i:i+step, None])
+        out = out.T
+
+        return pd.DataFrame(out, index=pd.Index(positions, name="Position"),
+                            columns=pd.Index(samples, name="sample_id"))
+
+    def _lookup(self, chromosome, positions, codes) -> np.ndarray:
+        positions, codes = np.broadcast_arrays(positions, codes)
+        out = np.full(positions.shape, np.nan, dtype=np.float32)
+        chrom = self._chrom_codes.get(_with_chr(pd.Series([chromosome]))[0])
+        if chrom is None:
+            return out
+
+        lo, hi = self.offsets[chrom], self.offsets[chrom + 1]
+        keys = self.keys[lo:hi]
+        query = (codes.astype(np.int64) << self.SHIFT) | positions
+        i = np.searchsorted(keys, query, side="right") - 1
+        i_ = np.clip(i, 0, None) + lo
+        hit = ((i >= 0) & (codes >= 0) & (i_ < hi)
+               & ((self.keys[i_] >> self.SHIFT) == codes)
+               & (positions <= self.ends[i_]))
+        out[hit] = self.values[i_[hit]]
+
+        return out
+
+    def _overlap(self, chromosome, codes, starts, ends, agg) -> np.ndarray:
+        """Aggregate segment values over intervals, for each sample code.
+
+        ``codes`` must be increasing. Returns a codes x intervals array.
+        """
+        out = np.full((codes.size, starts.size), np.nan, dtype=np.float32)
+        chrom = self._chrom_codes.get(_with_chr(pd.Series([chromosome]))[0])
+        if chrom is None:
+            return out
+
+        lo, hi = self.offsets[chrom], self.offsets[chrom + 1]
+        keys = self.keys[lo:hi]
+        seg_starts = keys & ((1 << self.SHIFT) - 1)
+        sample_ends = (keys >> self.SHIFT << self.SHIFT) | self.ends[lo:hi]
+        values = self.values[lo:hi]
+
+        # Segments of a sample are sorted and disjoint, so those overlapping
+        # an interval are a run: from the first ending at or after its start,
+        # to the last starting at or before its end
+        codes = codes.astype(np.int64)[:, None] << self.SHIFT
+        first = np.empty(out.shape, dtype=np.int64)
+        last = np.empty(out.shape, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+        first[:, order] = np.searchsorted(sample_ends, codes | starts[order],
+                                          side="left")
+        order = np.argsort(ends, kind="stable")
+        last[:, order] = np.searchsorted(keys, codes | ends[order], side="right")
+
+        # Walk the runs in step, dropping intervals once their run is done
+        count = (last - first).ravel()
+        first = first.ravel()
+        seg_ends = self.ends[lo:hi]
+        flat = out.reshape(-1)
+        total = np.zeros(flat.size, dtype=np.float64)
+        weight = np.zeros(flat.size, dtype=np.float64)
+        pairs, k = np.flatnonzero(count > 0), 0
+        while pairs.size:
+            i = first[pairs] + k
+            value = values[i]
+            hit = ~np.isnan(value)
+            p, i, value = pairs[hit], i[hit], value[hit]
+            if agg == "mean":
+                col = p % starts.size
+                overlap = (np.minimum(seg_ends[i], ends[col])
+                           - np.maximum(seg_starts[i], starts[col]) + 1)
+                total[p] += value * overlap
+                weight[p] += overlap
+            else:
+                reduce = np.fmin if agg == "min" else np.fmax
+                flat[p] = reduce(flat[p], value)
+
+            k += 1
+            pairs = pairs[count[pairs] > k]
+
+        if agg == "mean":
+            np.divide(total, weight, out=flat, where=weight > 0,
+                      casting="same_kind")
+
+        return out
+
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, chromosomes=self.chromosomes, samples=self.samples,
+                     offsets=self.offsets, keys=self.keys, ends=self.ends,
+                     values=self.values)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> SegmentIndex:
+        with np.load(path) as npz:
+            return cls(**{name: npz[name] for name in npz.files})
+
+    @classmethod
+    def cached(cls, path: Union[str, Path], segments: Union[str, Path],
+               **kwargs) -> SegmentIndex:
+        """Load the index at ``path``, building it from a parquet segment table.
+
+        The index is rebuilt when it is missing, corrupt, or older than
+        ``segments``, and the segment table is then re-registered with the
+        cache manager, which counts the index toward the table's size.
+        Keyword arguments name the columns, as in ``from_segments``.
+        """
+        path, segments = Path(path), Path(segments)
+        if not _is_fresh(path, segments):
+            with cache_lock(path):
+                if not _is_fresh(path, segments):
+                    data = pd.read_parquet(segments)
+                    with atomic_path(path) as tmp:
+                        cls.from_segments(data, **kwargs).save(tmp)
+                    notify_cache(segments, "write")
+
+        return cls.load(path)
+
+    def __repr__(self):
+        return (f"SegmentIndex({self.keys.size} segments, "
+                f"{self.samples.size} samples, "
+                f"{self.chromosomes.size} chromosomes)")
+
+class CommonRegionMatrix:
+    """Samples x minimal common regions, stored as runs of segments.
+
+    Minimal common regions are the intervals between the union of segment
+    breakpoints across samples, so every sample is constant within each
+    region. Each sample is stored as runs of regions sharing a segment
+    value, one run per segment, rather than as a dense matrix. Genes are
+    mapped to the region holding their start, as runs of genes per region.
+
+    The matrix converts to a dense samples x regions array with
+    ``np.asarray``, or a block of regions at a time with ``to_numpy``, and
+    ``take`` selects regions without densifying, so ``ThinCopynumber`` and
+    ``DiploidGISTIC`` accept it directly.
+
+    Example
+    -------
+    >>> cn = CommonRegionMatrix.from_segments(cnv_data)
+    >>> cn = cn.map_genes(EnsemblData.get_tss().df)
+    >>> cn.to_gene_frame()
+    """
+    def __init__(
+        self,
+        regions: pd.DataFrame,
+        samples: pd.Index,
+        indptr: np.ndarray,
+        run_starts: np.ndarray,
+        run_stops: np.ndarray,
+        run_values: np.ndarray,
+        gene_ids: Optional[pd.Index] = None,
+        gene_regions: Optional[np.ndarray] = None,
+        gene_counts: Optional[np.ndarray] = None,
+    ):
+        self.regions = regions
+        self.samples = samples
+        self.indptr = indptr
+        self.run_starts = run_starts
+        self.run_stops = run_stops
+        self.run_values = run_values
+        self.gene_ids = gene_ids
+        self.gene_regions = gene_regions
+        self.gene_counts = gene_counts
+
+    @classmethod
+    def from_segments(
+        cls,
+        segments: pd.DataFrame,
+        chrom_col: str = "Chromosome",
+        start_col: str = "Start",
+        end_col: str = "End",
+        sample_col: str = "sample_id",
+        value_col: str = "value",
+    ) -> CommonRegionMatrix:
+        """Build the matrix from a segment table (e.g. ``cnv``, ``masked_cnv``)."""
+        chroms = pd.Categorical(_with_chr(segments[chrom_col]))
+        order = _chrom_order(pd.Series(chroms.categories))
+        chroms = chroms.reorder_categories(order)
+        chrom_codes = chroms.codes.astype(np.int64) << 32
+        starts = chrom_codes | segments[start_col].to_numpy(dtype=np.int64)
+        stops = chrom_codes | (segments[end_col].to_numpy(dtype=np.int64) + 1)
+
+        # Breakpoints keyed on chromosome; keep intervals covered by a segment
+        bounds, inverse = np.unique(np.r_[starts, stops], return_inverse=True)
+        depth = np.cumsum(np.bincount(inverse, np.r_[np.ones(starts.size),
+                                                     -np.ones(stops.size)],
+                                      minlength=bounds.size))
+        covered = np.flatnonzero(depth[:-1] > 0)
+        region_starts, region_stops = bounds[covered], bounds[covered + 1]
+        regions = pd.DataFrame({
+            "Chromosome": pd.Categorical.from_codes(region_starts >> 32, order),
+            "Start": region_starts & 0xFFFFFFFF,
+            "End": (region_stops & 0xFFFFFFFF) - 1,
+        })
+
+        # One run per segment, sorted by sample then region
+        samples = pd.Categorical(segments[sample_col])
+        run_starts = np.searchsorted(region_starts, starts)
+        run_stops = np.searchsorted(region_stops, stops) + 1
+        runs = np.lexsort((run_starts, samples.codes))
+        indptr = np.searchsorted(samples.codes[runs],
+                                 np.arange(len(samples.categories) + 1))
+
+        return cls(
+            regions=regions,
+            samples=pd.Index(samples.categories, name="sample_id"),
+            indptr=indptr,
+            run_starts=run_starts[runs].astype(np.int32),
+            run_stops=run_stops[runs].astype(np.int32),
+            run_values=segments[value_col].to_numpy(dtype=np.float32)[runs],
+        )
+
+    @property
+    def shape(self):
+        return (self.samples.size, len(self.regions))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.indptr, self.run_starts, self.run_stops, self.run_values,
+                  self.gene_regions, self.gene_counts]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def to_numpy(self, dtype=np.float32, regions: Optional[slice] = None) -> np.ndarray:
+        """Dense samples x regions array, NaN where a sample has no segment.
+
+        ``regions``, a slice, densifies only that range of regions, e.g. to
+        process the matrix a block of regions at a time.
+        """
+        start, stop, __ = (regions or slice(None)).indices(self.shape[1])
+        run_starts = np.maximum(self.run_starts, start)
+        run_stops = np.minimum(self.run_stops, stop)
+        lengths = np.maximum(run_stops - run_starts, 0)
+
+        out = np.full((self.shape[0], max(stop - start, 0)), np.nan, dtype=dtype)
+        rows = np.repeat(np.repeat(np.arange(self.samples.size),
+                                   np.diff(self.indptr)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        out[rows, np.repeat(run_starts - start, lengths) + offsets] = \
+            np.repeat(self.run_values, lengths)
+
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_numpy(dtype=np.float32 if dtype is None else dtype)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Dense samples x regions frame, with regions as a MultiIndex."""
+        return pd.DataFrame(self.to_numpy(), index=self.samples,
+                            columns=pd.MultiIndex.from_frame(self.regions))
+
+    def map_genes(self, genes: pd.DataFrame, gene_col: str = "gene_id") -> CommonRegionMatrix:
+        """Map genes to the region containing their start.
+
+        Genes outside every region are left out.
+        """
+        genes = getattr(genes, "df", genes)
+        order = list(self.regions["Chromosome"].cat.categories)
+        gene_chroms = pd.Index(order).get_indexer(_with_chr(genes["Chromosome"]))
+        keys = (gene_chroms.astype(np.int64) << 32
+                | genes["Start"].to_numpy(dtype=np.int64))
+        region_keys = (self.regions["Chromosome"].cat.codes.to_numpy(dtype=np.int64) << 32
+                       | self.regions["Start"].to_numpy(dtype=np.int64))
+        region = np.searchsorted(region_keys, keys, side="right") - 1
+        inside = ((gene_chroms >= 0) & (region >= 0)
+                  & (genes["Start"].to_numpy()
+                     <= self.regions["End"].to_numpy()[np.maximum(region, 0)])
+                  & (keys >> 32 == region_keys[np.maximum(region, 0)] >> 32))
+
+        order = np.argsort(region[inside], kind="stable")
+        region = region[inside][order]
+        gene_regions, gene_counts = np.unique(region, return_counts=True)
+
+        return self._replace(
+            gene_ids=pd.Index(genes[gene_col].to_numpy()[inside][order], name=gene_col),
+            gene_regions=gene_regions.astype(np.int32),
+            gene_counts=gene_counts.astype(np.int32),
+        )
+
+    def to_gene_frame(self) -> pd.DataFrame:
+        """Dense samples x genes frame, expanding regions to their genes."""
+        if self.gene_ids is None:
+            raise ValueError("Map genes with map_genes first")
+
+        columns = np.repeat(self.gene_regions, self.gene_counts)
+        return pd.DataFrame(self.to_numpy()[:, columns], index=self.samples,
+                            columns=self.gene_ids)
+
+    def take(self, indices, axis: int = 1) -> CommonRegionMatrix:
+        """Select regions by increasing position or boolean mask.
+
+        Runs are remapped onto the kept regions, without densifying. Genes
+        of dropped regions are left out.
+        """
+        if axis != 1:
+            raise ValueError("Only regions (axis=1) can be selected")
+
+        keep = np.arange(self.shape[1])[indices]
+        if np.any(np.diff(keep) <= 0):
+            raise ValueError("Regions must be selected in increasing order")
+
+        starts = np.searchsorted(keep, self.run_starts)
+        stops = np.searchsorted(keep, self.run_stops)
+        runs = stops > starts
+        run_samples = np.repeat(np.arange(self.samples.size), np.diff(self.indptr))
+        indptr = np.r_[0, np.cumsum(np.bincount(run_samples[runs],
+                                                minlength=self.samples.size))]
+
+        genes = {}
+        if self.gene_ids is not None:
+            kept = np.isin(self.gene_regions, keep)
+            genes = dict(
+                gene_ids=self.gene_ids[np.repeat(kept, self.gene_counts)],
+                gene_regions=np.searchsorted(keep, self.gene_regions[kept]).astype(np.int32),
+                gene_counts=self.gene_counts[kept],
+            )
+
+        return self._replace(
+            regions=self.regions.iloc[keep].reset_index(drop=True),
+            indptr=indptr,
+            run_starts=starts[runs].astype(np.int32),
+            run_stops=stops[runs].astype(np.int32),
+            run_values=self.run_values[runs],
+            **genes,
+        )
+
+    def fill_gaps(self, value: float = np.nan) -> CommonRegionMatrix:
+        """Copy with a run of ``value`` over every region a sample has no segment in.
+
+        Gaps are the regions before a sample's first run, between its runs
+        and after its last run (or every region, for a sample without runs).
+        """
+        n_samples, n_regions = self.shape
+        n_runs = np.diff(self.indptr)
+        run_samples = np.repeat(np.arange(n_samples), n_runs)
+        has_runs = n_runs > 0
+        first, last = self.indptr[:-1][has_runs], self.indptr[1:][has_runs] - 1
+
+        prev_stops = np.r_[0, self.run_stops[:-1]].astype(self.run_stops.dtype)
+        prev_stops[first] = 0
+        inner = prev_stops < self.run_starts
+        trailing = self.run_stops[last] < n_regions
+        empty = np.flatnonzero(~has_runs)
+
+        gap_samples = np.r_[run_samples[inner], run_samples[last][trailing], empty]
+        gap_starts = np.r_[prev_stops[inner], self.run_stops[last][trailing],
+                           np.zeros(empty.size, dtype=self.run_starts.dtype)]
+        gap_stops = np.r_[self.run_starts[inner],
+                          np.full(trailing.sum() + empty.size, n_regions)]
+
+        run_samples = np.r_[run_samples, gap_samples]
+        run_starts = np.r_[self.run_starts, gap_starts]
+        runs = np.lexsort((run_starts, run_samples))
+        indptr = np.searchsorted(run_samples[runs], np.arange(n_samples + 1))
+
+        return self._replace(
+            indptr=indptr,
+            run_starts=run_starts[runs].astype(np.int32),
+            run_stops=np.r_[self.run_stops, gap_stops][runs].astype(np.int32),
+            run_values=np.r_[self.run_values,
+                             np.full(gap_samples.size, value,
+                                     dtype=self.run_values.dtype)][runs],
+        )
+
+    def with_values(self, run_values: np.ndarray) -> CommonRegionMatrix:
+        """Copy with new run values, e.g. transformed copy numbers."""
+        return self._replace(run_values=run_values)
+
+    def _replace(self, **kwargs) -> CommonRegionMatrix:
+        attrs = dict(vars(self))
+        attrs.update(kwargs)
+        return type(self)(**attrs)
+
+    def __repr__(self):
+        return (f"CommonRegionMatrix({self.samples.size} samples x "
+                f"{len(self.regions)} regions, {self.run_values.size} runs)")
+
+def segments_to_gene_matrix(
+    segments: pd.DataFrame,
+    genes: pd.DataFrame,
+    agg: str = "mean",
+    n_jobs: int = 1,
+    gene_col: str = "gene_id",
+    block_size: int = 1 << 22,
+    **kwargs,
+) -> pd.DataFrame:
+    """Sample x gene copy-number matrix from a segment table.
+
+    Segments and genes are sorted per chromosome, and each gene is matched
+    to the run of segments it overlaps in every sample by binary search, so
+    no segment x gene join is materialized. Values are written straight into
+    a preallocated float32 array.
+
+    Parameters
+    ----------
+    segments : pd.DataFrame
+        Segment table, with columns named as in ``SegmentIndex.from_segments``.
+    genes : pd.DataFrame or pr.PyRanges
+        Gene intervals with ``Chromosome``, ``Start``, ``End`` and
+        ``gene_col`` columns, e.g. from ``EnsemblData.get_tss``. Intervals
+        are treated as closed, like segments.
+    agg : {"mean", "min", "max"}
+        How to combine the segments a gene overlaps. ``"mean"`` weights
+        segments by their overlap with the gene.
+    n_jobs : int
+        Number of chromosomes processed in parallel, on threads.
+    gene_col : str
+        Column of gene labels.
+    block_size : int
+        Approximate number of (sample, gene) pairs looked up at once.
+    **kwargs
+        Segment column names, passed to ``SegmentIndex.from_segments``.
+
+    Returns
+    -------
+    pd.DataFrame
+        Samples x genes, NaN where no segment overlaps a gene.
+    """
+    if agg not in ("mean", "min", "max"):
+        raise ValueError(f"Expected agg to be one of 'mean', 'min' or 'max', got {agg!r}")
+
+    genes = getattr(genes, "df", genes)
+    index = SegmentIndex.from_segments(segments, **kwargs)
+    gene_chroms = _with_chr(genes["Chromosome"])
+    gene_starts = genes["Start"].to_numpy(dtype=np.int64)
+    gene_ends = genes["End"].to_numpy(dtype=np.int64)
+
+    out = np.full((index.samples.size, len(genes)), np.nan, dtype=np.float32)
+    codes = np.arange(index.samples.size)
+
+    def fill_chromosome(chrom):
+        cols = np.flatnonzero(gene_chroms == chrom)
+        step = max(1, block_size // cols.size)
+        for i in range(0, codes.size, step):
+            out[i:i+step, cols] = index._overlap(chrom, codes[i:i+step],
+                                                 gene_starts[cols],
+                                                 gene_ends[cols], agg)
+
+    with ThreadPoolExecutor(n_jobs) as pool:
+        list(pool.map(fill_chromosome, np.intersect1d(gene_chroms,
+                                                      index.chromosomes)))
+
+    return pd.DataFrame(out, index=pd.Index(index.samples, name="sample_id"),
+                        columns=pd.Index(genes[gene_col], name=gene_col))
+
+def summarize_copynumber(
+    segments: Union[pd.DataFrame, str, Path],
+    level: str = "arm",
+    assembly: str = "hg19",
+    gain: float = 0.2,
+    loss: float = -0.2,
+    min_fraction: float = 0.8,
+    chunksize: Optional[int] = None,
+    chrom_col: str = "Chromosome",
+    start_col: str = "Start",
+    end_col: str = "End",
+    sample_col: str = "sample_id",
+    value_col: str = "value",
+) -> pd.DataFrame:
+    """Summarize segment copy number per sample and region.
+
+    Segments are split at region boundaries (arms, with ``annotate_chrom_arm``,
+    or cytobands), then every statistic is computed in one weighted
+    ``np.bincount`` over (sample, region) groups.
+
+    Parameters
+    ----------
+    segments : pd.DataFrame or path
+        Segment table, or the path to one in parquet (e.g. a TCGA ``cnv``
+        cache, with ``chrom_col="Chrom"`` and ``sample_col="sample"``).
+        Values are log2 copy-number ratios.
+    level : {"arm", "chromosome", "cytoband"}
+        Regions to summarize over. Segments within centromeres are left out
+        of arm summaries.
+    assembly : str
+        Genome assembly of the centromere and cytoband coordinates.
+    gain, loss : float
+        Values above ``gain`` count as gained, values below ``loss`` as lost.
+    min_fraction : float
+        Fraction of a region that must be gained (lost) to call it gained
+        (lost), as in arm-level aneuploidy calls (Taylor et al. 2018).
+    chunksize : int, optional
+        Summarize this many samples at a time. For parquet input, only
+        those samples' rows are read, so memory is bounded by ``chunksize``.
+    chrom_col, start_col, end_col, sample_col, value_col : str
+        Segment column names.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by ``sample_id`` and ``region``, with the length covered by
+        segments, the length-weighted ``mean``, the fractions ``gained`` and
+        ``lost``, and the ``call``: 1 (gained), -1 (lost) or 0.
+    """
+    OneOf("arm", "chromosome", "cytoband").validate(level)
+    columns = {chrom_col: "Chromosome", start_col: "Start", end_col: "End",
+               sample_col: "sample_id", value_col: "value"}
+    regions = Cytoband(assembly).data if level == "cytoband" else None
+
+    summaries = []
+    for block in _sample_blocks(segments, sample_col, list(columns), chunksize):
+        block = block.rename(columns=columns)
+        block["Chromosome"] = _with_chr(block["Chromosome"])
+        summaries.append(_summarize_block(block, level, assembly, regions,
+                                          gain, loss, min_fraction))
+
+    return pd.concat(summaries)
+
+def aneuploidy_score(summary: pd.DataFrame) -> pd.Series:
+    """Number of gained or lost regions per sample.
+
+    With an arm-level ``summarize_copynumber`` summary, this is the arm
+    aneuploidy score, comparable to published scores such as
+    ``PloidyScoresLOHCiani2022``.
+    """
+    return (summary["call"]
+            .ne(0)
+            .groupby(level="sample_id", sort=False)
+            .sum()
+            .rename("aneuploidy_score"))
+
+def _sample_blocks(segments, sample_col, columns, chunksize):
+    """Yield segments for blocks of ``chunksize`` samples."""
+    if isinstance(segments, (str, Path)):
+        import pyarrow.parquet as pq
+
+        samples = (pq.read_table(segments, columns=[sample_col])
+                   .column(0).unique().to_pylist())
+        step = chunksize or max(1, len(samples))
+        for i in range(0, len(samples), step):
+            yield pd.read_parquet(segments, columns=columns,
+                                  filters=[(sample_col, "in", samples[i:i+step])])
+        return
+
+    if chunksize is None:
+        yield segments[columns]
+        return
+
+    codes, __ = pd.factorize(segments[sample_col])
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(0, codes.max() + 1, chunksize))
+    for lo, hi in zip(bounds, [*bounds[1:], len(order)]):
+        yield segments[columns].iloc[order[lo:hi]]
+
+def _summarize_block(segments, level, assembly, regions, gain, loss, min_fraction):
+    if level == "arm":
+        segments = annotate_chrom_arm(segments, assembly, split=True)
+        segments = segments[segments["arm"] != "cen"]
+        chroms = pd.Categorical(segments["Chromosome"],
+                                categories=_chrom_order(segments["Chromosome"]))
+        region = pd.Categorical.from_codes(
+            chroms.codes * len(ARMS) + segments["arm"].cat.codes.to_numpy(),
+            [c + arm for c in chroms.categories for arm in ARMS]
+        )
+
+    elif level == "chromosome":
+        region = pd.Categorical(segments["Chromosome"],
+                                categories=_chrom_order(segments["Chromosome"]))
+
+    elif level == "cytoband":
+        segments, region = _split_at_regions(segments, regions)
+
+    length = (segments["End"].to_numpy(dtype=np.int64)
+              - segments["Start"].to_numpy(dtype=np.int64) + 1).astype(float)
+    value = segments["value"].to_numpy(dtype=float)
+    length[np.isnan(value)] = 0
+    value = np.nan_to_num(value)
+
+    samples = pd.Categorical(segments["sample_id"])
+    n_regions = len(region.categories)
+    groups = samples.codes.astype(np.int64) * n_regions + region.codes
+    n_groups = len(samples.categories) * n_regions
+    covered = np.bincount(groups, length, minlength=n_groups)
+    present = covered > 0
+    covered = covered[present]
+
+    def fraction(weights):
+        return np.bincount(groups, weights, minlength=n_groups)[present] / covered
+
+    summary = pd.DataFrame(
+        {"length": covered.astype(np.int64),
+         "mean": fraction(length * value),
+         "gained": fraction(length * (value > gain)),
+         "lost": fraction(length * (value < loss))},
+        index=pd.MultiIndex.from_product([samples.categories, region.categories],
+                                         names=["sample_id", "region"])[present]
+    )
+    summary["call"] = (np.where(summary["gained"] >= min_fraction, 1, 0)
+                       - np.where(summary["lost"] >= min_fraction, 1, 0))
+
+    return summary
+
+def _split_at_regions(segments, regions):
+    """Split segments at the boundaries of sorted, disjoint regions."""
+    chroms = _chrom_order(pd.concat([regions["Chromosome"], segments["Chromosome"]]))
+    codes = {c: i for i, c in enumerate(chroms)}
+    regions = (regions
+               .assign(code=regions["Chromosome"].map(codes))
+               .sort_values(["code", "Start"]))
+
+    # Positions keyed on chromosome, so one search covers every chromosome
+    def key(chrom, pos):
+        return chrom.map(codes).to_numpy(dtype=np.int64) << 32 | pos.to_numpy(dtype=np.int64)
+
+    region_starts = key(regions["Chromosome"], regions["Start"])
+    region_ends = key(regions["Chromosome"], regions["End"])
+    starts = key(segments["Chromosome"], segments["Start"])
+    ends = key(segments["Chromosome"], segments["End"])
+    first = np.searchsorted(region_ends, starts, side="left")
+    last = np.searchsorted(region_starts, ends, side="right")
+
+    n_pieces = np.maximum(last - first, 0)
+    rows = np.repeat(np.arange(len(segments)), n_pieces)
+    pieces = np.repeat(first - np.cumsum(n_pieces) + n_pieces, n_pieces) + np.arange(rows.size)
+
+    split = segments.iloc[rows].assign(
+        Start=np.maximum(segments["Start"].to_numpy()[rows],
+                         regions["Start"].to_numpy()[pieces]),
+        End=np.minimum(segments["End"].to_numpy()[rows],
+                       regions["End"].to_numpy()[pieces]),
+    )
+    names = regions["band"].to_numpy()
+    region = pd.Categorical(names[pieces], categories=pd.unique(names))
+
+    return split, region
+
+def _chrom_order(chromosomes: pd.Series) -> List[str]:
+    """Unique chromosome names in karyotype order: chr1, chr2, ..., chrX."""
+    def key(chrom):
+        name = chrom[3:] if chrom.startswith("chr") else chrom
+        return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+    return sorted(pd.unique(chromosomes.astype(str)), key=key)
+
+def segment_index_path(cache: Union[str, Path]) -> Path:
+    """Path of the segment index kept next to a segment table cache."""
+    cache = Path(cache)
+    return cache.with_name(cache.name + ".index.npz")
+
+def _is_fresh(path: Path, source: Path) -> bool:
+    return (is_valid_cache(path)
+            and path.stat().st_mtime >= source.stat().st_mtime)
+
+def _with_chr(chromosomes: pd.Series) -> np.ndarray:
+    chromosomes = chromosomes.astype(str)
+    return np.where(chromosomes.str.startswith("chr"), chromosomes,
+                    "chr" + chromosomes)
@@ -1,26 +1,47 @@
 from pkgutil import extend_path
 
-from .gdc_xena import build_tcga, get_gdc_tcga
+from .gdc_xena import (
+    build_tcga_parallel,
+    get_gdc_tcga,
+    get_tcga_samples,
+    get_tcga_segment_index,
+)
+from .tcga_config import TCGA_XENA_DATASETS
 from .tcgabiolinks_subtype import get_subtypes
 
 
-__all__ = ["build_tcga_cache", "get_tcga"]
+__all__ = ["build_tcga_cache", "get_tcga", "get_tcga_samples", "get_tcga_segment_index"]
 __path__ = extend_path(__path__, __name__)
 
-def build_tcga_cache(cancer, minimal=False, n_samples=20):
-    """Build local cache of TCGA data."""
+def build_tcga_cache(cancers=None, omics=None, workers=4, minimal=False,
+                     n_samples=20):
+    """Build local cache of TCGA data.
 
-    build_tcga(cancer, minimal=minimal, n_samples=n_samples)
+    ``cancers`` and ``omics`` default to every entry in ``TCGA_CANCERS`` and
+    ``TCGA_XENA_DATASETS``. Entries already cached are skipped, so this can
+    be re-run to resume a failed build.
+    """
+    if isinstance(cancers, str):
+        cancers = [cancers]
+
+    build_tcga_parallel(cancers, omics, workers=workers, minimal=minimal,
+                        n_samples=n_samples)
     get_subtypes(cache_only=True)
 
-def get_tcga(data_name, cancer=None):
-    """Get TCGA data from local cache."""
+def get_tcga(data_name, cancer=None, samples=None, genes=None, arrow=False):
+    """Get TCGA data from local cache.
+
+    Pass ``samples`` and/or ``genes`` to read only that slice of the cached
+    table rather than the full frame, and ``arrow`` to get it as a
+    ``pyarrow.Table``.
+    """
     
     if data_name == "subtypes":
         return get_subtypes()
     
     else:
-        try:
-            return get_gdc_tcga(cancer, data_name)
-        except Exception as e:
-            raise ValueError(f"data_name {data_name} not found.") from e
\ No newline at end of file
+        if data_name not in TCGA_XENA_DATASETS:
+            raise ValueError(f"data_name {data_name} not found.")
+
+        return get_gdc_tcga(cancer, data_name, samples=samples, genes=genes,
+                            arrow=arrow)
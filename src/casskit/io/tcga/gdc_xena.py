@@ -3,16 +3,44 @@
 
 from __future__ import annotations
 
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+import gzip
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+import warnings
 
 import pandas as pd
+import tqdm
 
-from .tcga_config import TCGA_CANCERS, TCGA_XENA_DATASETS, XenaData
+from .tcga_config import (
+    TCGA_CANCERS,
+    TCGA_XENA_DATASETS,
+    TCGA_XENA_TYPES,
+    XenaData,
+)
 from ..base import DataURLMixin
-from ..config import CACHE_DIR
+from ..config import CACHE_DIR, STREAM_CHUNKSIZE
 from ..descriptors import OneOf
-from ..utils import cache_on_disk, check_package_version
+from ..segments import SegmentIndex, segment_index_path
+from ..utils import (
+    atomic_path,
+    cache_key_path,
+    cache_lock,
+    cache_on_disk,
+    cache_params,
+    check_package_version,
+    download_file,
+    is_valid_cache,
+    notify_cache,
+    open_text_stream,
+    stream_to_parquet,
+    write_manifest,
+    xena_stream_dtype,
+)
 
 
 class TCGAXenaLoader(DataURLMixin):
@@ -27,28 +55,40 @@ class TCGAXenaLoader(DataURLMixin):
         cache_dir: Optional[Path] = CACHE_DIR,
         minimal: bool = False,
         n_samples: int = 50,
+        stream: bool = False,
+        chunksize: int = STREAM_CHUNKSIZE,
+        cache_only: bool = False,
     ):
         check_package_version("pyarrow")
         
         self.cancer = cancer
+        xena_data = tcga_xena_data(cancer, xena_data)
         self._units = xena_data.units
         self.omic = xena_data.omic
         self.sep = xena_data.sep
         self.compression = xena_data.compression
         self.stem = f"{self.cancer}.{self.omic}"
         
-        # Configure caching
-        self.set_cache(cache_dir)
-        
         # For testing and memory-limited settings
         self.minimal = minimal
         self.n_samples = n_samples
+
+        # Configure caching
+        self.set_cache(cache_dir)
+
+        # Convert download to parquet in chunks of rows, bounding memory
+        self.stream = stream
+        self.chunksize = chunksize
+        self.cache_only = cache_only
         self.raw_data = self.fetch()
 
     @property
     def basename(self):
-        return (f"https://gdc-hub.s3.us-east-1.amazonaws.com"
-                f"/download/{self.stem}")
+        return tcga_xena_basename(self.cancer, self.omic)
+
+    @property
+    def url(self):
+        return tcga_xena_url(self.cancer, self.omic, self.compression)
 
     @property
     @DataURLMixin.safe_fetch
@@ -58,11 +98,7 @@ class TCGAXenaLoader(DataURLMixin):
 
     @cache_on_disk
     def fetch(self) -> pd.DataFrame:
-        url = self.basename + ".tsv"
-        if self.compression == "gzip":
-            url += ".gz"
-        
-        return self._fetch(url)
+        return self._fetch(self.url)
 
     @DataURLMixin.safe_fetch
     def _fetch(self, url) -> pd.DataFrame:
@@ -73,15 +109,58 @@ class TCGAXenaLoader(DataURLMixin):
                                            self.n_samples)
 
         return data
-    
+
+    def stream_cache(self, cache: Path) -> None:
+        """Stream the download into the parquet cache, chunk by chunk."""
+        print("Streaming data from ", self.url)
+        xena_to_parquet(self.url, cache, self.omic, sep=self.sep,
+                        compression=self.compression, chunksize=self.chunksize,
+                        minimal=self.minimal, n_samples=self.n_samples)
+
     def set_cache(self, cache_dir: Path) -> Path:
-        self.path_cache = Path(cache_dir, f"GDC.{self.cancer}/data/{self.omic}.raw.parquet")
+        self.path_cache = tcga_cache_path(cache_dir, self.cancer, self.omic,
+                                          self.compression, self.minimal,
+                                          self.n_samples)
+        self.cache_params = tcga_cache_params(self.cancer, self.omic,
+                                              self.compression, self.minimal,
+                                              self.n_samples)
         self.read_cache = lambda cache: pd.read_parquet(cache)
         self.write_cache = lambda data, cache: data.to_parquet(cache, engine="pyarrow")
 
     @classmethod
-    def get(cls, cancer: str, data: str) -> pd.DataFrame:
-        return cls(cancer, TCGA_XENA_DATASETS[data]).raw_data
+    def get(
+        cls,
+        cancer: str,
+        data: str,
+        samples: Optional[List[str]] = None,
+        genes: Optional[List[str]] = None,
+        arrow: bool = False,
+    ) -> pd.DataFrame:
+        if samples is None and genes is None and not arrow:
+            return cls(cancer, TCGA_XENA_DATASETS[data]).raw_data
+
+        # Make sure the cache exists, then read only the selection from it
+        loader = cls(cancer, TCGA_XENA_DATASETS[data], stream=True,
+                     cache_only=True)
+        return read_tcga_parquet(loader.path_cache, TCGA_XENA_TYPES[data],
+                                 samples=samples, genes=genes, arrow=arrow)
+
+    @classmethod
+    def get_samples(cls, cancer: str, data: str) -> pd.Index:
+        """Sample IDs in a cached table, read without loading its values."""
+        loader = cls(cancer, TCGA_XENA_DATASETS[data], stream=True,
+                     cache_only=True)
+        return read_tcga_samples(loader.path_cache, TCGA_XENA_TYPES[data])
+
+    @classmethod
+    def get_segment_index(cls, cancer: str, data: str = "cnv") -> SegmentIndex:
+        """Interval index over a cached segment table, e.g. ``cnv``."""
+        if TCGA_XENA_TYPES[data] != "genomicSegment":
+            raise ValueError(f"{data} is not a segment table")
+
+        loader = cls(cancer, TCGA_XENA_DATASETS[data], stream=True,
+                     cache_only=True)
+        return tcga_segment_index(loader.path_cache)
 
     @classmethod
     def build_cache(
@@ -90,20 +169,248 @@ class TCGAXenaLoader(DataURLMixin):
         cache_dir: Path = CACHE_DIR,
         minimal: bool = False,
         n_samples: int = 20,
+        stream: bool = True,
+        chunksize: int = STREAM_CHUNKSIZE,
     ) -> None:
         for xena_data in TCGA_XENA_DATASETS.values():
             print(f"Building {xena_data}")
-            # Exceptions to patterns
-            gzip_exceptions = (xena_data.omic == "GDC_phenotype" or cancer == "GDC-PANCAN")
-            compression = xena_data.compression if not gzip_exceptions else "gzip"
-
-            # Make new tuple with correct compression
-            xd_ = XenaData(xena_data.omic, xena_data.sep,
-                           compression, xena_data.units)
-            
-            cls(cancer, xd_, cache_dir=cache_dir,
-                minimal=minimal, n_samples=n_samples
-                ).raw_data
+            xd_ = tcga_xena_data(cancer, xena_data)
+            loader = cls(cancer, xd_, cache_dir=cache_dir,
+                         minimal=minimal, n_samples=n_samples,
+                         stream=stream, chunksize=chunksize, cache_only=True)
+            if TCGA_XENA_TYPES.get(xd_.omic) == "genomicSegment":
+                tcga_segment_index(loader.path_cache)
+
+def build_tcga_parallel(
+    cancers: Optional[List[str]] = None,
+    omics: Optional[List[str]] = None,
+    workers: int = 4,
+    cache_dir: Path = CACHE_DIR,
+    minimal: bool = False,
+    n_samples: int = 20,
+    chunksize: int = STREAM_CHUNKSIZE,
+) -> Dict[Tuple[str, str], Exception]:
+    """Build the TCGA cache for many cancers and omics at once.
+
+    Downloads run on a thread pool and parquet conversions on a process
+    pool, so parsing one file overlaps with downloading the next. Entries
+    already cached are skipped, and completed downloads are kept until
+    converted, so re-running after a failure resumes where it stopped.
+    Leftover downloads are checked before reuse, and downloads that fail
+    to convert are discarded.
+
+    Returns
+    -------
+    A dict of (cancer, omic) to the exception raised, for failed entries.
+    """
+    cancers = TCGA_CANCERS if cancers is None else cancers
+    omics = list(TCGA_XENA_DATASETS) if omics is None else omics
+
+    jobs = {}
+    for cancer in cancers:
+        for omic in omics:
+            xena_data = tcga_xena_data(cancer, TCGA_XENA_DATASETS[omic])
+            cache = tcga_cache_path(cache_dir, cancer, omic,
+                                    xena_data.compression, minimal, n_samples)
+            if is_valid_cache(cache):
+                continue
+
+            suffix = ".tsv.gz" if xena_data.compression == "gzip" else ".tsv"
+            download = Path(cache_dir, f"GDC.{cancer}/raw/{omic}{suffix}")
+            jobs[(cancer, omic)] = (xena_data, download, cache)
+
+            # Partial downloads of interrupted builds
+            for part in download.parent.glob(f"{download.name}.*.part"):
+                part.unlink(missing_ok=True)
+
+    print(f"Building {len(jobs)} TCGA cache entries with {workers} workers")
+    failed = {}
+    with ThreadPoolExecutor(workers) as io_pool, \
+            ProcessPoolExecutor(workers) as cpu_pool:
+        downloads = {}
+        for job, (xena_data, download, __) in jobs.items():
+            url = tcga_xena_url(*job, xena_data.compression)
+            downloads[io_pool.submit(_fetch_xena_download, url, download,
+                                     xena_data.compression)] = job
+
+        conversions = {}
+        for future in tqdm.tqdm(as_completed(downloads), total=len(downloads),
+                                desc="Downloading"):
+            job = downloads[future]
+            xena_data, download, cache = jobs[job]
+            try:
+                future.result()
+            except Exception as e:
+                failed[job] = e
+                continue
+
+            tqdm.tqdm.write(f"Downloaded {'.'.join(job)}")
+            cache.parent.mkdir(exist_ok=True, parents=True)
+            params = tcga_cache_params(*job, xena_data.compression, minimal,
+                                       n_samples)
+            conversions[cpu_pool.submit(
+                _build_xena_cache, download, cache, params, xena_data.omic,
+                sep=xena_data.sep, compression=xena_data.compression,
+                chunksize=chunksize, minimal=minimal, n_samples=n_samples
+            )] = job
+
+        for future in tqdm.tqdm(as_completed(conversions),
+                                total=len(conversions), desc="Converting"):
+            job = conversions[future]
+            __, download, cache = jobs[job]
+            try:
+                built = future.result()
+            except Exception as e:
+                failed[job] = e
+                download.unlink(missing_ok=True)
+                continue
+
+            # Callbacks registered in workers never reach this process
+            if built:
+                notify_cache(cache, "write")
+
+            tqdm.tqdm.write(f"Cached {'.'.join(job)}")
+            download.unlink()
+
+    for job, e in failed.items():
+        warnings.warn(f"Failed to build {'.'.join(job)}: {e!r}")
+
+    return failed
+
+def _build_xena_cache(
+    download: Path,
+    cache: Path,
+    params: Dict,
+    omic: str,
+    **kwargs,
+) -> bool:
+    """Convert a download into the cache, unless another process already has.
+
+    Segment tables also get their interval index built. Returns whether the
+    cache was written by this call.
+    """
+    built = False
+    with cache_lock(cache):
+        if not is_valid_cache(cache):
+            with atomic_path(cache) as tmp:
+                xena_to_parquet(download, tmp, omic, **kwargs)
+            write_manifest(cache, params)
+            built = True
+
+    if TCGA_XENA_TYPES.get(omic) == "genomicSegment":
+        tcga_segment_index(cache)
+
+    return built
+
+def _fetch_xena_download(
+    url: str,
+    download: Path,
+    compression: Optional[str] = "gzip",
+) -> Path:
+    """Download a Xena file, reusing a complete download left behind."""
+    if download.exists():
+        if _is_complete_download(download, compression):
+            return download
+
+        warnings.warn(f"Discarding incomplete download: {download}")
+        download.unlink()
+
+    return download_file(url, download)
+
+def _is_complete_download(path: Path, compression: Optional[str] = "gzip") -> bool:
+    """Whether a download is non-empty and, if gzipped, decompresses to the end."""
+    if path.stat().st_size == 0:
+        return False
+
+    if compression == "gzip":
+        try:
+            with gzip.open(path, "rb") as f:
+                while f.read(1 << 20):
+                    pass
+        except (OSError, EOFError):
+            return False
+
+    return True
+
+def xena_to_parquet(
+    src,
+    cache: Path,
+    omic: str,
+    sep: str = "\t",
+    compression: Optional[str] = "gzip",
+    chunksize: int = STREAM_CHUNKSIZE,
+    minimal: bool = False,
+    n_samples: int = 20,
+) -> None:
+    """Convert a TCGA Xena file (path or URL) to the parquet cache."""
+    data_type = TCGA_XENA_TYPES.get(omic)
+    if minimal is True and data_type != "genomicMatrix":
+        # Row subsets need the full table to pick samples
+        data = pd.read_csv(src, sep=sep, compression=compression)
+        (subset_tcga_for_testing(data, data_type, n_samples)
+         .to_parquet(cache, engine="pyarrow"))
+        return
+
+    with open_text_stream(src, compression) as handle:
+        columns = handle.readline().rstrip("\n").split(sep)
+        usecols = columns
+        if minimal is True:
+            usecols = [columns[0]] + sorted(columns[1:])[:n_samples]
+
+        stream_to_parquet(handle, cache, chunksize=chunksize, sep=sep,
+                          header=None, names=columns, usecols=usecols,
+                          dtype=xena_stream_dtype(columns, data_type))
+
+def tcga_xena_data(cancer: str, xena_data: XenaData) -> XenaData:
+    """Correct the compression of a Xena dataset for a given cancer."""
+    # Exceptions to patterns
+    gzip_exceptions = (xena_data.omic == "GDC_phenotype" or cancer == "GDC-PANCAN")
+    compression = xena_data.compression if not gzip_exceptions else "gzip"
+
+    # Make new tuple with correct compression
+    return XenaData(xena_data.omic, xena_data.sep,
+                    compression, xena_data.units)
+
+def tcga_xena_basename(cancer: str, omic: str) -> str:
+    return (f"https://gdc-hub.s3.us-east-1.amazonaws.com"
+            f"/download/{cancer}.{omic}")
+
+def tcga_xena_url(cancer: str, omic: str, compression: Optional[str]) -> str:
+    url = tcga_xena_basename(cancer, omic) + ".tsv"
+    if compression == "gzip":
+        url += ".gz"
+
+    return url
+
+def tcga_cache_params(
+    cancer: str,
+    omic: str,
+    compression: Optional[str] = "gzip",
+    minimal: bool = False,
+    n_samples: int = 20,
+) -> Dict:
+    """Parameters a TCGA cache entry is keyed on."""
+    return cache_params(tcga_xena_url(cancer, omic, compression),
+                        minimal=minimal,
+                        n_samples=n_samples if minimal else None)
+
+def tcga_cache_path(
+    cache_dir: Path,
+    cancer: str,
+    omic: str,
+    compression: Optional[str] = "gzip",
+    minimal: bool = False,
+    n_samples: int = 20,
+) -> Path:
+    """Keyed cache path of a TCGA entry."""
+    params = tcga_cache_params(cancer, omic, compression, minimal, n_samples)
+    return cache_key_path(Path(cache_dir, f"GDC.{cancer}/data/{omic}.raw.parquet"),
+                          params)
+
+def tcga_segment_index(cache: Path) -> SegmentIndex:
+    """Load, or build and persist, the interval index of a segment cache."""
+    return SegmentIndex.cached(segment_index_path(cache), cache,
+                               chrom_col="Chrom", sample_col="sample")
 
 class TCGAXenaMetadata:
     def __init__(self, data):
@@ -112,6 +419,72 @@ class TCGAXenaMetadata:
             for metadata_attr in self.data.index:
                 setattr(self, metadata_attr, self.data.loc[metadata_attr][0])
 
+def read_tcga_parquet(
+    path: Path,
+    data_type: str,
+    samples: Optional[List[str]] = None,
+    genes: Optional[List[str]] = None,
+    arrow: bool = False,
+) -> pd.DataFrame:
+    """Read a selection of samples and genes from a cached Xena table.
+
+    Selections are pushed down to pyarrow, so only the requested bytes are
+    read. Genomic matrices store samples as columns, which are projected,
+    and features as rows, which are filtered on the leading ID column.
+    Gene IDs may be given with or without an Ensembl version suffix. Other
+    tables store one row per sample (and gene, for mutations) and are
+    filtered on those columns. With ``arrow``, the selection is returned as
+    a ``pyarrow.Table``, without converting it to pandas.
+    """
+    import pyarrow.parquet as pq
+
+    names = pq.read_schema(path).names
+    id_col = names[0]
+    columns, filters = None, []
+
+    if data_type == "genomicMatrix":
+        if samples is not None:
+            missing = set(samples).difference(names)
+            if missing:
+                warnings.warn(f"{len(missing)} samples not found in {path}")
+            columns = [id_col] + [s for s in dict.fromkeys(samples) if s in names]
+
+        if genes is not None:
+            ids = pq.read_table(path, columns=[id_col]).column(0).to_pandas()
+            genes = set(genes)
+            keep = ids.isin(genes) | ids.str.split(".").str[0].isin(genes)
+            filters.append((id_col, "in", ids[keep].tolist()))
+
+    else:
+        if samples is not None:
+            filters.append((id_col, "in", list(samples)))
+
+        if genes is not None:
+            if "gene" not in names:
+                raise ValueError(f"Cannot select genes from {data_type} data")
+            filters.append(("gene", "in", list(genes)))
+
+    if arrow:
+        return pq.read_table(path, columns=columns, filters=filters or None)
+
+    return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+def read_tcga_samples(path: Path, data_type: str) -> pd.Index:
+    """Sample IDs in a cached Xena table.
+
+    Genomic matrices store samples as columns, named in the parquet schema.
+    Other tables store one row per sample (and gene, for mutations), and
+    only their leading ID column is read.
+    """
+    import pyarrow.parquet as pq
+
+    names = pq.read_schema(path).names
+    if data_type == "genomicMatrix":
+        return pd.Index(names[1:])
+
+    ids = pq.read_table(path, columns=[names[0]]).column(0).unique()
+    return pd.Index(ids.to_pandas())
+
 def subset_tcga_for_testing(data, data_type, n_samples):
     # TODO: Check n_samples is possible
     if data_type == "genomicMatrix":
@@ -133,7 +506,13 @@ def subset_tcga_for_testing(data, data_type, n_samples):
         return data[data[data.columns[0]].isin(samples)]
 
 get_gdc_tcga = TCGAXenaLoader.get
-"""Shortcut for TCGAXenaLoader.build_cache"""
+"""Shortcut for TCGAXenaLoader.get"""
+
+get_tcga_samples = TCGAXenaLoader.get_samples
+"""Shortcut for TCGAXenaLoader.get_samples"""
+
+get_tcga_segment_index = TCGAXenaLoader.get_segment_index
+"""Shortcut for TCGAXenaLoader.get_segment_index"""
 
 build_tcga = TCGAXenaLoader.build_cache
 """Shortcut for TCGAXenaLoader.build_cache"""
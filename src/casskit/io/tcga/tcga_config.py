@@ -5,7 +5,7 @@ from __future__ import annotations
 
 from collections import namedtuple
 
-__all__ = ["TCGA_CANCERS", "XenaData", "TCGA_XENA_DATASETS"]
+__all__ = ["TCGA_CANCERS", "XenaData", "TCGA_XENA_DATASETS", "TCGA_XENA_TYPES"]
 
 
 TCGA_CANCERS = [
@@ -37,3 +37,20 @@ TCGA_XENA_DATASETS = {
     "survival": XenaData("survival", "\t", None, None),
     "varscan2_snv": XenaData("varscan2_snv", "\t", "gzip", None),   
 }
+
+# Xena data types, which decide how a cached table is laid out
+TCGA_XENA_TYPES = {
+    "cnv": "genomicSegment",
+    "GDC_phenotype": "clinicalMatrix",
+    "gistic": "genomicMatrix",
+    "htseq_counts": "genomicMatrix",
+    "htseq_fpkm": "genomicMatrix",
+    "htseq_fpkm-uq": "genomicMatrix",
+    "masked_cnv": "genomicSegment",
+    "mirna": "genomicMatrix",
+    "muse_snv": "mutationVector",
+    "mutect2_snv": "mutationVector",
+    "somaticsniper_snv": "mutationVector",
+    "survival": "clinicalMatrix",
+    "varscan2_snv": "mutationVector",
+}
@@ -25,7 +25,9 @@ class TCGABiolinksSubtype(DataURLMixin):
         return SUBTYPES_ASSET
 
     def set_cache(self, cache_dir):
-        self.path_cache = Path(cache_dir, f"tcga_subtype_tcgabiolinks.pkl")
+        self.path_cache = self.keyed_cache(
+            Path(cache_dir, "tcga_subtype_tcgabiolinks.pkl")
+        )
         self.read_cache = lambda cache: pd.read_pickle(cache)
         self.write_cache = lambda data, cache: data.to_pickle(cache)
 
@@ -1,14 +1,161 @@
-from difflib import SequenceMatcher
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
 from functools import wraps
+import gzip
+import hashlib
+from importlib import metadata as importlib_metadata
+import io
+import json
+import os
 from pathlib import Path
 import pkg_resources
 import platform
 import re
-from typing import Callable, Dict, List
+import shutil
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Union
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+import uuid
 import warnings
+import weakref
 
+import numpy as np
 import pandas as pd
-import tqdm
+
+from .config import (
+    CACHE_LOCK_STALE,
+    HEADER,
+    MEMORY_CACHE_BYTES,
+    STREAM_CHUNKSIZE,
+)
+
+
+# Called with (path, "read" | "write") on cache_on_disk reads and writes
+CACHE_CALLBACKS: List[Callable] = []
+
+
+class MemoryCache:
+    """Process-wide cache of loaded data, bounded by size.
+
+    Up to ``max_bytes`` of the most recently used objects are held strongly.
+    Objects evicted from that budget (or larger than it) are still held
+    weakly, so they are served again for as long as anything else keeps
+    them alive. Cached objects are shared; ``cache_in_memory`` and
+    ``cache_on_disk`` hand callers copies of them (see ``shared_copy``).
+    """
+    def __init__(self, max_bytes: int = MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._strong = OrderedDict()
+        self._weak = weakref.WeakValueDictionary()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._strong:
+                self._strong.move_to_end(key)
+                return self._strong[key][0]
+
+            return self._weak.get(key)
+
+    def put(self, key, value) -> None:
+        if value is None:
+            return
+
+        nbytes = nbytes_of(value)
+        with self._lock:
+            self._discard(key)
+            with suppress(TypeError):
+                self._weak[key] = value
+
+            if nbytes <= self.max_bytes:
+                self._strong[key] = (value, nbytes)
+                self._nbytes += nbytes
+                self._shrink()
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._strong.clear()
+            self._weak.clear()
+            self._nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def _discard(self, key) -> None:
+        if key in self._strong:
+            self._nbytes -= self._strong.pop(key)[1]
+
+    def _shrink(self) -> None:
+        while self._nbytes > self.max_bytes:
+            __, (__, nbytes) = self._strong.popitem(last=False)
+            self._nbytes -= nbytes
+
+MEMORY_CACHE = MemoryCache()
+
+def nbytes_of(value) -> int:
+    """Approximate in-memory size of cached data."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+
+    if hasattr(value, "dfs"):
+        # pyranges.PyRanges
+        return sum(nbytes_of(df) for df in value.dfs.values())
+
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+
+    return sys.getsizeof(value)
+
+def shared_copy(value):
+    """Copy of cached data that callers may modify without affecting the cache.
+
+    pandas objects are copied shallowly, which under copy-on-write shares
+    the data until either copy is written to. Other objects are returned as
+    is and should be treated as read-only.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+
+    return value
+
+def set_memory_cache_size(max_bytes: int) -> None:
+    """Set the byte budget of the in-process cache."""
+    MEMORY_CACHE.resize(max_bytes)
+
+def clear_memory_cache() -> None:
+    """Drop everything held by the in-process cache."""
+    MEMORY_CACHE.clear()
+
+def cache_in_memory(f: Callable) -> Callable:
+    """Memoize a loader function in the in-process cache.
+
+    Results are keyed on the function and its arguments, which must be
+    hashable, and returned as a ``shared_copy``.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        key = (f.__module__, f.__qualname__, args, tuple(sorted(kwargs.items())))
+        data = MEMORY_CACHE.get(key)
+        if data is None:
+            data = f(*args, **kwargs)
+            MEMORY_CACHE.put(key, data)
+
+        return shared_copy(data)
+    return wrapper
 
 
 def cache_on_disk(f: Callable) -> Callable:
@@ -17,31 +164,571 @@ def cache_on_disk(f: Callable) -> Callable:
     Light-weight caching decorator that caches class function output on disk.
     This decorator will only work on functions that return a single pandas
     DataFrame object.
+
+    Loaders that define ``stream_cache(cache)`` and set ``self.stream`` write
+    the cache themselves, chunk by chunk, instead of returning the full frame
+    from ``f``. Setting ``self.cache_only`` skips reading the cache back into
+    memory; the wrapper then returns None.
+
+    Caches are safe to share between processes: one caller holds a lock and
+    produces the cache while the others wait for it, and the cache is written
+    to a temporary file that is renamed into place with a checksum, so
+    partial writes are never read.
+
+    Loaded data is also kept in the in-process ``MEMORY_CACHE``, keyed on the
+    (parameter-keyed) cache path, so repeated loads are not re-read from disk.
+    Each load returns a ``shared_copy``, so callers cannot modify the data
+    other callers get.
+
+    Loaders whose URL always points at the latest release set
+    ``self.check_source``; their cache is then rebuilt when the source's ETag
+    no longer matches the one recorded in its manifest. The ETag is fetched
+    once per load from disk, and not at all for other loaders.
     """
     @wraps(f)
     def wrapper(self, *args, **kwargs):
-        if hasattr(self, "path_cache"):
-            cache = self.path_cache
+        if not hasattr(self, "path_cache"):
+            return f(self, *args, **kwargs)
 
-            if (Path(cache).exists() and Path(cache).stat().st_size > 0):
-                print(f"Loading from cache: {cache}")
-                data = self.read_cache(cache)
-                
-            else:
-                print(f"Caching to disk: {cache}")
-                Path(cache).parent.mkdir(exist_ok=True, parents=True)
-                data = f(self, *args, **kwargs)
-                if (data is not None and data.empty is False):
-                    self.write_cache(data, cache)
+        cache = Path(self.path_cache)
+        cache_only = getattr(self, "cache_only", False)
+        streaming = getattr(self, "stream", False) and hasattr(self, "stream_cache")
+        check_source = getattr(self, "check_source", False)
+
+        key = (type(self).__qualname__, f.__name__, str(cache))
+        if not cache_only:
+            data = MEMORY_CACHE.get(key)
+            if data is not None:
+                notify_cache(cache, "read")
+                return shared_copy(data)
+
+        etag = None
+        if check_source:
+            etag = source_etag((getattr(self, "cache_params", None) or {}).get("url"))
+
+        def changed():
+            return etag is not None and source_changed(cache, etag)
+
+        data = None
+        if not is_valid_cache(cache) or changed():
+            cache.parent.mkdir(exist_ok=True, parents=True)
+            with cache_lock(cache):
+                # Another process may have built the cache while we waited
+                if not is_valid_cache(cache):
+                    if cache.exists():
+                        warnings.warn(f"Replacing corrupt cache: {cache}")
+                    rebuild = True
+                elif changed():
+                    warnings.warn(f"Source has changed, replacing cache: {cache}")
+                    rebuild = True
                 else:
-                    warnings.warn(f"Data is empty. Not writing to cache: {cache}")
+                    rebuild = False
 
-        else:
-            data = f(self, *args, **kwargs)
+                if rebuild:
+                    params = getattr(self, "cache_params", None)
+                    if streaming:
+                        print(f"Streaming to disk: {cache}")
+                        with atomic_path(cache) as tmp:
+                            self.stream_cache(tmp)
+                        write_manifest(cache, params, etag)
+                        notify_cache(cache, "write")
+
+                    else:
+                        print(f"Caching to disk: {cache}")
+                        data = f(self, *args, **kwargs)
+                        if (data is not None and data.empty is False):
+                            with atomic_path(cache) as tmp:
+                                self.write_cache(data, tmp)
+                            write_manifest(cache, params, etag)
+                            notify_cache(cache, "write")
+                        else:
+                            warnings.warn(f"Data is empty. Not writing to cache: {cache}")
+
+                        MEMORY_CACHE.put(key, data)
+                        return shared_copy(data)
+
+        if cache_only:
+            return None
+
+        print(f"Loading from cache: {cache}")
+        notify_cache(cache, "read")
+        data = self.read_cache(cache)
+        MEMORY_CACHE.put(key, data)
+
+        return shared_copy(data)
 
-        return data
     return wrapper
 
+def notify_cache(path: Union[str, Path], event: str) -> None:
+    for callback in CACHE_CALLBACKS:
+        callback(Path(path), event)
+
+def cache_version() -> str:
+    """Release of casskit that cache keys are tied to.
+
+    Development and local version segments are dropped so that caches
+    survive between commits but not across releases.
+    """
+    try:
+        version = importlib_metadata.version("casskit")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+    return re.match(r"\d+(\.\d+)*", version).group()
+
+def cache_params(url: Optional[str] = None, **params) -> Dict:
+    """Parameters a cache is keyed on: loader parameters, source and version."""
+    return dict(params, url=url, version=cache_version())
+
+def cache_key_path(path: Union[str, Path], params: Dict) -> Path:
+    """Insert a hash of ``params`` into a cache file name.
+
+    ``cache_key_path("biogrid.pkl", params)`` gives ``biogrid.<key>.pkl``, so
+    caches built with different parameters sit side by side.
+    """
+    path = Path(path)
+    blob = json.dumps(params, sort_keys=True, default=str).encode()
+    key = hashlib.sha256(blob).hexdigest()[:12]
+    return path.with_name(f"{path.stem}.{key}{path.suffix}")
+
+def manifest_path(path: Union[str, Path]) -> Path:
+    """Path of the manifest kept next to a cache file."""
+    path = Path(path)
+    return path.with_name(path.name + ".manifest.json")
+
+def write_manifest(
+    path: Union[str, Path],
+    params: Optional[Dict] = None,
+    etag: Optional[str] = None,
+) -> Path:
+    """Record what a cache file was built from.
+
+    The manifest holds the key parameters, size, creation time, checksum and
+    the ETag of the source, for loaders that track it (see ``source_etag``).
+    """
+    path = Path(path)
+    params = {} if params is None else params
+    checksum = checksum_path(path)
+    manifest = {
+        "path": path.name,
+        "params": params,
+        "version": params.get("version", cache_version()),
+        "size": path.stat().st_size,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime()),
+        "sha256": read_checksum(path)[0] if checksum.exists() else None,
+        "etag": etag,
+    }
+    manifest_path(path).write_text(json.dumps(manifest, indent=2, default=str))
+
+    return manifest_path(path)
+
+def read_manifests(cache_dir: Union[str, Path]) -> Dict[Path, Dict]:
+    """All cache manifests under ``cache_dir``, keyed by cache file."""
+    manifests = {}
+    for manifest in sorted(Path(cache_dir).glob("**/*.manifest.json")):
+        path = manifest.with_name(manifest.name[:-len(".manifest.json")])
+        with suppress(ValueError):
+            manifests[path] = json.loads(manifest.read_text())
+
+    return manifests
+
+def cache_files(path: Union[str, Path]) -> List[Path]:
+    """A cache file with its checksum, manifest and derived files, if present.
+
+    Derived files, e.g. the segment index, are named after the cache file.
+    Locks are not included.
+    """
+    path = Path(path)
+    sidecars = [f for f in sorted(path.parent.glob(f"{path.name}.*"))
+                if f.suffix != ".lock"]
+    return [f for f in (path, *sidecars) if f.is_file()]
+
+def remove_cache(path: Union[str, Path]) -> None:
+    """Remove a cache file with its checksum, manifest and derived files."""
+    for f in cache_files(path):
+        with suppress(FileNotFoundError):
+            f.unlink()
+
+def source_changed(path: Union[str, Path], etag: Optional[str] = None) -> bool:
+    """Whether a cache's source URL now has a different ETag than when cached.
+
+    The current ETag is fetched unless given. False when either ETag is
+    unknown, e.g. offline or for local sources.
+    """
+    with suppress(FileNotFoundError, ValueError):
+        manifest = json.loads(manifest_path(path).read_text())
+        if manifest.get("etag") is None:
+            return False
+
+        if etag is None:
+            etag = source_etag(manifest.get("params", {}).get("url"))
+        return etag is not None and etag != manifest["etag"]
+
+    return False
+
+def source_etag(url: Optional[str], headers: Dict = HEADER) -> Optional[str]:
+    """ETag of a remote source, if the server sends one."""
+    if url is None or urlparse(str(url)).scheme not in ("http", "https"):
+        return None
+
+    with suppress(Exception):
+        request = Request(str(url), None, headers=headers, method="HEAD")
+        with urlopen(request, timeout=10) as response:
+            return response.headers.get("ETag")
+
+def checksum_path(path: Union[str, Path]) -> Path:
+    """Path of the checksum file kept next to a cache file."""
+    path = Path(path)
+    return path.with_name(path.name + ".sha256")
+
+def file_checksum(path: Union[str, Path], blocksize: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in blocks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+def read_checksum(path: Union[str, Path]):
+    """SHA-256, size and mtime (ns) recorded for a cache file by ``atomic_path``.
+
+    Size and mtime are None for checksum files that only hold the hash.
+    """
+    sha, *stamp = checksum_path(path).read_text().split()
+    if len(stamp) != 2:
+        return sha, None, None
+
+    return sha, int(stamp[0]), int(stamp[1])
+
+def is_valid_cache(path: Union[str, Path], verify: bool = False) -> bool:
+    """Check a cache file exists and matches its checksum file, if it has one.
+
+    By default only the size and mtime recorded with the checksum are
+    compared, so reads do not rehash the file; the file is hashed when
+    ``verify`` is set, when no size and mtime were recorded, or when only the
+    mtime differs (e.g. after a copy). Invalid caches are left in place, to
+    be replaced under ``cache_lock``.
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return False
+
+    if stat.st_size == 0:
+        return False
+
+    try:
+        sha, size, mtime = read_checksum(path)
+    except FileNotFoundError:
+        return True
+
+    if size is not None and size != stat.st_size:
+        return False
+
+    if verify or size is None or mtime != stat.st_mtime_ns:
+        return file_checksum(path) == sha
+
+    return True
+
+@contextmanager
+def atomic_path(path: Union[str, Path]) -> Iterator[Path]:
+    """Yield a temporary path that is moved to ``path`` on success.
+
+    The temporary file sits next to ``path``, on the same file system, and
+    keeps its suffix for writers that infer the format from it. A checksum,
+    with the size and mtime that ``is_valid_cache`` checks, is stored
+    alongside the final file. Nothing is moved if the block raises or writes
+    nothing.
+
+    The file is moved before its checksum, so that a reader never pairs a
+    new checksum with old data; the reverse (a new file with an old
+    checksum) fails ``is_valid_cache``, and readers then wait on the lock
+    held by the writer.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".tmp.{uuid.uuid4().hex[:8]}.{path.name}")
+    try:
+        yield tmp
+        if tmp.exists():
+            stat = tmp.stat()
+            checksum_path(tmp).write_text(
+                f"{file_checksum(tmp)} {stat.st_size} {stat.st_mtime_ns}\n"
+            )
+            os.replace(tmp, path)
+            os.replace(checksum_path(tmp), checksum_path(path))
+
+    finally:
+        for leftover in (tmp, checksum_path(tmp)):
+            if leftover.exists():
+                leftover.unlink()
+
+@contextmanager
+def cache_lock(
+    path: Union[str, Path],
+    poll: float = 1.0,
+    stale: float = CACHE_LOCK_STALE,
+) -> Iterator[Path]:
+    """Hold an exclusive lock on a cache file across processes and hosts.
+
+    The lock is a ``.lock`` file created with ``O_EXCL``, which, unlike
+    ``flock``, also works on NFS. Locks left by dead processes on this host,
+    or older than ``stale`` seconds, are broken, see ``_break_stale_lock``.
+    """
+    lock = Path(path).with_name(Path(path).name + ".lock")
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _break_stale_lock(lock, stale):
+                time.sleep(poll)
+            continue
+
+        with os.fdopen(fd, "w") as f:
+            f.write(owner)
+        break
+
+    try:
+        yield lock
+    finally:
+        with suppress(FileNotFoundError):
+            lock.unlink()
+
+def _break_stale_lock(lock: Path, stale: float) -> bool:
+    """Remove ``lock`` if it is stale, returning whether it was removed.
+
+    The lock is first moved aside, which is atomic, and only removed if it
+    is still the file found stale; a lock taken by another process in the
+    meantime is put back.
+    """
+    try:
+        with open(lock) as f:
+            found = os.fstat(f.fileno())
+            owner = f.read()
+    except FileNotFoundError:
+        return False
+
+    if not _is_stale_lock(owner, found.st_mtime, stale):
+        return False
+
+    aside = lock.with_name(f".tmp.{uuid.uuid4().hex[:8]}.{lock.name}")
+    try:
+        os.rename(lock, aside)
+    except FileNotFoundError:
+        return False
+
+    moved = aside.stat()
+    if (moved.st_ino, moved.st_mtime_ns) != (found.st_ino, found.st_mtime_ns):
+        with suppress(FileExistsError):
+            os.link(aside, lock)
+        aside.unlink()
+        return False
+
+    warnings.warn(f"Breaking stale lock: {lock}")
+    aside.unlink()
+    return True
+
+def _is_stale_lock(owner: str, mtime: float, stale: float) -> bool:
+    host, __, pid = owner.partition(":")
+    if host == socket.gethostname() and pid.isdigit():
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+
+    return time.time() - mtime > stale
+
+@contextmanager
+def open_text_stream(
+    src: Union[str, Path],
+    compression: Optional[str] = None,
+    headers: Dict = HEADER,
+) -> Iterator[TextIO]:
+    """Open a local path or URL as a text stream, decompressing on the fly.
+
+    Unlike ``pd.read_csv(url)``, which buffers the whole response in memory,
+    the returned handle only ever holds one read buffer of the source.
+    """
+    if urlparse(str(src)).scheme in ("http", "https", "ftp"):
+        raw = urlopen(Request(str(src), None, headers=headers))
+    else:
+        raw = open(src, "rb")
+
+    try:
+        if compression == "gzip":
+            raw_ = gzip.GzipFile(fileobj=raw)
+        elif compression is None:
+            raw_ = raw
+        else:
+            raise ValueError(f"Unsupported compression for streaming: {compression}")
+
+        yield io.TextIOWrapper(raw_, encoding="utf-8")
+
+    finally:
+        raw.close()
+
+def download_file(
+    url: str,
+    path: Union[str, Path],
+    headers: Dict = HEADER,
+) -> Path:
+    """Download a URL to a file without holding it in memory.
+
+    The download is written next to ``path`` and renamed on completion, so
+    an interrupted download never looks like a finished one.
+    """
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    part = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+    with urlopen(Request(url, None, headers=headers)) as response, \
+            open(part, "wb") as f:
+        shutil.copyfileobj(response, f, length=1 << 20)
+
+    part.replace(path)
+
+    return path
+
+def stream_to_parquet(
+    handle: TextIO,
+    path: Union[str, Path],
+    chunksize: int = STREAM_CHUNKSIZE,
+    **kwargs,
+) -> Path:
+    """Convert a delimited text stream to parquet, one row group per chunk.
+
+    Peak memory is bounded by ``chunksize`` rows rather than by the size of
+    the file. The parquet schema is taken from the first chunk and widened
+    when a later chunk does not fit it (e.g. a clinical column that is empty
+    until row 10,000, or chromosome names that are numeric until ``X``); the
+    row groups already written are then rewritten under the wider schema, so
+    pinning such columns with ``dtype`` avoids the extra pass.
+
+    Parameters
+    ----------
+    handle : TextIO
+        Open text stream, e.g. from ``open_text_stream``.
+    path : str or Path
+        Output parquet file.
+    chunksize : int
+        Number of rows per chunk and parquet row group.
+    **kwargs
+        Passed to ``pd.read_csv``.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer, schema = None, None
+    try:
+        for chunk in pd.read_csv(handle, chunksize=chunksize, **kwargs):
+            if writer is None:
+                schema = _stream_schema(chunk)
+                writer = pq.ParquetWriter(path, schema)
+
+            try:
+                table = pa.Table.from_pandas(chunk, schema=schema,
+                                             preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                schema = _promote_schema(schema, _stream_schema(chunk))
+                writer.close()
+                writer = _rewrite_parquet(path, schema)
+                try:
+                    table = pa.Table.from_pandas(chunk, schema=schema,
+                                                 preserve_index=False)
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                    raise ValueError(
+                        "Chunk does not match the schema of earlier chunks; "
+                        "pin column types with `dtype`."
+                    ) from e
+
+            writer.write_table(table)
+
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        warnings.warn(f"Stream is empty. Not writing to cache: {path}")
+
+    return Path(path)
+
+def xena_stream_dtype(columns: List[str], data_type: Optional[str] = None) -> Dict:
+    """Pin column types for streaming a UCSC Xena file.
+
+    Xena files lead with an identifier column (feature for genomic matrices,
+    sample otherwise). Segment files follow it with the chromosome, which is
+    read as a string so that numeric and sex chromosomes share one type.
+    """
+    dtype = {columns[0]: str}
+    if data_type == "genomicMatrix":
+        dtype.update({col: "float64" for col in columns[1:]})
+
+    elif data_type == "genomicSegment":
+        dtype[columns[1]] = str
+
+    return dtype
+
+def _stream_schema(chunk: pd.DataFrame):
+    """Arrow schema for the first chunk, with all-null columns typed as string."""
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+
+    return schema
+
+def _promote_schema(schema, other):
+    """Widen ``schema`` so that chunks typed as ``other`` also fit.
+
+    Numeric columns that disagree become float64; any other disagreement,
+    e.g. a column that was empty so far and holds text now, becomes string.
+    """
+    import pyarrow as pa
+
+    for i, field in enumerate(schema):
+        new = other.field(field.name).type
+        if new == field.type:
+            continue
+
+        numeric = all(pa.types.is_integer(t) or pa.types.is_floating(t)
+                      for t in (field.type, new))
+        dtype = pa.float64() if numeric else pa.string()
+        schema = schema.set(i, field.with_type(dtype))
+
+    return schema
+
+def _rewrite_parquet(path: Union[str, Path], schema):
+    """Cast a parquet file to ``schema`` and return a writer to append to it.
+
+    Row groups are rewritten one at a time, so memory stays bounded by the
+    row group size.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    part = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+    os.replace(path, part)
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        written = pq.ParquetFile(part)
+        for i in range(written.num_row_groups):
+            writer.write_table(written.read_row_group(i).cast(schema))
+
+    except BaseException:
+        writer.close()
+        raise
+
+    finally:
+        part.unlink()
+
+    return writer
+
 def check_package_version(package: str, version: str = None) -> bool:
     """Check if package is installed and at least a certain version."""
     try:
@@ -90,7 +777,8 @@ def fuzzy_match(k: List, v: List, deduped: bool = False) -> Dict:
         Samples in Dict values (<- "... with these").
         Should be the shorter list.
     deduped : boolean, default=False
-        Is input unique?
+        Is input unique? Kept for compatibility; inputs are always
+        deduplicated.
 
     Returns
     -------
@@ -98,7 +786,8 @@ def fuzzy_match(k: List, v: List, deduped: bool = False) -> Dict:
 
     Notes
     -----
-    Lightweight, fast version of fuzzy matching.
+    Lightweight, fast version of fuzzy matching. IDs match when the shorter
+    one is a prefix of the longer one; see ``match_barcodes``.
 
     For a more robust version, see:
     [dirty_cat.fuzzy_join]
@@ -115,24 +804,65 @@ def fuzzy_match(k: List, v: List, deduped: bool = False) -> Dict:
 
     Example
     -------
+    >>> fuzzy_match(["TCGA-02-0001-01C", "TCGA-02-0003-01A"], ["TCGA-02-0001"])
+    {'TCGA-02-0001-01C': 'TCGA-02-0001'}
+    """
+    keys = pd.Series(pd.unique(pd.Series(k, dtype=object).dropna()), dtype=object)
+    matched = match_barcodes(keys, v)
+
+    n_unmatched = matched.isna().sum()
+    if n_unmatched > 0:
+        warnings.warn(f"{n_unmatched} of {len(keys)} IDs could not be matched.")
+
+    return dict(zip(keys[matched.notna()], matched.dropna()))
+
+def match_barcodes(k: pd.Series, v: List) -> pd.Series:
+    """Match IDs to IDs that they extend, or that extend them, by prefix.
+
+    Vectorized matcher for barcodes of varying completeness, such as TCGA
+    aliquot, sample and donor IDs. Each ID in ``k`` is matched to the longest
+    ID in ``v`` that is a prefix of it or, failing that, to the first (in
+    sort order) ID in ``v`` that it is a prefix of.
+
+    IDs are indexed by length, so the cost is linear in the number of IDs
+    times the number of distinct ID lengths, which is small for barcodes.
 
+    Parameters
+    ----------
+    k : pd.Series
+        IDs to match. May contain duplicates and NaN.
+    v : List
+        IDs to match to.
+
+    Returns
+    -------
+    pd.Series aligned to ``k`` with the matched ID from ``v``, or NaN.
     """
-    k_, v_ = k, v
-    if deduped is False:
-        k_, v_ = list(set(k)), list(set(v))
+    k = pd.Series(k, dtype=object)
+    keys = pd.Series(pd.unique(k.dropna()), dtype=object).astype(str)
+    vals = pd.Series(pd.unique(pd.Series(v, dtype=object).dropna()),
+                     dtype=object).astype(str).sort_values(ignore_index=True)
+    key_len, val_len = keys.str.len().to_numpy(), vals.str.len().to_numpy()
 
-    # Remove nan
-    rm_nan = lambda x: [i for i in x if pd.notnull(i)]
-    k_, v_ = rm_nan(k_), rm_nan(v_)
-        
-    match_dict = {}
-    for v in tqdm.tqdm(v_):
-        for k in k_:
-            seq_match = SequenceMatcher(None, k, v)
-            match_size = seq_match.find_longest_match().size
-            
-            if (match_size == len(k) or match_size == len(v)):
-                match_dict[k] = v
-                break
-
-    return match_dict
\ No newline at end of file
+    matched = np.full(len(keys), None, dtype=object)
+
+    # IDs in v that are a prefix of the key; longer prefixes overwrite shorter
+    for n in np.unique(val_len):
+        index = pd.Index(vals[val_len == n])
+        pos = index.get_indexer(keys.str[:n])
+        hit = pos >= 0
+        matched[hit] = index.to_numpy()[pos[hit]]
+
+    # Keys that are a prefix of IDs in v
+    for n in np.unique(key_len):
+        todo = (key_len == n) & pd.isna(matched)
+        if not todo.any():
+            continue
+
+        longer = val_len > n
+        first_by_prefix = (pd.Series(vals[longer].to_numpy(),
+                                     index=vals[longer].str[:n].to_numpy())
+                           .groupby(level=0).first())
+        matched[todo] = keys[todo].map(first_by_prefix).to_numpy()
+
+    return k.map(pd.Series(matched, index=keys.to_numpy(), dtype=object))
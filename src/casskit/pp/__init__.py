@@ -1,7 +1,7 @@
 from pkgutil import extend_path
 
-from . import copynumber, expression
+from . import copynumber, expression, norm
 from .expression import GTEx
 
-__all__ = ["copynumber", "expression", "GTEx"]
+__all__ = ["copynumber", "expression", "norm", "GTEx"]
 __path__ = extend_path(__path__, __name__)
\ No newline at end of file
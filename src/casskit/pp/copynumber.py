@@ -1,25 +1,55 @@
+from typing import Optional
+import warnings
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import scipy.sparse as sp
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from .generics import take_columns
+from ..io.descriptors import OneOf
+from ..io.segments import CommonRegionMatrix
+
 
 __all__ = ["ThinCopynumber", "DiploidGISTIC"]
 
 
 class ThinCopynumber(BaseEstimator, TransformerMixin):
-    """Thin copynumber data to decrease correlations."""
+    """Thin copynumber data to decrease correlations.
+
+    Columns are expected in genomic order. With ``dups_corr_window`` set,
+    each column is only compared with that many preceding columns when
+    dropping correlated duplicates, rather than with every column.
+
+    Thinning then scans the columns once, either keeping a column when its
+    AR(1) residual on the last kept column retains at least ``thin_ar`` of
+    its variance (``thin_method="ar"``), or splitting the columns into
+    windows wherever adjacent columns correlate less than ``thin_corr`` and
+    keeping the centre column of each (``thin_method="window"``).
+
+    ``CommonRegionMatrix`` input is thinned a block of regions at a time,
+    and never densified in full.
+    """
     def __init__(
         self,
         drop_duplicates: bool = True,
         dups_tol_abs: int = 0,
         dups_tol_corr: float = 0.9,
+        dups_corr_window: Optional[int] = None,
         thinning: bool = True,
         thin_ar: float = 0.5,
+        thin_method: str = "ar",
+        thin_corr: float = 0.9,
     ) -> None:
         self.drop_duplicates = drop_duplicates
         self.dups_tol_abs = dups_tol_abs
         self.dups_tol_corr = dups_tol_corr
+        self.dups_corr_window = dups_corr_window
         self.thinning = thinning
         self.thin_ar = thin_ar
+        self.thin_method = thin_method
+        self.thin_corr = thin_corr
     
     def fit(self, X, y=None):
         return self
@@ -29,6 +59,7 @@ class ThinCopynumber(BaseEstimator, TransformerMixin):
         return self.transform(X)
 
     def transform(self, X, y=None):
+        X_tform = X
         if self.drop_duplicates:
             X_tform = self.drop_dups(X)
         
@@ -48,39 +79,159 @@ class ThinCopynumber(BaseEstimator, TransformerMixin):
         
         return X
     
-    def drop_dups_abs(self, X):
-        """Coarsen copynumber and drop duplicate columns."""
-        if self.dups_tol_abs == 0:
-            return X.drop_duplicates()
+    def drop_dups_abs(self, X, block_size: int = 1024):
+        """Coarsen copynumber and drop duplicate columns.
 
-        else:
-            X_coarse = X.round(self.dups_tol_abs)
-            return X.loc[X_coarse.drop_duplicates().index]
+        Values are rounded to ``dups_tol_abs`` decimals, and columns equal
+        to a preceding column (missing values included) are dropped.
+        Columns are compared by hash, a block of columns at a time.
+        """
+        hashes = np.empty(X.shape[1], dtype=np.uint64)
+        for start, stop, block in _column_blocks(X, block_size):
+            if self.dups_tol_abs:
+                block = np.round(block, self.dups_tol_abs)
+            hashes[start:stop] = pd.util.hash_pandas_object(pd.DataFrame(block.T),
+                                                            index=False)
+
+        return take_columns(X, ~pd.Series(hashes).duplicated().to_numpy())
     
-    def drop_dups_corr(self, X):
-        """Drop duplicate columns with absolute correlation greater than tolerance."""
-        # https://stackoverflow.com/questions/17778394/list-highest-correlation-pairs-from-a-large-correlation-matrix-in-pandas
-        dups = set()
-        corr_matrix = X.corr().abs()
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i):
-                if corr_matrix.iloc[i, j] > self.dups_tol_corr:
-                    colname = corr_matrix.columns[i]
-                    dups.add(colname)
-        
-        return X.drop(columns=dups)
+    def drop_dups_corr(self, X, block_size: int = 1024):
+        """Drop duplicate columns with absolute correlation greater than tolerance.
+
+        A column is dropped if it is correlated with any preceding column,
+        or any of the ``dups_corr_window`` preceding columns if set.
+        Correlations are computed for blocks of columns at a time, in
+        float32, and missing values are imputed with column means.
+        """
+        Z = standardize_columns(X)
+        n_cols = Z.shape[1]
+        window = self.dups_corr_window
+        dups = np.zeros(n_cols, dtype=bool)
+        for start in range(0, n_cols, block_size):
+            stop = min(start + block_size, n_cols)
+            lo = 0 if window is None else max(0, start - window)
+            Z_block = Z[:, start:stop]
+            i = np.arange(start, stop)[:, None]
+            for lo_start in range(lo, stop, block_size):
+                lo_stop = min(lo_start + block_size, stop)
+                corr = np.abs(Z_block.T @ Z[:, lo_start:lo_stop])
+
+                # Only compare with preceding columns, within the window
+                j = np.arange(lo_start, lo_stop)[None, :]
+                preceding = (j < i) if window is None else (j < i) & (j >= i - window)
+                dups[start:stop] |= ((corr > self.dups_tol_corr) & preceding).any(axis=1)
 
-    def thin(self, X):
+        return take_columns(X, ~dups)
+
+    def thin(self, X, block_size: int = 256):
         """Thin copynumber data to decrease correlations."""
-        # Thin copynumber data to decrease correlations
-        if self.thin_ar:
-            X = self.thin_ar(X)
-        
-        return X
+        OneOf("ar", "window").validate(self.thin_method)
+        if X.shape[1] == 0:
+            return X
+
+        Z = standardize_columns(X)
+        if self.thin_method == "ar":
+            keep = thin_ar_residual(Z, self.thin_ar, block_size)
+        else:
+            keep = thin_windows(Z, self.thin_corr, block_size)
+
+        return take_columns(X, keep)
+
+
+def thin_ar_residual(Z: np.ndarray, min_resid: float, block_size: int = 256) -> np.ndarray:
+    """Columns kept by an AR(1)-residual scan of standardized columns.
+
+    Each column is regressed on the last kept column; it is kept, and
+    becomes the new reference, if the residual retains at least
+    ``min_resid`` of its variance, i.e. ``1 - phi**2 >= min_resid``.
+    Columns are compared a block at a time.
+    """
+    n_cols = Z.shape[1]
+    keep, j = [0], 1
+    while j < n_cols:
+        phi = Z[:, keep[-1]] @ Z[:, j:j+block_size]
+        new = np.flatnonzero(1 - phi**2 >= min_resid)
+        if new.size:
+            j += new[0]
+            keep.append(j)
+            j += 1
+        else:
+            j += block_size
+
+    return np.array(keep)
+
+def thin_windows(Z: np.ndarray, min_corr: float, block_size: int = 256) -> np.ndarray:
+    """Centre columns of windows of adjacent columns correlated above ``min_corr``."""
+    adjacent = np.empty(Z.shape[1] - 1, dtype=np.float32)
+    for start in range(0, adjacent.size, block_size):
+        Z_block = Z[:, start:start+block_size+1]
+        adjacent[start:start+block_size] = np.einsum("ij,ij->j", Z_block[:, :-1],
+                                                     Z_block[:, 1:])
+    starts = np.flatnonzero(np.r_[True, np.abs(adjacent) < min_corr])
+    stops = np.r_[starts[1:], Z.shape[1]]
+
+    return (starts + stops - 1) // 2
+
+
+def standardize_columns(X) -> np.ndarray:
+    """Scale columns so that ``Z.T @ Z`` is their correlation matrix.
+
+    Missing values are set to the column mean, and constant columns to 0.
+    A ``CommonRegionMatrix`` gives ``StandardizedRegions``, which
+    standardizes the regions it is sliced to.
+    """
+    if isinstance(X, CommonRegionMatrix):
+        return StandardizedRegions(X)
 
+    Z = np.array(X, dtype=np.float32)
+    with warnings.catch_warnings():
+        # All-missing columns
+        warnings.simplefilter("ignore", RuntimeWarning)
+        Z -= np.nanmean(Z, axis=0)
+    np.nan_to_num(Z, copy=False)
+    norm = np.sqrt(np.einsum("ij,ij->j", Z, Z))
+    Z /= np.where(norm > 0, norm, 1)
+
+    return Z
+
+class StandardizedRegions:
+    """Standardized columns of a ``CommonRegionMatrix``, densified when sliced.
+
+    Standardization is per column, so ``Z[:, start:stop]`` (or ``Z[:, j]``)
+    only densifies those regions.
+    """
+    def __init__(self, X: CommonRegionMatrix):
+        self.X = X
+        self.shape = X.shape
+
+    def __getitem__(self, key):
+        rows, columns = key
+        if rows != slice(None):
+            raise IndexError("Only columns can be selected")
+
+        if isinstance(columns, (int, np.integer)):
+            return self[:, columns:columns+1][:, 0]
+
+        return standardize_columns(self.X.to_numpy(regions=columns))
+
+def _column_blocks(X, block_size: int):
+    """(start, stop, dense block) for blocks of columns of X."""
+    values = X if isinstance(X, CommonRegionMatrix) else np.asarray(X)
+    for start in range(0, X.shape[1], block_size):
+        stop = min(start + block_size, X.shape[1])
+        if isinstance(values, CommonRegionMatrix):
+            yield start, stop, values.to_numpy(regions=slice(start, stop))
+        else:
+            yield start, stop, values[:, start:stop]
 
 class DiploidGISTIC(BaseEstimator, TransformerMixin):
-    """Bin near-diploid values to diploid."""
+    """Bin near-diploid values to diploid.
+
+    Missing values are also set to diploid. Accepts frames backed by
+    NumPy, sparse or Arrow arrays, NumPy arrays, SciPy sparse matrices and
+    ``CommonRegionMatrix``, and returns the same kind of object with the
+    same dtype.
+    """
     def __init__(
         self,
         min_dip: float = 1.7,
@@ -94,19 +245,92 @@ class DiploidGISTIC(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
-    def fit_transform(self, X, y=None):
+    def fit_transform(self, X, y=None, out=None):
         """Override mixin fit_transform."""
-        return self.transform(X)
+        return self.transform(X, out=out)
 
-    def transform(self, X, y=None):
+    def transform(self, X, y=None, out=None):
+        """Bin X into a single copy, or into ``out``.
+
+        ``out`` is an array shaped like dense X (X itself, to bin an array
+        in place); X is never modified otherwise. Sparse matrices are binned
+        on their stored values only, and region matrices on their runs,
+        with regions a sample has no segment in set to diploid; both ignore
+        ``out``.
+        """
+        lo, hi, diploid = self._diploid_range()
+        if isinstance(X, CommonRegionMatrix):
+            filled = X.fill_gaps(diploid)
+            return filled.with_values(bin_diploid(filled.run_values, lo, hi, diploid))
+
+        if sp.issparse(X):
+            return _bin_sparse(X, lo, hi, diploid)
+
+        if not isinstance(X, pd.DataFrame):
+            if out is None:
+                out = np.empty_like(X)
+            return bin_diploid(X, lo, hi, diploid, out=out)
+
+        dtypes = set(map(type, X.dtypes))
+        if dtypes == {pd.SparseDtype}:
+            binned = _bin_sparse(X.sparse.to_coo().tocsc(), lo, hi, diploid)
+            return pd.DataFrame({
+                name: pd.arrays.SparseArray.from_spmatrix(binned[:, [j]])
+                for j, name in enumerate(X.columns)
+            }, index=X.index)
+
+        if pd.ArrowDtype in dtypes and out is None:
+            # Column by column, wrapping the binned arrays without copying
+            return pd.DataFrame({
+                name: pd.arrays.ArrowExtensionArray(pa.array(bin_diploid(
+                    np.array(column.to_numpy(), dtype=_numpy_dtype(column.dtype)),
+                    lo, hi, diploid
+                )))
+                for name, column in X.items()
+            }, index=X.index)
+
+        values = bin_diploid(X.to_numpy(copy=out is None), lo, hi, diploid, out=out)
+        return pd.DataFrame(values, index=X.index, columns=X.columns, copy=False)
+
+    def _diploid_range(self):
+        """Near-diploid bounds and the diploid value, in ``units``."""
         if self.units == "log2(copy-number/2)":
-            X_tform = X.mask(
-                lambda df: (df >= np.log2(self.min_dip/2)) & (df <= np.log2(self.max_dip/2))
-            ).fillna(0)
+            return np.log2(self.min_dip/2), np.log2(self.max_dip/2), 0
 
         elif self.units == "counts":
-            X_tform = X.mask(
-                lambda df: (df >= self.min_dip) & (df <= self.max_dip)
-            ).fillna(2)
+            return self.min_dip, self.max_dip, 2
+
+        raise ValueError(f"Unknown units {self.units!r}")
+
+def bin_diploid(values, lo, hi, diploid, out=None, block_size: int = 1 << 20):
+    """Set values in [lo, hi], or missing, to ``diploid``.
+
+    Bins ``values`` in place, or into ``out``, a block of rows at a time so
+    the temporary mask stays small.
+    """
+    values = np.asarray(values)
+    if out is None:
+        out = values
+    elif out is not values:
+        np.copyto(out, values)
+
+    rows = max(1, block_size // max(1, out[:1].size))
+    for i in range(0, out.shape[0], rows):
+        block = out[i:i+rows]
+        np.putmask(block, ~((block < lo) | (block > hi)), diploid)
+
+    return out
+
+def _bin_sparse(X, lo, hi, diploid):
+    """Bin the stored values of a SciPy sparse matrix."""
+    X = X.copy()
+    bin_diploid(X.data, lo, hi, diploid)
+    if diploid == 0:
+        X.eliminate_zeros()
+
+    return X
 
-        return X_tform
\ No newline at end of file
+def _numpy_dtype(dtype):
+    """NumPy dtype of a pandas (e.g. Arrow-backed) dtype, floating if integer."""
+    dtype = np.dtype(getattr(dtype, "numpy_dtype", dtype))
+    return dtype if dtype.kind == "f" else np.dtype(np.float64)
@@ -1,22 +1,47 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Union
 import warnings
 
+from joblib import effective_n_jobs
 import numpy as np
 import pandas as pd
-from qtl import norm as qtl_norm
-from scipy import stats
+import pyarrow as pa
+from scipy import special, stats
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.pipeline import Pipeline
+from sklearn.utils.validation import check_is_fitted
 
-from .generics import VariationThreshold
+from .norm import (
+    calc_norm_factors,
+    reference_sample,
+    tmm_factors,
+    upper_quartile_factors,
+)
+from .generics import ColumnSelectorMixin, take_columns
 from .units import ToCounts
-from ..data.io.annot import get_ensembl
-from ..data.io.descriptors import OneOf
+from ..io.annot import get_ensembl_gene_ids
+from ..io.descriptors import OneOf
+from ..io.utils import atomic_path
 
 
 class GTEx(BaseEstimator, TransformerMixin):
     """
     https://github.com/broadinstitute/gtex-pipeline/blob/master/qtl/leafcutter/src/cluster_prepare_fastqtl.py    
+
+    Counts are TMM-normalized to CPM, and protein-coding genes kept if
+    expressed above ``min_cpm`` in at least ``max_freq_zero`` of samples,
+    with coefficient of variation at least ``cv2_min``, then RINT.
+
+    Fitting picks the TMM reference sample and the genes to keep, so
+    ``transform`` only normalizes new samples against that reference.
+    ``partial_fit`` updates the gene filters one batch of samples at a
+    time, with the reference and TMM scale fixed by the first batch.
+
+    ``lib_size``, if given, holds the library sizes of the samples passed
+    to ``fit``. ``transform`` reuses them for fitted samples of a frame,
+    recognized by their index, so that ``fit(X).transform(X)`` matches
+    ``fit_transform(X)``; other samples use their total counts, unless
+    ``lib_size`` is passed to ``transform``.
     """
     
     def __init__(
@@ -27,6 +52,7 @@ class GTEx(BaseEstimator, TransformerMixin):
         min_cpm: float = 1,
         max_freq_zero: float = 0.3,
         cv2_min: float = 0.8,
+        assembly: str = "GRCh37",
     ):
         self.units = units
         self.lib_size = lib_size
@@ -34,71 +60,345 @@ class GTEx(BaseEstimator, TransformerMixin):
         self.min_cpm = min_cpm
         self.max_freq_zero = max_freq_zero
         self.cv2_min = cv2_min
+        self.assembly = assembly
 
-    @property
-    def gtex_preprocess(self) -> Pipeline:
-        gtex_pipe = [
-            ("As counts", ToCounts(units=self.units)),
-            ("TMM", EdgeRCPM(lib_size=self.lib_size)),
-            ("Protein coding", ProteinCoding()),
-            ("Filter low expression", CountThreshold(self.min_cpm, self.max_freq_zero)),
-            ("Filter low variance", VariationThreshold(self.cv2_min))
-        ]
-        
-        if self.rint is True:
-            gtex_pipe.append(("RINT", RINT()))
+    def fit(self, X, y=None):
+        self._reset()
+        self._partial_fit(self._counts(X), X, self.lib_size)
+        return self
 
-        return Pipeline(gtex_pipe)
+    def partial_fit(self, X, y=None):
+        """Update gene filters with a batch of samples."""
+        counts = self._counts(X)
+        if hasattr(self, "n_samples_seen_"):
+            counts = self._align(counts, X)
 
-    def fit(self, X, y=None):
-        self.gtex_preprocess.fit(X)
+        self._partial_fit(counts, X)
         return self
 
-    def transform(self, X):
-        self.fit(X)
-        return self.gtex_preprocess.transform(X)
+    def transform(self, X, lib_size=None):
+        """Normalize samples against the fitted reference, keeping fitted genes."""
+        check_is_fitted(self, "genes_")
+        counts = self._align(self._counts(X), X)
+        if lib_size is not None:
+            lib_size = np.asarray(lib_size, dtype=np.float64)
+        else:
+            lib_size = counts.sum(axis=1)
+            if (self.lib_size is not None and isinstance(X, pd.DataFrame)
+                    and self.samples_seen_.is_unique):
+                ix = self.samples_seen_.get_indexer(X.index)
+                seen = ix >= 0
+                lib_size[seen] = self.lib_size_[ix[seen]]
+        tmm = tmm_factors(counts.T, self.ref_counts_) / self.tmm_scale_
+
+        return self._normalize(counts, lib_size, tmm, X)
     
     def fit_transform(self, X, y=None):
         """Custom fit_transform method for checks."""
-        self.transformed = self.gtex_preprocess.fit_transform(X)
+        self._reset()
+        counts = self._counts(X)
+        lib_size, tmm = self._partial_fit(counts, X, self.lib_size)
+        self.transformed = self._normalize(counts, lib_size, tmm, X)
         return self.transformed
 
+    def _counts(self, X) -> np.ndarray:
+        return np.asarray(ToCounts(units=self.units).transform(X), dtype=np.float64)
+
+    def _align(self, counts, X) -> np.ndarray:
+        """Columns of counts in the order of fitted genes."""
+        columns = pd.Index(getattr(X, "columns", range(counts.shape[1])))
+        if columns.equals(self.feature_names_in_):
+            return counts
+
+        ix = columns.get_indexer(self.feature_names_in_)
+        if (ix < 0).any():
+            raise ValueError(f"{np.count_nonzero(ix < 0)} fitted genes missing from X")
+
+        return counts[:, ix]
+
+    def _reset(self):
+        """Forget fitted samples, so the next batch starts a new fit."""
+        if hasattr(self, "n_samples_seen_"):
+            del self.n_samples_seen_
+
+    def _partial_fit(self, counts, X, lib_size=None):
+        """Update fitted state with counts, returning their library sizes and TMM."""
+        if not hasattr(self, "n_samples_seen_"):
+            self.feature_names_in_ = pd.Index(
+                getattr(X, "columns", range(counts.shape[1]))
+            )
+            self.protein_coding_ = (ProteinCoding(self.assembly)
+                                    .biotype_mask(self.feature_names_in_))
+            self.ref_counts_ = counts[reference_sample(counts.T)]
+
+            self.n_samples_seen_ = 0
+            self.samples_seen_ = pd.Index([])
+            self.lib_size_, self.tmm_ = np.empty(0), np.empty(0)
+            self.n_ge_min_cpm_ = np.zeros(counts.shape[1])
+            self.cpm_n_ = np.zeros(counts.shape[1])
+            self.cpm_mean_ = np.zeros(counts.shape[1])
+            self.cpm_m2_ = np.zeros(counts.shape[1])
+
+        tmm = tmm_factors(counts.T, self.ref_counts_)
+        if self.n_samples_seen_ == 0:
+            self.tmm_scale_ = np.exp(np.mean(np.log(tmm)))
+        tmm /= self.tmm_scale_
+
+        lib_size = counts.sum(axis=1) if lib_size is None else np.asarray(lib_size)
+        cpm = counts / (lib_size * tmm)[:, None] * 1e6
+        self._update_gene_stats(len(cpm), *_expression_stats(cpm, self.min_cpm))
+        self.samples_seen_ = self.samples_seen_.append(
+            pd.Index(getattr(X, "index", range(len(counts))))
+        )
+        self.lib_size_ = np.concatenate([self.lib_size_, lib_size])
+        self.tmm_ = np.concatenate([self.tmm_, tmm])
+
+        return lib_size, tmm
+
+    def _update_gene_stats(self, n_samples, n_ge_min_cpm, n, mean, m2):
+        """Merge per-gene CPM statistics of a batch, and reselect genes.
+
+        Statistics are as from ``_expression_stats``, merged with Chan et
+        al.'s update; genes with no values in the batch are left unchanged.
+        """
+        n_seen = self.cpm_n_
+        self.n_samples_seen_ += n_samples
+        self.n_ge_min_cpm_ += n_ge_min_cpm
+        self.cpm_n_ = n_seen + n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(n > 0, n / self.cpm_n_, 0)
+        delta = np.where(n > 0, mean - self.cpm_mean_, 0)
+        self.cpm_mean_ += delta * weight
+        self.cpm_m2_ += m2 + delta**2 * n_seen * weight
+
+        self.support_ = np.flatnonzero(self._gene_filter(
+            self.n_samples_seen_, self.n_ge_min_cpm_, self.cpm_n_,
+            self.cpm_mean_, self.cpm_m2_, self.protein_coding_
+        ))
+        self.genes_ = self.feature_names_in_[self.support_]
+
+    def _gene_filter(self, n_samples, n_ge_min_cpm, n, mean, m2,
+                     protein_coding) -> np.ndarray:
+        """Protein-coding genes passing ``_expression_filter``."""
+        return protein_coding & _expression_filter(
+            n_samples, n_ge_min_cpm, n, mean, m2,
+            self.max_freq_zero, self.cv2_min
+        )
+
+    def _normalize(self, counts, lib_size, tmm, X):
+        cpm = counts[:, self.support_] / (lib_size * tmm)[:, None] * 1e6
+        if self.rint is True:
+            cpm = RINT.rank_inverse_normal_transform(cpm)
+        if not isinstance(X, pd.DataFrame):
+            return cpm
+
+        return pd.DataFrame(cpm, index=X.index, columns=self.genes_, copy=False)
+
+    def fit_transform_parquet(
+        self,
+        source: Union[str, Path],
+        path: Union[str, Path],
+        batch_size: int = 1000,
+        sample_block_size: int = 500,
+    ) -> Path:
+        """Preprocess a parquet expression matrix that does not fit in memory.
+
+        Runs the same steps as ``fit_transform`` over a table laid out like
+        the Xena caches, with a leading gene ID column and one column per
+        sample. Library sizes and TMM factors are computed over blocks of
+        ``sample_block_size`` samples, then filtered and normalized genes
+        are written to ``path``, in the same layout, ``batch_size`` genes
+        at a time. Each step is exact, so the output matches
+        ``fit_transform`` on the transposed matrix, up to column order.
+
+        Leaves the estimator fitted, as by ``fit``, so that ``transform``
+        and ``partial_fit`` can follow.
+        """
+        import pyarrow.parquet as pq
+
+        table = pq.ParquetFile(source)
+        id_col, *samples = table.schema_arrow.names
+        to_counts = ToCounts(units=self.units).transform
+        sample_blocks = {i: samples[i:i+sample_block_size]
+                         for i in range(0, len(samples), sample_block_size)}
+
+        def read_samples(block):
+            return to_counts(_as_matrix(table.read(columns=block)))
+
+        # Pass 1, over genes: library sizes and genes expressed in any sample
+        totals = np.zeros(len(samples))
+        expressed = []
+        for batch in table.iter_batches(batch_size, columns=samples):
+            counts = to_counts(_as_matrix(batch))
+            totals += np.nansum(counts, axis=0)
+            expressed.append((counts > 0).any(axis=1))
+        expressed = np.concatenate(expressed)
+
+        # Passes 2 and 3, over samples: TMM reference, then factors
+        f75 = np.concatenate([
+            upper_quartile_factors(read_samples(block)[expressed],
+                                   totals[i:i+len(block)])
+            for i, block in sample_blocks.items()
+        ])
+        ref = samples[np.argmin(np.abs(f75 - f75.mean()))]
+        ref_counts = read_samples([ref])[:, 0]
+        tmm = np.concatenate([
+            tmm_factors(read_samples(block), ref_counts, totals[i:i+len(block)])
+            for i, block in sample_blocks.items()
+        ])
+        tmm_scale = np.exp(np.mean(np.log(tmm)))
+        tmm /= tmm_scale
+
+        lib_size = totals if self.lib_size is None else np.asarray(self.lib_size)
+
+        # Pass 4, over genes: filter, normalize and write
+        protein_coding = ProteinCoding(self.assembly)
+        schema = pa.schema([table.schema_arrow.field(id_col)]
+                           + [pa.field(sample, pa.float64()) for sample in samples])
+        gene_stats = []
+        with atomic_path(path) as tmp, pq.ParquetWriter(tmp, schema) as writer:
+            for batch in table.iter_batches(batch_size):
+                ids = batch.column(0)
+                cpm = to_counts(_as_matrix(batch.drop_columns(id_col)))
+                cpm = cpm / (lib_size * tmm) * 1e6
+
+                batch_stats = (ids.to_pandas(),
+                               *_expression_stats(cpm, self.min_cpm, axis=1))
+                keep = self._gene_filter(len(samples), *batch_stats[1:],
+                                         protein_coding.biotype_mask(batch_stats[0]))
+                gene_stats.append(batch_stats + (keep,))
+
+                cpm = cpm[keep]
+                if self.rint is True:
+                    cpm = RINT.rank_inverse_normal_transform(cpm.T).T
+                writer.write_table(pa.Table.from_arrays(
+                    [ids.filter(pa.array(keep)), *cpm.T], schema=schema
+                ))
+
+        # Fitted state, as from fit on the transposed matrix
+        ids, n_ge_min_cpm, n, mean, m2, keep = map(np.concatenate, zip(*gene_stats))
+        self.feature_names_in_ = pd.Index(ids)
+        self.protein_coding_ = protein_coding.biotype_mask(self.feature_names_in_)
+        self.ref_counts_, self.tmm_scale_ = ref_counts, tmm_scale
+        self.n_samples_seen_ = len(samples)
+        self.samples_seen_ = pd.Index(samples)
+        self.lib_size_, self.tmm_ = lib_size, tmm
+        self.n_ge_min_cpm_, self.cpm_n_ = n_ge_min_cpm, n
+        self.cpm_mean_, self.cpm_m2_ = mean, m2
+        self.support_ = np.flatnonzero(keep)
+        self.genes_ = self.feature_names_in_[self.support_]
+
+        return Path(path)
+
 class EdgeRCPM(BaseEstimator, TransformerMixin):
-    def __init__(self, lib_size: np.ndarray = None):
+    def __init__(self, lib_size: np.ndarray = None, method: str = "TMM"):
         self.lib_size = lib_size
+        self.method = method
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X):
-        return self.edger_cpm(X.T, self.lib_size).T
+        return self.edger_cpm(X.T, self.lib_size, self.method).T
 
     @staticmethod
-    def edger_cpm(counts_df, lib_size=None):
+    def edger_cpm(counts_df, lib_size=None, method: str = "TMM"):
         """
-        Reproduces qtl_norm.edger_cpm, which reproduces edgeR::cpm.DGEList,
-        with argument lib_size.
+        Reproduces qtl.norm.edger_cpm, which reproduces edgeR::cpm.DGEList,
+        with argument lib_size and normalization factors from ``method``.
         """
         if lib_size is None:
             lib_size = counts_df.sum(axis=0)
-        tmm = qtl_norm.edger_calcnormfactors(counts_df)
-        lib_size *= tmm
+        norm_factors = calc_norm_factors(counts_df, method=method)
         
-        return counts_df / lib_size * 1e6
+        return counts_df / (lib_size * norm_factors) * 1e6
+
+def _expression_stats(cpm: np.ndarray, min_cpm: float, axis: int = 0):
+    """Per-gene statistics that the expression filters are computed from.
+
+    Samples are along ``axis``. Returns the number of samples with at least
+    ``min_cpm``, and the number, mean and sum of squared deviations of
+    non-missing values, which merge across batches of samples (see
+    ``GTEx.partial_fit``).
+    """
+    n_ge_min_cpm = np.count_nonzero(cpm >= min_cpm, axis=axis)
+    n = cpm.shape[axis] - np.count_nonzero(np.isnan(cpm), axis=axis)
+    with warnings.catch_warnings():
+        # All-missing genes
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(cpm, axis=axis, dtype=np.float64)
+    m2 = np.nansum((cpm - np.expand_dims(mean, axis))**2, axis=axis)
+
+    return n_ge_min_cpm, n, mean, m2
+
+def _expression_filter(
+    n_samples: int,
+    n_ge_min_cpm: np.ndarray,
+    n: np.ndarray,
+    mean: np.ndarray,
+    m2: np.ndarray,
+    max_freq_zero: float,
+    cv2_min: float,
+) -> np.ndarray:
+    """Genes passing the expression and variation filters.
+
+    Genes are kept if at least ``min_cpm`` in at least ``max_freq_zero`` of
+    ``n_samples``, with coefficient of variation (over non-missing values)
+    at least ``cv2_min``, from statistics as by ``_expression_stats``.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variation = np.sqrt(m2 / n) / mean
+
+    return (n_ge_min_cpm / n_samples >= max_freq_zero) & (variation >= cv2_min)
+
+def _as_matrix(table) -> np.ndarray:
+    """Float columns of an Arrow table or record batch, as a 2D array."""
+    return np.column_stack([
+        column.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+        for column in table.columns
+    ])
 
 class RINT(BaseEstimator, TransformerMixin):
-    def __init__(self, k: float = 3.0/8):
+    """Rank inverse normal transform each column.
+
+    Missing values are left missing, and ranked out of the observed values
+    of their column. Columns are transformed ``block_size`` at a time, over
+    ``n_jobs`` threads (all cores for -1, as in scikit-learn), into an array
+    of ``dtype``.
+    """
+    def __init__(
+        self,
+        k: float = 3.0/8,
+        dtype: np.dtype = np.float64,
+        n_jobs: int = 1,
+        block_size: int = 256,
+    ):
         self.k = k
+        self.dtype = dtype
+        self.n_jobs = n_jobs
+        self.block_size = block_size
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X):
-        return pd.DataFrame(self.rank_inverse_normal_transform(X, self.k),
-                            index=X.index, columns=X.columns)
+        A_rint = self.rank_inverse_normal_transform(
+            X, self.k, dtype=self.dtype, n_jobs=self.n_jobs,
+            block_size=self.block_size
+        )
+        if not isinstance(X, pd.DataFrame):
+            return A_rint
+
+        return pd.DataFrame(A_rint, index=X.index, columns=X.columns, copy=False)
 
     @staticmethod
-    def rank_inverse_normal_transform(A, k: float = 3.0/8):
+    def rank_inverse_normal_transform(
+        A,
+        k: float = 3.0/8,
+        dtype: np.dtype = np.float64,
+        n_jobs: int = 1,
+        block_size: int = 256,
+    ):
         """Rank inverse normal transform, (R)INT
         
         INT(s) = Φ^-1 [(rank(s) - k) / (n - 2k + 1)]
@@ -107,15 +407,28 @@ class RINT(BaseEstimator, TransformerMixin):
                 k is an adjustable offset, the Blom offset, 3/8, by default
                 n is the number of observations
         
+        Ties get their average rank. n is counted per column, over
+        non-missing values, and missing values stay missing.
+
         Note:
             - https://cran.r-project.org/web/packages/RNOmni/vignettes/RNOmni.html
         """
-        n_obs = A.shape[0]
-        a_ranked = stats.rankdata(A, method="average", axis=0)
-        a_ranked_ = (a_ranked - k) / (n_obs - 2*k + 1)
-        a_rint = stats.norm.ppf(a_ranked_)
+        A = np.asarray(A)
+        out = np.empty(A.shape, dtype=dtype)
+        A_2d, out_2d = A.reshape(A.shape[0], -1), out.reshape(A.shape[0], -1)
+
+        def rint_block(start):
+            block = np.array(A_2d[:, start:start+block_size], dtype=np.float64)
+            ranked = stats.rankdata(block, method="average", axis=0, nan_policy="omit")
+            n_obs = np.count_nonzero(~np.isnan(block), axis=0)
+            ranked -= k
+            ranked /= n_obs - 2*k + 1
+            out_2d[:, start:start+block_size] = special.ndtri(ranked, out=ranked)
+
+        with ThreadPoolExecutor(effective_n_jobs(n_jobs)) as pool:
+            list(pool.map(rint_block, range(0, A_2d.shape[1], block_size)))
         
-        return a_rint
+        return out
 
 class CountThreshold(BaseEstimator, TransformerMixin):
     def __init__(self, min_cpm: int = 1, max_freq_zero: float = 0.3):
@@ -152,33 +465,111 @@ class CountThreshold(BaseEstimator, TransformerMixin):
         
         return filt_a
 
-class ProteinCoding(BaseEstimator, TransformerMixin):
-    """Filter out non-protein coding genes
-    
-    If in pipelin, must be run before other filtering steps.
-    
+class ExpressionThreshold(ColumnSelectorMixin, BaseEstimator, TransformerMixin):
+    """Filter genes on expression frequency and variation in one pass
+
+    Fuses ``CountThreshold`` and ``VariationThreshold``: genes (columns)
+    are kept if at least ``min_cpm`` in at least ``max_freq_zero`` of
+    samples, with coefficient of variation (over non-missing values) at
+    least ``cv2_min``. Both are computed over blocks of ``block_size``
+    columns, in ``dtype``, and kept genes are then taken once.
+    """
+    def __init__(
+        self,
+        min_cpm: float = 1,
+        max_freq_zero: float = 0.3,
+        cv2_min: float = 0.8,
+        block_size: int = 1024,
+        dtype: np.dtype = np.float32,
+    ):
+        self.min_cpm = min_cpm
+        self.max_freq_zero = max_freq_zero
+        self.cv2_min = cv2_min
+        self.block_size = block_size
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        n_samples, n_genes = X.shape
+        self.feature_names_in_ = pd.Index(getattr(X, "columns", range(n_genes)))
+        keep = np.empty(n_genes, dtype=bool)
+        for start in range(0, n_genes, self.block_size):
+            cols = slice(start, start + self.block_size)
+            block = np.asarray(X.iloc[:, cols] if isinstance(X, pd.DataFrame)
+                               else X[:, cols], dtype=self.dtype)
+            keep[cols] = _expression_filter(
+                n_samples, *_expression_stats(block, self.min_cpm),
+                self.max_freq_zero, self.cv2_min
+            )
+
+        self.support_ = np.flatnonzero(keep)
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, "support_")
+        return take_columns(X, self.support_)
+
+class BiotypeFilter(ColumnSelectorMixin, BaseEstimator, TransformerMixin):
+    """Filter out genes not of the given Ensembl biotypes
+
+    Columns are matched on Ensembl gene IDs, ignoring version suffixes, and
+    kept in their order. They are taken by position, so a contiguous
+    selection is a view rather than a copy.
+
     Parameters
     ----------
+    biotypes: str or sequence of str
     assembly: str
     """
-    def __init__(self, assembly: str = "GRCh37"):
+    def __init__(self, biotypes=("protein_coding",), assembly: str = "GRCh37"):
+        self.biotypes = biotypes
         self.assembly = assembly
-        self.protein_coding_genes = (
-            get_ensembl(assembly)
-            .query("gene_biotype == 'protein_coding'")
-            ["gene_id"]
-            .tolist()
-        )
 
     def fit(self, X, y=None):
+        self.feature_names_in_ = pd.Index(X.columns)
+        self.support_ = np.flatnonzero(self.biotype_mask(X.columns))
         return self
 
     def transform(self, X):
-        X_genes = X.columns
-        protein_coding = list(set(X_genes).intersection(self.protein_coding_genes))
-        X_protein_coding = X.reindex(columns=protein_coding)
-        return X_protein_coding
+        """Keep genes of ``biotypes``.
+
+        Columns other than the fitted ones are matched afresh, leaving the
+        fitted selection unchanged.
+        """
+        if hasattr(self, "support_") and X.columns.equals(self.feature_names_in_):
+            return take_columns(X, self.support_)
+
+        return take_columns(X, np.flatnonzero(self.biotype_mask(X.columns)))
 
     def fit_transform(self, X, y=None):
         """Custom fit_transform method for checks."""
-        return self.transform(X)
+        return self.fit(X).transform(X)
+
+    @property
+    def gene_ids(self) -> pd.Index:
+        """Sorted IDs of genes of ``biotypes``."""
+        biotypes = self.biotypes
+        if isinstance(biotypes, str):
+            biotypes = [biotypes]
+
+        return get_ensembl_gene_ids(self.assembly, tuple(biotypes))
+
+    def biotype_mask(self, genes) -> np.ndarray:
+        """Whether each gene ID, with or without version, is of ``biotypes``."""
+        genes = pd.Index(genes).astype(str).str.split(".").str[0]
+        return genes.isin(self.gene_ids)
+
+class ProteinCoding(BiotypeFilter):
+    """Filter out non-protein coding genes
+    
+    If in pipelin, must be run before other filtering steps.
+    
+    Parameters
+    ----------
+    assembly: str
+    """
+    def __init__(self, assembly: str = "GRCh37"):
+        super().__init__(biotypes=("protein_coding",), assembly=assembly)
+
+    @property
+    def protein_coding_genes(self) -> pd.Index:
+        return self.gene_ids
@@ -1,6 +1,8 @@
 import numpy as np
+import pandas as pd
 from scipy import stats
 from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
 
 
 class VariationThreshold(BaseEstimator, TransformerMixin):
@@ -17,3 +19,38 @@ class VariationThreshold(BaseEstimator, TransformerMixin):
     def variation_threshold(A, cv2_min):
         ix = (stats.variation(A, axis=0, nan_policy="omit") >= cv2_min).nonzero()[0]
         return np.take(A, ix, axis=1)
+
+
+class ColumnSelectorMixin:
+    """Columns selected by a fitted ``support_``, as in sklearn selectors."""
+    def get_support(self, indices: bool = False):
+        check_is_fitted(self, "support_")
+        if indices:
+            return self.support_
+
+        mask = np.zeros(len(self.feature_names_in_), dtype=bool)
+        mask[self.support_] = True
+        return mask
+
+    def get_feature_names_out(self, input_features=None):
+        check_is_fitted(self, "support_")
+        return np.asarray(self.feature_names_in_, dtype=object)[self.support_]
+
+
+def take_columns(X, columns):
+    """Select columns by position or mask from a frame, array or region matrix.
+
+    Contiguous columns are taken as a slice, which is a view of NumPy-backed
+    data rather than a copy.
+    """
+    positions = np.arange(X.shape[1])[columns]
+    if positions.size and positions[-1] - positions[0] == positions.size - 1 \
+            and (np.diff(positions) > 0).all():
+        columns = slice(positions[0], positions[-1] + 1)
+        if isinstance(X, np.ndarray):
+            return X[:, columns]
+
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[:, columns]
+
+    return X.take(positions, axis=1)
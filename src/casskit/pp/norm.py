@@ -0,0 +1,186 @@
+"""
+Normalization factors for RNA-seq counts, as in edgeR::calcNormFactors.
+
+Counts are genes by samples. Factors are computed for all samples at once,
+a block of samples at a time, and inputs are never modified.
+"""
+from typing import Optional
+
+import numpy as np
+
+from ..io.descriptors import OneOf
+
+
+__all__ = [
+    "calc_norm_factors",
+    "reference_sample",
+    "rle_factors",
+    "tmm_factors",
+    "upper_quartile_factors",
+]
+
+
+def calc_norm_factors(
+    counts,
+    method: str = "TMM",
+    lib_size: Optional[np.ndarray] = None,
+    ref: Optional[int] = None,
+    logratio_trim: float = 0.3,
+    sum_trim: float = 0.05,
+    acutoff: float = -1e10,
+    p: float = 0.75,
+    block_size: int = 256,
+) -> np.ndarray:
+    """Scaling factors for library sizes, with geometric mean 1.
+
+    Reproduces edgeR::calcNormFactors.default (as does
+    ``qtl.norm.edger_calcnormfactors``, for TMM).
+
+    Parameters
+    ----------
+    counts : array-like
+        Counts, genes by samples.
+    method : {"TMM", "upperquartile", "RLE"}
+    lib_size : array-like, optional
+        Library size of each sample, by default its total count.
+    ref : int, optional
+        Index of the TMM reference sample, by default the sample whose
+        upper quartile is closest to the mean.
+    logratio_trim, sum_trim, acutoff : float
+        TMM trimming of log ratios (M) and mean log expression (A).
+    p : float
+        Quantile for ``method="upperquartile"``.
+    block_size : int
+        Number of samples per block.
+    """
+    OneOf("TMM", "upperquartile", "RLE").validate(method)
+    counts = np.asarray(counts, dtype=np.float64)
+    if lib_size is None:
+        lib_size = counts.sum(axis=0)
+    lib_size = np.asarray(lib_size, dtype=np.float64)
+
+    if method == "TMM":
+        if ref is None:
+            ref = reference_sample(counts, lib_size)
+        factors = tmm_factors(counts, counts[:, ref], lib_size, lib_size[ref],
+                              logratio_trim, sum_trim, acutoff, block_size)
+
+    else:
+        # Discard genes with all-zero counts
+        expressed = (counts > 0).any(axis=1)
+        if not expressed.all():
+            counts = counts[expressed]
+
+        if method == "upperquartile":
+            factors = upper_quartile_factors(counts, lib_size, p)
+        else:
+            factors = rle_factors(counts) / lib_size
+
+    return factors / np.exp(np.mean(np.log(factors)))
+
+def reference_sample(counts, lib_size: Optional[np.ndarray] = None, p: float = 0.75) -> int:
+    """Index of the sample whose upper quartile is closest to the mean."""
+    counts = np.asarray(counts, dtype=np.float64)
+    if lib_size is None:
+        lib_size = counts.sum(axis=0)
+
+    f75 = upper_quartile_factors(counts[(counts > 0).any(axis=1)], lib_size, p)
+    return int(np.argmin(np.abs(f75 - f75.mean())))
+
+def upper_quartile_factors(counts, lib_size: np.ndarray, p: float = 0.75) -> np.ndarray:
+    """Quantile ``p`` of each sample's counts, over its library size.
+
+    Genes with no counts in any sample should be dropped first.
+    """
+    return np.percentile(counts, 100*p, axis=0) / lib_size
+
+def rle_factors(counts) -> np.ndarray:
+    """Median ratio of each sample's counts to their geometric mean over samples.
+
+    Genes with no counts in any sample should be dropped first.
+    """
+    with np.errstate(divide="ignore"):
+        geo_mean = np.exp(np.mean(np.log(counts), axis=1))
+    expressed = geo_mean > 0
+
+    return np.median(counts[expressed] / geo_mean[expressed, None], axis=0)
+
+def tmm_factors(
+    counts,
+    ref_counts,
+    lib_size: Optional[np.ndarray] = None,
+    ref_lib_size: Optional[float] = None,
+    logratio_trim: float = 0.3,
+    sum_trim: float = 0.05,
+    acutoff: float = -1e10,
+    block_size: int = 256,
+) -> np.ndarray:
+    """Trimmed mean of M values of each sample against reference counts.
+
+    Factors are not rescaled, so the reference's own factor is 1, and
+    ``ref_counts`` may come from outside ``counts`` (e.g. an earlier batch).
+    Genes are trimmed on the average ranks of their log ratio (M) and mean
+    log expression (A) within each sample, found by partitioning rather
+    than sorting. As in edgeR, samples with no genes left after trimming,
+    or with all log ratios under 1e-6, get a factor of 1.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    ref_counts = np.asarray(ref_counts, dtype=np.float64)
+    if lib_size is None:
+        lib_size = counts.sum(axis=0)
+    if ref_lib_size is None:
+        ref_lib_size = ref_counts.sum()
+
+    factors = np.empty(counts.shape[1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ref_frac = (ref_counts / ref_lib_size)[:, None]
+        ref_log = np.log2(ref_frac)
+        ref_v = ((ref_lib_size - ref_counts) / ref_lib_size / ref_counts)[:, None]
+
+        for start in range(0, counts.shape[1], block_size):
+            Y = counts[:, start:start+block_size]
+            N = lib_size[start:start+block_size]
+
+            # Mg, Ag and wg of Robinson & Oshlack (2010)
+            frac = Y / N
+            logR = np.log2(frac / ref_frac)
+            absE = 0.5 * (np.log2(frac) + ref_log)
+            v = (N - Y) / N / Y + ref_v
+
+            fin = np.isfinite(logR) & np.isfinite(absE) & (absE > acutoff)
+            keep = (_trim(logR, fin, logratio_trim)
+                    & _trim(absE, fin, sum_trim))
+            f = (np.nansum(np.where(keep, logR / v, np.nan), axis=0)
+                 / np.nansum(np.where(keep, 1 / v, np.nan), axis=0))
+
+            # As edgeR, no genes left after trimming, or no differences, give 1
+            f[np.isnan(f)] = 0
+            f[np.max(np.abs(np.where(fin, logR, 0)), axis=0, initial=0) < 1e-6] = 0
+            factors[start:start+block_size] = 2**f
+
+    return factors
+
+def _trim(values, fin, trim: float) -> np.ndarray:
+    """Finite values with average rank, within their column, not in either tail.
+
+    Ranks are among finite values, and from ``floor(n*trim) + 1`` to
+    ``n - floor(n*trim)`` are kept. Only values tied with one of the two
+    cutoffs need their rank counted.
+    """
+    n_fin = np.count_nonzero(fin, axis=0)
+    lo = np.floor(n_fin*trim) + 1
+    hi = n_fin + 1 - lo
+
+    values = np.where(fin, values, np.inf)
+    cut_ix = np.clip(np.stack([lo, hi]).astype(int) - 1, 0, len(values) - 1)
+    cuts = np.take_along_axis(np.partition(values, np.unique(cut_ix), axis=0),
+                              cut_ix, axis=0)
+
+    keep = (values > cuts[0]) & (values < cuts[1])
+    for cut in cuts:
+        tied = values == cut
+        rank = (np.count_nonzero(values < cut, axis=0)
+                + (np.count_nonzero(tied, axis=0) + 1) / 2)
+        keep |= tied & (rank >= lo) & (rank <= hi)
+
+    return keep & fin
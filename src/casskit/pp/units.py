@@ -1,11 +1,11 @@
 import numpy as np
+import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.preprocessing import FunctionTransformer
 
-from ..data.io.descriptors import OneOf
+from ..io.descriptors import OneOf
 
 
-__all__ = ["UNITS", "ToCounts"]
+__all__ = ["UNITS", "ToCounts", "convert_units"]
 
 UNITS = {
     "log1p": "log1p",
@@ -18,42 +18,117 @@ UNITS = {
     "counts": "counts"
 }
 
-# TODO: FunctionTransformer arg check_inverse doesn't work when input has no dtype (eg pd.DataFrame)
+# -- In-place conversions to and from absolute values (counts or copy-number) --
+def _identity(X):
+    return X
 
-# -- Helpers for unit Transfomers --
-def _abstolog21p(X):
-    return np.log2(1 + X)
+TO_ABSOLUTE = {
+    "log1p": lambda X: np.expm1(X, out=X),
+    "log2": lambda X: np.exp2(X, out=X),
+    "log10": lambda X: np.power(10, X, out=X),
+    "log2(count+1)": lambda X: np.subtract(np.exp2(X, out=X), 1, out=X),
+    "log2(copy-number/2)": lambda X: np.multiply(np.exp2(X, out=X), 2, out=X),
+    "absolute": _identity,
+    "abs": _identity,
+    "counts": _identity,
+}
+
+FROM_ABSOLUTE = {
+    "log1p": lambda X: np.log1p(X, out=X),
+    "log2": lambda X: np.log2(X, out=X),
+    "log10": lambda X: np.log10(X, out=X),
+    "log2(count+1)": lambda X: np.log2(np.add(X, 1, out=X), out=X),
+    "log2(copy-number/2)": lambda X: np.log2(np.divide(X, 2, out=X), out=X),
+    "absolute": _identity,
+    "abs": _identity,
+    "counts": _identity,
+}
+
+def convert_units(
+    X,
+    units: str,
+    to: str = "counts",
+    out=None,
+    dtype=None,
+    block_size: int = 1 << 20,
+):
+    """Convert X from ``units`` to ``to``, both keys of ``UNITS``.
+
+    Values are converted through absolute values a block of rows at a
+    time, into ``out``, a NumPy array (X itself, to convert an array in
+    place), or a new array of ``dtype``, floating by default. Integer
+    targets are rounded and clipped to the range of the dtype, with missing
+    values set to 0. Frames are converted through their values into a new
+    frame; they cannot be ``out``, as their values are read-only under
+    copy-on-write.
+    """
+    OneOf(*UNITS).validate(units)
+    OneOf(*UNITS).validate(to)
+    if out is not None and not isinstance(out, np.ndarray):
+        raise TypeError(
+            f"out must be a NumPy array, got {type(out).__name__}; to convert "
+            "a frame in place, convert X.to_numpy(copy=True) and wrap it"
+        )
+    values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+    if out is None:
+        same_units = units == to or (TO_ABSOLUTE[units] is _identity
+                                     and FROM_ABSOLUTE[to] is _identity)
+        if same_units and (dtype is None or np.dtype(dtype) == values.dtype):
+            return X
 
-def _log21ptoabs(X):
-    return (np.exp2(X) - 1).astype(int)
+        if dtype is None:
+            dtype = values.dtype if values.dtype.kind == "f" else np.float64
+        out = np.empty(values.shape, dtype=dtype)
 
-def _abstolog2r(X):
-    return np.log2(X/2)
+    to_absolute, from_absolute = TO_ABSOLUTE[units], FROM_ABSOLUTE[to]
+    integer = out.dtype.kind in "iu"
+    rows = max(1, block_size // max(1, values[:1].size))
+    for i in range(0, values.shape[0], rows):
+        if integer:
+            block = np.array(values[i:i+rows], dtype=np.float64)
+        else:
+            block = out[i:i+rows]
+            if out is not values:
+                np.copyto(block, values[i:i+rows], casting="unsafe")
 
-def _log2rtoabs(X):
-    return np.exp2(X) * 2
+        from_absolute(to_absolute(block))
+        if integer:
+            info = np.iinfo(out.dtype)
+            np.clip(np.rint(block, out=block), info.min, info.max, out=block)
+            np.copyto(out[i:i+rows], np.nan_to_num(block, copy=False),
+                      casting="unsafe")
 
-# -- unit Transfomers --
-log21ptoabs = FunctionTransformer(
-    _log21ptoabs, inverse_func=_abstolog21p, check_inverse=False
-)
+    if isinstance(X, pd.DataFrame):
+        return pd.DataFrame(out, index=X.index, columns=X.columns, copy=False)
+
+    return out
 
-log2rtoabs = FunctionTransformer(
-    _log2rtoabs, inverse_func=_abstolog2r, check_inverse=False
-)
 class ToCounts(BaseEstimator, TransformerMixin):
-    TFORM_FUNCS = {
-        "log2(count+1)": log21ptoabs.fit_transform,
-        "counts": lambda X: X,
-        "log2(copy-number/2)": log2rtoabs.fit_transform,
-    }
-    units = OneOf(*TFORM_FUNCS.keys())
-    
-    def __init__(self, units: str):
+    """Convert to absolute values, counts or copy-number, from ``units``.
+
+    By default, counts are rounded to int64 and other values are floating;
+    ``dtype`` may be any floating or integer dtype, e.g. float32 or uint32.
+    ``transform`` and ``inverse_transform`` also take ``out``, a NumPy
+    array, which may be X itself; see ``convert_units``.
+    """
+    units = OneOf(*UNITS)
+
+    def __init__(self, units: str, dtype=None, block_size: int = 1 << 20):
         self.units = units
+        self.dtype = dtype
+        self.block_size = block_size
 
     def fit(self, X, y=None):
         return self
 
-    def transform(self, X):
-        return self.TFORM_FUNCS[self.units](X)
\ No newline at end of file
+    def transform(self, X, out=None):
+        dtype = self.dtype
+        if dtype is None and self.units == "log2(count+1)":
+            dtype = np.int64
+
+        return convert_units(X, self.units, "counts", out=out, dtype=dtype,
+                             block_size=self.block_size)
+
+    def inverse_transform(self, X, out=None):
+        return convert_units(X, "counts", self.units, out=out,
+                             block_size=self.block_size)
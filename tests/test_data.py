@@ -1,7 +1,9 @@
 from pathlib import Path
 import pytest
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 import casskit.data
 
@@ -33,4 +35,72 @@ def test_molqtl():
             "proximity": [1, 2, 3],
         })
     )
-    
\ No newline at end of file
+    
+def test_tcga_dataset(monkeypatch):
+    from casskit.data.datasets import tcga_dataset
+
+    counts = pd.DataFrame({"Ensembl_ID": ["ENSG1.1", "ENSG2.3"],
+                           "s1": [1., 2.], "s2": [3., 4.], "s3": [5., 6.]})
+    cnv = pd.DataFrame({"sample": ["s3", "s3", "s2", "s4"], "Chrom": ["1", "2", "1", "1"],
+                        "Start": 1, "End": 10, "value": 0.})
+    raw = {"htseq_counts": counts, "cnv": cnv}
+    loads = []
+
+    def get_tcga(data_name, cancer=None, samples=None, genes=None, arrow=False):
+        loads.append(data_name)
+        data = raw[data_name]
+        if data_name == "htseq_counts":
+            data = data[["Ensembl_ID"] + samples]
+        else:
+            data = data[data["sample"].isin(samples)]
+        return pa.Table.from_pandas(data, preserve_index=False) if arrow else data
+
+    monkeypatch.setattr(tcga_dataset, "get_tcga", get_tcga)
+    monkeypatch.setattr(tcga_dataset, "get_tcga_samples", lambda cancer, data_name: (
+        pd.Index(raw[data_name].columns[1:]) if data_name == "htseq_counts"
+        else pd.Index(raw[data_name]["sample"].unique())
+    ))
+
+    ds = tcga_dataset.TCGADataSet("TCGA-ACC", omics=["htseq_counts", "cnv"])
+    assert ds.samples.tolist() == ["s2", "s3"]
+    assert loads == []
+
+    assert ds.htseq_counts_data.data.index.tolist() == ["s2", "s3"]
+    assert ds.htseq_counts_data.features.tolist() == ["ENSG1", "ENSG2"]
+    assert ds.htseq_counts_data is ds["htseq_counts"]
+    assert sorted(ds.cnv_data.data["sample_id"].unique()) == ["s2", "s3"]
+    assert loads == ["htseq_counts", "cnv"]
+
+def test_omic_views(tmp_path):
+    from casskit.data import MessengerRNA
+
+    values = np.arange(12.).reshape(3, 4)
+    np.save(tmp_path / "mrna.npy", values)
+    samples, genes = ["s1", "s2", "s3", "s4"], ["g1", "g2", "g3"]
+    mrna = MessengerRNA.from_npy(tmp_path / "mrna.npy", samples, genes, sample_axis=1)
+    assert mrna.shape == (4, 3)
+
+    # Transposes and contiguous selections are views of the memory map
+    frame = mrna.to_pandas()
+    assert frame.loc["s2", "g3"] == 9.
+    assert np.shares_memory(frame.to_numpy(), mrna.values)
+    selected = mrna.select(samples=["s2", "s3"], features=["g2", "g3"])
+    assert np.shares_memory(selected.to_numpy(), mrna.values)
+    np.testing.assert_array_equal(selected.to_numpy(sample_axis=1), values[1:, 1:3])
+    assert mrna.select(samples=["s4", "s1"]).data.index.tolist() == ["s4", "s1"]
+
+    # Xena tables keep their Arrow backing, samples as columns
+    table = pa.table({"Ensembl_ID": ["ENSG1.1", "ENSG2.3", "ENSG3.1"],
+                      **{s: values[:, j] for j, s in enumerate(samples)}})
+    xena = MessengerRNA.from_xena(table)
+    assert isinstance(xena.select(samples=["s2", "s3"]).values, pa.Table)
+    assert xena.features.tolist() == ["ENSG1", "ENSG2", "ENSG3"]
+    pd.testing.assert_frame_equal(xena.data, frame.set_axis(xena.features, axis=1))
+    assert xena.data is xena.data
+    shuffled = xena.select(samples=["s4", "s1"], features=["ENSG3", "ENSG1"])
+    np.testing.assert_array_equal(shuffled.to_numpy(), values[[2, 0]][:, [3, 0]].T)
+
+    # Chunked Arrow columns are copied straight into one array
+    chunked = MessengerRNA.from_xena(pa.concat_tables([table.slice(0, 1), table.slice(1)]))
+    np.testing.assert_array_equal(chunked.to_numpy(sample_axis=1), values)
+    assert xena.to_pandas(sample_axis=1).dtypes.eq("double[pyarrow]").all()
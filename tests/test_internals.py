@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from casskit.internals.cache import CassKitCacheManager
+from casskit.io.utils import cache_files, write_manifest
+
+
+def write(path, size, manifest=True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"0" * size)
+    if manifest:
+        write_manifest(path)
+    return path
+
+def group_size(path):
+    return sum(f.stat().st_size for f in cache_files(path))
+
+def test_cache_manager_index(data_dir):
+    cache_dir = Path(data_dir)
+    manager = CassKitCacheManager(cache_dir)
+    assert not manager.index_path.exists()
+    a = write(cache_dir / "a.parquet", 10)
+
+    # Existing caches are indexed on first use, with their manifest; files of
+    # other applications (without a manifest) are not
+    assert manager.cache_size() == group_size(a) > 10
+    b = write(cache_dir / "b/b.parquet", 20)
+    manager.register(b)
+    manager.register(write(cache_dir / "other/app.db", 40, manifest=False))
+    assert manager.cache_size() == group_size(a) + group_size(b)
+
+    # Sidecars count toward their cache file rather than on their own
+    manager.register(write(cache_dir / "b/b.parquet.index.npz", 64, manifest=False))
+    assert manager.cache_size() == group_size(a) + group_size(b) - 64
+    manager.register(b)
+    total = group_size(a) + group_size(b)
+    assert manager.cache_size() == total
+
+    manager.reindex()
+    assert manager.cache_size() == total
+
+    manager.clear_cache()
+    assert (cache_dir / "other/app.db").exists()
+    assert not (cache_dir / "a.parquet").exists()
+    assert manager.cache_size() == 0
+
+@pytest.mark.parametrize("policy, evicted", [("lru", "a"), ("lfu", "b")])
+def test_cache_manager_eviction(data_dir, policy, evicted):
+    cache_dir = Path(data_dir)
+    a = write(cache_dir / "a.parquet", 10)
+    b = write(cache_dir / "b.parquet", 10)
+    write(cache_dir / "b.parquet.index.npz", 10, manifest=False)
+    budget = group_size(a) + group_size(b) + 5
+    manager = CassKitCacheManager(cache_dir, max_bytes=budget, policy=policy)
+    manager.register(a)
+    manager.register(b)
+    write(cache_dir / "unrelated.bin", 100, manifest=False)
+
+    # a is used more often, b more recently
+    manager.touch(a)
+    manager.touch(a)
+    manager.touch(b)
+    c = write(cache_dir / "c.parquet", 10)
+    manager.register(c)
+
+    assert not (cache_dir / f"{evicted}.parquet").exists()
+    assert not list(cache_dir.glob(f"{evicted}.parquet.*"))
+    assert (cache_dir / "c.parquet").exists()
+    assert (cache_dir / "unrelated.bin").exists()
+    kept = a if evicted == "b" else b
+    assert manager.cache_size() == group_size(kept) + group_size(c)
+
+def test_cache_manager_batches_touches(data_dir):
+    cache_dir = Path(data_dir)
+    manager = CassKitCacheManager(cache_dir)
+    a = write(cache_dir / "a.parquet", 10)
+    manager.register(a)
+
+    def hits():
+        with manager._connect() as con:
+            return con.execute("SELECT hits FROM files").fetchone()[0]
+
+    # Accesses are held in memory until flushed
+    for __ in range(3):
+        manager.touch(a)
+    assert hits() == 1
+    manager.flush()
+    assert hits() == 4
+
+    manager.TOUCH_INTERVAL = 0
+    manager.touch(a)
+    assert hits() == 5
@@ -0,0 +1,524 @@
+import gzip
+import os
+from pathlib import Path
+import socket
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pyranges as pr
+import pytest
+
+from casskit import cli
+from casskit.io.annot import centromere
+from casskit.io import segments as segments_module
+from casskit.io.segments import (
+    CommonRegionMatrix,
+    SegmentIndex,
+    aneuploidy_score,
+    segment_index_path,
+    segments_to_gene_matrix,
+    summarize_copynumber,
+)
+from casskit.io.tcga.gdc_xena import (
+    build_tcga_parallel,
+    read_tcga_parquet,
+    tcga_cache_path,
+)
+from casskit.io.utils import (
+    MemoryCache,
+    cache_key_path,
+    cache_lock,
+    cache_on_disk,
+    cache_params,
+    checksum_path,
+    clear_memory_cache,
+    fuzzy_match,
+    is_valid_cache,
+    match_barcodes,
+    open_text_stream,
+    read_manifests,
+    stream_to_parquet,
+    xena_stream_dtype,
+)
+
+
+@pytest.fixture
+def segments_gz(data_dir):
+    """Xena-like segment file whose first chunks only see numeric chromosomes."""
+    segments = pd.DataFrame({
+        "sample": np.repeat(["TCGA-01", "TCGA-02"], 12),
+        "Chrom": [str(i) for i in range(1, 12)] * 2 + ["X", "X"],
+        "Start": np.arange(24) * 100,
+        "End": np.arange(24) * 100 + 99,
+        "value": np.linspace(-1, 1, 24),
+    })
+    path = data_dir / "cnv.tsv.gz"
+    with gzip.open(path, "wt") as f:
+        segments.to_csv(f, sep="\t", index=False)
+
+    return path, segments
+
+def test_stream_to_parquet(segments_gz, data_dir):
+    path, segments = segments_gz
+    out = data_dir / "cnv.parquet"
+    with open_text_stream(path, compression="gzip") as handle:
+        columns = handle.readline().rstrip("\n").split("\t")
+        stream_to_parquet(handle, out, chunksize=5, sep="\t", header=None,
+                          names=columns,
+                          dtype=xena_stream_dtype(columns, "genomicSegment"))
+
+    # One row group per chunk
+    assert pq.ParquetFile(out).num_row_groups == 5
+
+    streamed = pd.read_parquet(out)
+    assert streamed["Chrom"].tolist() == segments["Chrom"].tolist()
+    pd.testing.assert_frame_equal(streamed.drop(columns=["sample", "Chrom"]),
+                                  segments.drop(columns=["sample", "Chrom"]))
+
+def test_stream_to_parquet_promotes_schema(segments_gz, data_dir):
+    path, segments = segments_gz
+    out = data_dir / "cnv.parquet"
+    with open_text_stream(path, compression="gzip") as handle:
+        stream_to_parquet(handle, out, chunksize=5, sep="\t")
+
+    # Chromosomes are numeric until X
+    streamed = pd.read_parquet(out)
+    assert pq.ParquetFile(out).num_row_groups == 5
+    assert streamed["Chrom"].tolist() == segments["Chrom"].tolist()
+
+    # Clinical column that is empty in the first chunk
+    clinical = pd.DataFrame({"sample": [f"TCGA-{i:02d}" for i in range(10)],
+                             "stage": [None] * 5 + ["Stage I"] * 5,
+                             "age": [50] * 9 + [None]})
+    tsv = data_dir / "clinical.tsv"
+    clinical.to_csv(tsv, sep="\t", index=False)
+    with open_text_stream(tsv) as handle:
+        columns = handle.readline().rstrip("\n").split("\t")
+        stream_to_parquet(handle, out, chunksize=5, sep="\t", header=None,
+                          names=columns,
+                          dtype=xena_stream_dtype(columns, "clinicalMatrix"))
+
+    streamed = pd.read_parquet(out)
+    assert streamed["stage"].isna().sum() == 5
+    assert streamed["stage"].iloc[5:].tolist() == ["Stage I"] * 5
+    assert streamed["age"].iloc[:9].tolist() == [50.] * 9
+    assert not list(Path(data_dir).glob("*.part"))
+
+def test_read_tcga_parquet(data_dir):
+    counts = pd.DataFrame(np.arange(12.).reshape(4, 3),
+                          columns=["TCGA-01", "TCGA-02", "TCGA-03"])
+    counts.insert(0, "Ensembl_ID", [f"ENSG0{i}.1" for i in range(4)])
+    path = data_dir / "htseq_counts.raw.parquet"
+    counts.to_parquet(path, row_group_size=2)
+
+    subset = read_tcga_parquet(path, "genomicMatrix",
+                               samples=["TCGA-03", "TCGA-01"],
+                               genes=["ENSG01", "ENSG03.1"])
+    assert subset.columns.tolist() == ["Ensembl_ID", "TCGA-03", "TCGA-01"]
+    assert subset["Ensembl_ID"].tolist() == ["ENSG01.1", "ENSG03.1"]
+    assert subset["TCGA-03"].tolist() == [5., 11.]
+
+    segments = pd.DataFrame({"sample": ["TCGA-01", "TCGA-02", "TCGA-02"],
+                             "value": [0.1, 0.2, 0.3]})
+    segments.to_parquet(path)
+    subset = read_tcga_parquet(path, "genomicSegment", samples=["TCGA-02"])
+    assert subset["value"].tolist() == [0.2, 0.3]
+    with pytest.raises(ValueError):
+        read_tcga_parquet(path, "genomicSegment", genes=["ENSG01"])
+
+def test_build_tcga_parallel_resumes(segments_gz, data_dir, monkeypatch):
+    from casskit.io import utils
+
+    path, segments = segments_gz
+
+    # A download left behind by an earlier, interrupted build
+    raw = Path(data_dir, "GDC.TCGA-ACC/raw/cnv.tsv.gz")
+    raw.parent.mkdir(parents=True)
+    Path(path).rename(raw)
+
+    part = raw.with_name(f"{raw.name}.1234abcd.part")
+    part.write_bytes(b"partial")
+
+    events = []
+    monkeypatch.setattr(utils, "CACHE_CALLBACKS",
+                        [lambda path, event: events.append((path.name, event))])
+    failed = build_tcga_parallel(["TCGA-ACC"], ["cnv"], workers=2,
+                                 cache_dir=data_dir)
+    assert failed == {}
+    assert not raw.exists()
+    assert not part.exists()
+
+    cache = tcga_cache_path(data_dir, "TCGA-ACC", "cnv")
+    assert pd.read_parquet(cache)["Chrom"].tolist() == segments["Chrom"].tolist()
+    assert segment_index_path(cache).exists()
+    assert (cache.name, "write") in events
+
+    # Cached entries are skipped
+    assert build_tcga_parallel(["TCGA-ACC"], ["cnv"], cache_dir=data_dir) == {}
+
+def test_fetch_xena_download(segments_gz, data_dir, monkeypatch):
+    from casskit.io.tcga import gdc_xena
+
+    path, __ = segments_gz
+    raw = Path(data_dir, "raw.tsv.gz")
+    raw.write_bytes(Path(path).read_bytes()[:-20])
+
+    # Truncated leftovers are downloaded again
+    monkeypatch.setattr(gdc_xena, "download_file",
+                        lambda url, dest: Path(path).replace(dest))
+    with pytest.warns(UserWarning, match="incomplete download"):
+        gdc_xena._fetch_xena_download("url", raw)
+    assert gdc_xena._is_complete_download(raw)
+
+def test_segment_index(segments_gz, data_dir):
+    __, segments = segments_gz
+    index = SegmentIndex.from_segments(segments, chrom_col="Chrom",
+                                       sample_col="sample")
+
+    # Inclusive ends; gaps, unknown samples and chromosomes are NaN
+    values = index.value_at("1", [0, 99, 100, 50, 50],
+                            ["TCGA-01", "TCGA-01", "TCGA-01", "TCGA-03", "TCGA-02"])
+    np.testing.assert_allclose(values[:2], segments["value"][0], rtol=1e-6)
+    assert np.isnan(values[2:4]).all()
+    assert np.isnan(values[4])
+    np.testing.assert_allclose(index.value_at("chr2", 1250, "TCGA-02"),
+                               segments["value"][12], rtol=1e-6)
+    assert np.isnan(index.value_at("chr22", 0, "TCGA-01"))
+
+    design = index.values_at("chrX", [2250, 2350], block_size=1)
+    assert design.columns.tolist() == ["TCGA-01", "TCGA-02"]
+    assert design.isna().values.tolist() == [[True, False], [True, False]]
+
+    # Persisted, and rebuilt when the segment table changes
+    table = Path(data_dir, "cnv.parquet")
+    segments.to_parquet(table)
+    path = segment_index_path(table)
+    cached = SegmentIndex.cached(path, table, chrom_col="Chrom", sample_col="sample")
+    np.testing.assert_array_equal(cached.keys, index.keys)
+
+    segments.iloc[:12].to_parquet(table)
+    os.utime(table, (path.stat().st_mtime + 1, ) * 2)
+    cached = SegmentIndex.cached(path, table, chrom_col="Chrom", sample_col="sample")
+    assert cached.samples.tolist() == ["TCGA-01"]
+
+def test_segments_to_gene_matrix():
+    segments = pd.DataFrame({
+        "sample_id": ["A", "A", "A", "B"],
+        "Chromosome": ["1", "1", "2", "1"],
+        "Start": [1, 101, 1, 51],
+        "End": [100, 200, 100, 150],
+        "value": [0., 1., -1., 0.5],
+    })
+    genes = pd.DataFrame({
+        "Chromosome": ["chr1", "chr2", "chr3", "chr1"],
+        "Start": [91, 10, 10, 151],
+        "End": [110, 20, 20, 160],
+        "gene_id": ["g1", "g2", "g3", "g4"],
+    })
+
+    for n_jobs in (1, 2):
+        matrix = segments_to_gene_matrix(segments, genes, n_jobs=n_jobs)
+        assert matrix.dtypes.eq(np.float32).all()
+        assert matrix.index.tolist() == ["A", "B"]
+        assert matrix.columns.tolist() == ["g1", "g2", "g3", "g4"]
+
+        # Weighted by overlap; NaN without segments
+        np.testing.assert_allclose(matrix.loc["A"], [0.5, -1., np.nan, 1.])
+        np.testing.assert_allclose(matrix.loc["B"], [0.5, np.nan, np.nan, np.nan])
+
+    matrix = segments_to_gene_matrix(segments, genes, agg="max")
+    assert matrix.loc["A", "g1"] == 1.
+    with pytest.raises(ValueError):
+        segments_to_gene_matrix(segments, genes, agg="median")
+
+def test_annotate_chrom_arm(monkeypatch):
+    class _Centromere:
+        def __init__(self, assembly):
+            self.data = pd.DataFrame({"Chromosome": ["chr1"],
+                                      "Start": [1000], "End": [1200]})
+
+    monkeypatch.setattr(centromere, "Centromere", _Centromere)
+    segments = pd.DataFrame({"Chromosome": ["chr1", "chr1", "chr1", "chr1", "chrY"],
+                             "Start": [1, 1100, 1300, 500, 1],
+                             "End": [900, 1150, 2000, 1500, 100]})
+
+    annotated = centromere.annotate_chrom_arm(segments, "hg19")
+    assert isinstance(annotated["arm"].dtype, pd.CategoricalDtype)
+    assert annotated["arm"].tolist() == ["p", "cen", "q", "p", "q"]
+    assert annotated.index.tolist() == [0, 1, 2, 3, 3]
+    assert annotated["End"].tolist() == [900, 1150, 2000, 1500, 1500]
+
+    # Spanning segments are clipped to each arm
+    split = centromere.annotate_chrom_arm(segments, "hg19", split=True)
+    assert split["Start"].tolist() == [1, 1100, 1300, 500, 1200]
+    assert split["End"].tolist() == [900, 1150, 2000, 1000, 1500]
+
+def test_common_region_matrix():
+    segments = pd.DataFrame({
+        "sample_id": ["A", "A", "B", "B", "B"],
+        "Chromosome": ["1", "1", "1", "1", "2"],
+        "Start": [1, 101, 1, 51, 1],
+        "End": [100, 200, 50, 200, 100],
+        "value": [0., 1., 2., 3., 4.],
+    })
+    matrix = CommonRegionMatrix.from_segments(segments)
+    assert matrix.regions.astype({"Chromosome": str}).values.tolist() == \
+        [["chr1", 1, 50], ["chr1", 51, 100], ["chr1", 101, 200], ["chr2", 1, 100]]
+    assert matrix.run_values.size == len(segments)
+    np.testing.assert_array_equal(np.asarray(matrix),
+                                  [[0, 0, 1, np.nan], [2, 3, 3, 4]])
+
+    genes = pd.DataFrame({"Chromosome": ["chr1", "chr1", "chr2", "chr3", "chr1"],
+                          "Start": [60, 70, 10, 10, 150],
+                          "gene_id": ["g1", "g2", "g3", "g4", "g5"]})
+    matrix = matrix.map_genes(genes)
+    genes = matrix.to_gene_frame()
+    assert genes.columns.tolist() == ["g1", "g2", "g5", "g3"]
+    assert genes.loc["B"].tolist() == [3, 3, 3, 4]
+
+    # Selecting regions remaps runs and genes
+    subset = matrix.take([1, 3])
+    np.testing.assert_array_equal(np.asarray(subset), [[0, np.nan], [3, 4]])
+    assert subset.to_gene_frame().columns.tolist() == ["g1", "g2", "g3"]
+
+def test_summarize_copynumber(monkeypatch, data_dir):
+    class _Centromere:
+        def __init__(self, assembly):
+            self.data = pd.DataFrame({"Chromosome": ["chr1", "chr2"],
+                                      "Start": [1000, 1000], "End": [1200, 1200]})
+
+    class _Cytoband:
+        def __init__(self, assembly):
+            self.data = pd.DataFrame({"Chromosome": ["chr1", "chr1", "chr2"],
+                                      "Start": [1, 1001, 1],
+                                      "End": [1000, 3000, 3000],
+                                      "band": ["chr1p1", "chr1q1", "chr2p1"]})
+
+    monkeypatch.setattr(centromere, "Centromere", _Centromere)
+    monkeypatch.setattr(segments_module, "Cytoband", _Cytoband)
+    segments = pd.DataFrame({
+        "sample_id": ["A", "A", "A", "B", "B"],
+        "Chromosome": ["1", "1", "2", "1", "2"],
+        "Start": [1, 801, 1, 1, 1],
+        "End": [800, 3000, 3000, 3000, 3000],
+        "value": [0.5, -0.5, 0.0, 0.0, np.nan],
+    })
+
+    arms = summarize_copynumber(segments, level="arm")
+    assert arms.index.get_level_values("region").tolist() == \
+        ["chr1p", "chr1q", "chr2p", "chr2q", "chr1p", "chr1q"]
+    assert arms.loc[("A", "chr1p"), "length"] == 1000
+    assert arms.loc[("A", "chr1p"), "mean"] == pytest.approx(0.3)
+    assert arms.loc[("A", "chr1p"), "gained"] == pytest.approx(0.8)
+    assert arms["call"].tolist() == [1, -1, 0, 0, 0, 0]
+    assert aneuploidy_score(arms).to_dict() == {"A": 2, "B": 0}
+
+    chroms = summarize_copynumber(segments, level="chromosome", chunksize=1)
+    assert chroms.loc[("A", "chr1"), "lost"] == pytest.approx(2200 / 3000)
+    assert ("B", "chr2") not in chroms.index
+
+    path = Path(data_dir, "segments.parquet")
+    segments.to_parquet(path)
+    bands = summarize_copynumber(path, level="cytoband", chunksize=1)
+    pd.testing.assert_frame_equal(bands, summarize_copynumber(segments, level="cytoband"))
+    assert bands.loc[("A", "chr1q1"), "mean"] == -0.5
+
+class _Loader:
+    """Minimal loader for cache_on_disk."""
+    def __init__(self, path_cache):
+        self.path_cache = path_cache
+        self.read_cache = pd.read_parquet
+        self.write_cache = lambda data, cache: data.to_parquet(cache)
+        self.calls = 0
+
+    @cache_on_disk
+    def fetch(self):
+        self.calls += 1
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+def test_cache_on_disk_atomic(data_dir):
+    cache = Path(data_dir, "loader.parquet")
+    loader = _Loader(cache)
+    loader.fetch()
+    assert is_valid_cache(cache)
+    assert checksum_path(cache).exists()
+    assert not list(Path(data_dir).glob(".tmp.*"))
+    assert not cache.with_name(cache.name + ".lock").exists()
+
+    loader.fetch()
+    assert loader.calls == 1
+
+    # Truncated caches fail their checksum and are rebuilt
+    clear_memory_cache()
+    cache.write_bytes(cache.read_bytes()[:10])
+    with pytest.warns(UserWarning):
+        assert loader.fetch()["a"].tolist() == [1, 2, 3]
+    assert loader.calls == 2
+
+def test_is_valid_cache_does_not_rehash(data_dir, monkeypatch):
+    from casskit.io import utils
+
+    cache = Path(data_dir, "loader.parquet")
+    _Loader(cache).fetch()
+    monkeypatch.setattr(utils, "file_checksum", lambda path: "rehashed")
+    assert is_valid_cache(cache)
+    assert not is_valid_cache(cache, verify=True)
+
+def test_cache_lock_keeps_replaced_lock(data_dir, monkeypatch):
+    from casskit.io import utils
+
+    # The stale lock is released and re-taken between the check and its removal
+    lock = Path(data_dir, "loader.parquet.lock")
+    lock.write_text(f"{socket.gethostname()}:{2**22 + 1}")
+
+    def is_stale(owner, mtime, stale):
+        lock.unlink()
+        lock.write_text(f"{socket.gethostname()}:{os.getpid()}")
+        return True
+
+    monkeypatch.setattr(utils, "_is_stale_lock", is_stale)
+    assert not utils._break_stale_lock(lock, stale=60)
+    assert lock.read_text().endswith(f":{os.getpid()}")
+    assert not list(Path(data_dir).glob(".tmp.*"))
+
+def test_cache_lock_breaks_dead_owner(data_dir):
+    cache = Path(data_dir, "loader.parquet")
+    lock = cache.with_name(cache.name + ".lock")
+    lock.write_text(f"{socket.gethostname()}:{2**22 + 1}")
+    with pytest.warns(UserWarning):
+        with cache_lock(cache, poll=0.01):
+            assert lock.exists()
+    assert not lock.exists()
+
+def test_cache_keys_and_manifest(data_dir, capsys):
+    params = cache_params("https://example.org/a.tsv", minimal=False)
+    path = cache_key_path(Path(data_dir, "a.parquet"), params)
+    assert path != cache_key_path(Path(data_dir, "a.parquet"),
+                                  cache_params("https://example.org/a.tsv",
+                                               minimal=True))
+    assert path.suffix == ".parquet"
+
+    loader = _Loader(path)
+    loader.cache_params = params
+    loader.fetch()
+    manifest = read_manifests(data_dir)[path]
+    assert manifest["size"] == path.stat().st_size
+    assert manifest["params"]["minimal"] is False
+
+    assert cli.main(["cache", "--cache-dir", str(data_dir), "verify"]) == 0
+    path.write_bytes(b"corrupt")
+    assert cli.main(["cache", "--cache-dir", str(data_dir), "verify"]) == 1
+    cli.main(["cache", "--cache-dir", str(data_dir), "prune"])
+    assert not path.exists()
+    assert read_manifests(data_dir) == {}
+
+def test_cache_source_changed(data_dir, monkeypatch):
+    from casskit.io import utils
+
+    path = Path(data_dir, "latest.parquet")
+    loader = _Loader(path)
+    loader.cache_params = cache_params("https://example.org/LATEST.tsv")
+    loader.check_source = True
+    heads = []
+    monkeypatch.setattr(utils, "source_etag",
+                        lambda url: heads.append(url) or '"v1"')
+    loader.fetch()
+    clear_memory_cache()
+    loader.fetch()
+    assert loader.calls == 1
+
+    # One HEAD per load from disk, none from memory or without check_source
+    assert len(heads) == 2
+    loader.fetch()
+    loader.check_source = False
+    clear_memory_cache()
+    loader.fetch()
+    assert len(heads) == 2
+    loader.check_source = True
+    assert cli.main(["cache", "--cache-dir", str(data_dir), "verify"]) == 0
+
+    # A new release is fetched again, and reported as stale until it is
+    monkeypatch.setattr(utils, "source_etag", lambda url: '"v2"')
+    assert cli.main(["cache", "--cache-dir", str(data_dir), "verify"]) == 1
+    assert cli.main(["cache", "--cache-dir", str(data_dir), "verify", "--offline"]) == 0
+    clear_memory_cache()
+    with pytest.warns(UserWarning, match="Source has changed"):
+        loader.fetch()
+    assert loader.calls == 2
+    assert read_manifests(data_dir)[path]["etag"] == '"v2"'
+
+def test_cache_on_disk_memory(data_dir, monkeypatch):
+    from casskit.io import utils
+
+    events = []
+    monkeypatch.setattr(utils, "CACHE_CALLBACKS", [lambda path, event: events.append(event)])
+    cache = Path(data_dir, "loader.parquet")
+    loader = _Loader(cache)
+    data = loader.fetch()
+    hit = _Loader(cache).fetch()
+    pd.testing.assert_frame_equal(hit, data)
+
+    # Memory hits count as cache reads, for LRU/LFU eviction
+    assert events == ["write", "read"]
+
+    # Callers get copies; modifying one does not change what others get
+    hit.iloc[0, 0] = -1
+    hit["extra"] = 0
+    pd.testing.assert_frame_equal(_Loader(cache).fetch(), data)
+
+    # Evicted from the budget, but still served while referenced
+    memory = MemoryCache(max_bytes=0)
+    memory.put("key", data)
+    assert memory.nbytes == 0
+    assert memory.get("key") is data
+
+    clear_memory_cache()
+    reloaded = _Loader(cache).fetch()
+    assert reloaded is not data
+    pd.testing.assert_frame_equal(reloaded, data)
+
+def test_ensembl_gene_ids(data_dir, monkeypatch):
+    from casskit.io.annot import ensembl
+
+    genes = pd.DataFrame({"gene_id": ["ENSG2", "ENSG1", "ENSG3"],
+                          "gene_biotype": ["protein_coding", "protein_coding",
+                                           "lncRNA"]})
+
+    class GTF(ensembl.EnsemblData):
+        def __init__(self, *args):
+            pass
+
+        cached_subset = property(lambda self: pr.PyRanges(genes.assign(
+            Chromosome="1", Start=0, End=1)))
+
+    monkeypatch.setattr(ensembl, "EnsemblData", GTF)
+    ids = ensembl.EnsemblGeneIDs("GRCh37", ["protein_coding"], cache_dir=data_dir)
+    assert ids.data["gene_id"].tolist() == ["ENSG1", "ENSG2"]
+
+    # Cached per release and biotypes; the GTF is not touched on a hit
+    def no_gtf(*args):
+        raise AssertionError("GTF loaded")
+
+    monkeypatch.setattr(GTF, "__init__", no_gtf)
+    clear_memory_cache()
+    cached = ensembl.EnsemblGeneIDs("GRCh37", ("protein_coding", ), data_dir)
+    pd.testing.assert_frame_equal(cached.data, ids.data)
+    assert cached.cache_params["release"] == 75
+
+def test_fuzzy_match():
+    aliquots = ["TCGA-02-0001-01C-01D", "TCGA-02-0003-01A-01R",
+                "TCGA-02-0004-01A", np.nan, "TCGA-02-0001-01C-01D"]
+    donors = ["TCGA-02-0001", "TCGA-02-0001-01C", "TCGA-02-0003"]
+    with pytest.warns(UserWarning):
+        matched = fuzzy_match(aliquots, donors)
+
+    # Longest prefix wins
+    assert matched == {"TCGA-02-0001-01C-01D": "TCGA-02-0001-01C",
+                       "TCGA-02-0003-01A-01R": "TCGA-02-0003"}
+
+    # Either side may be the shorter ID
+    matched = match_barcodes(pd.Series(["TCGA-02-0003", "TCGA-02-0009"]),
+                             ["TCGA-02-0003-01A", "TCGA-02-0003-11A"])
+    assert matched.tolist()[0] == "TCGA-02-0003-01A"
+    assert pd.isna(matched.tolist()[1])
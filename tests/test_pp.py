@@ -0,0 +1,280 @@
+import numpy as np
+import pandas as pd
+import pytest
+from qtl import norm as qtl_norm
+from scipy import stats
+from sklearn.pipeline import Pipeline
+
+from casskit.io.segments import CommonRegionMatrix
+from casskit.pp.copynumber import DiploidGISTIC, ThinCopynumber
+from casskit.pp import expression
+from casskit.pp.expression import ExpressionThreshold, GTEx, RINT
+from casskit.pp.generics import VariationThreshold
+from casskit.pp.norm import calc_norm_factors
+from casskit.pp.units import UNITS, ToCounts, convert_units
+
+
+def test_drop_dups_corr():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=(2, 50))
+    X = pd.DataFrame({"a": a, "a_dup": a + 0.01, "b": b, "b_dup": -b,
+                      "a_far": a - 0.01})
+    X.iloc[0, 2] = np.nan
+
+    thin = ThinCopynumber(dups_tol_corr=0.9)
+    assert thin.drop_dups_corr(X, block_size=2).columns.tolist() == ["a", "b"]
+
+    # Only neighbours within the window are compared
+    thin.set_params(dups_corr_window=2)
+    assert thin.drop_dups_corr(X, block_size=2).columns.tolist() == ["a", "b", "a_far"]
+
+def test_thin():
+    rng = np.random.default_rng(0)
+    a, b, c = rng.normal(size=(3, 200))
+    X = pd.DataFrame(np.column_stack([a, a + 0.1 * b, a + 0.5 * b, b, b + 0.01 * c, c]))
+
+    thin = ThinCopynumber(drop_duplicates=False, thin_ar=0.5)
+    kept = thin.fit_transform(X).columns.tolist()
+    assert kept == [0, 3, 5]
+    assert thin.thin(X, block_size=1).columns.tolist() == kept
+
+    thin.set_params(thin_method="window", thin_corr=0.9)
+    assert thin.fit_transform(X).columns.tolist() == [1, 3, 5]
+
+def test_common_region_matrix():
+    rng = np.random.default_rng(0)
+    starts = np.sort(rng.choice(np.arange(2, 1000), size=(20, 5)), axis=1)
+    segments = pd.DataFrame({
+        "sample_id": np.repeat(np.arange(20), 6),
+        "Chromosome": "chr1",
+        "Start": np.column_stack([np.ones(20, int), starts]).ravel(),
+        "End": np.column_stack([starts - 1, np.full(20, 1000)]).ravel(),
+        "value": rng.normal(scale=0.3, size=120),
+    })
+    matrix = CommonRegionMatrix.from_segments(segments)
+    dense = pd.DataFrame(np.asarray(matrix))
+
+    # Thinned a block of regions at a time, never densified in full
+    to_numpy = CommonRegionMatrix.to_numpy
+    def block_to_numpy(self, dtype=np.float32, regions=None):
+        assert regions is not None and regions.stop - regions.start <= 256
+        return to_numpy(self, dtype, regions)
+
+    thin = ThinCopynumber(dups_tol_abs=1, dups_tol_corr=0.95)
+    expected = thin.fit_transform(dense).to_numpy()
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(CommonRegionMatrix, "to_numpy", block_to_numpy)
+        thinned = thin.fit_transform(matrix)
+        assert thin.drop_dups_abs(matrix, block_size=7).shape[1] \
+            == thin.drop_dups_abs(dense).shape[1] < matrix.shape[1]
+    np.testing.assert_array_equal(np.asarray(thinned), expected)
+
+    gistic = DiploidGISTIC()
+    np.testing.assert_array_equal(np.asarray(gistic.fit_transform(matrix)),
+                                  gistic.fit_transform(dense).to_numpy())
+
+    # Regions without a segment are diploid, as missing values are
+    gapped = CommonRegionMatrix.from_segments(segments.drop([2, 6, 17]))
+    assert np.isnan(np.asarray(gapped)).any()
+    np.testing.assert_array_equal(np.asarray(gistic.fit_transform(gapped)),
+                                  gistic.fit_transform(np.asarray(gapped)))
+
+def test_diploid_gistic():
+    X = pd.DataFrame(np.array([[-0.5, 0.1], [np.nan, 0.3]], dtype=np.float32))
+    expected = np.array([[-0.5, 0.], [0., 0.3]], dtype=np.float32)
+    gistic = DiploidGISTIC()
+
+    binned = gistic.fit_transform(X)
+    assert binned.dtypes.eq(np.float32).all()
+    np.testing.assert_array_equal(binned, expected)
+    assert np.isnan(X.iloc[1, 0])
+
+    out = np.empty(X.shape, dtype=np.float32)
+    assert np.shares_memory(gistic.transform(X, out=out).to_numpy(), out)
+
+    # Arrays are binned into a copy, or in place
+    values = X.to_numpy(copy=True)
+    binned = gistic.fit_transform(values)
+    assert binned is not values and np.isnan(values[1, 0])
+    np.testing.assert_array_equal(binned, expected)
+    gistic.transform(values, out=values)
+    np.testing.assert_array_equal(values, expected)
+
+    # Other backings
+
+    arrow = gistic.transform(X.astype("float32[pyarrow]"))
+    assert arrow.dtypes.eq("float32[pyarrow]").all()
+    np.testing.assert_array_equal(arrow.to_numpy(dtype=np.float32), expected)
+
+    sparse = gistic.transform(X.fillna(0).astype(pd.SparseDtype(np.float32, 0)))
+    np.testing.assert_array_equal(sparse.sparse.to_dense(), expected)
+
+def test_rint():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.poisson(3, size=(50, 7)).astype(float))
+    n_obs, k = X.shape[0], 3.0/8
+    expected = stats.norm.ppf((stats.rankdata(X, axis=0) - k) / (n_obs - 2*k + 1))
+
+    rint = RINT(block_size=2)
+    np.testing.assert_allclose(rint.fit_transform(X), expected)
+    rint.set_params(dtype=np.float32, n_jobs=-1)
+    assert rint.fit_transform(X).dtypes.eq(np.float32).all()
+
+    # Missing values are ranked out of the observed values in their column
+    X.iloc[:10, 0] = np.nan
+    rinted = RINT().fit_transform(X)
+    assert rinted.iloc[:10, 0].isna().all()
+    np.testing.assert_allclose(rinted.iloc[10:, 0],
+                               RINT().fit_transform(X.iloc[10:, [0]]).iloc[:, 0])
+    np.testing.assert_allclose(rinted.iloc[:, 1:], expected[:, 1:])
+
+def test_calc_norm_factors():
+    rng = np.random.default_rng(0)
+    counts = rng.negative_binomial(1, 0.1, size=(500, 30)) * (rng.random((500, 1)) < 0.9)
+    np.testing.assert_allclose(calc_norm_factors(counts, block_size=7),
+                               qtl_norm.edger_calcnormfactors(pd.DataFrame(counts)))
+
+    # Samples that differ only in depth need no scaling
+    scaled = counts[:, :1] * [1, 2, 5]
+    for method in ["TMM", "upperquartile", "RLE"]:
+        np.testing.assert_allclose(calc_norm_factors(scaled, method=method), 1)
+
+    # No genes shared with the reference: factor 1, as in edgeR
+    disjoint = np.zeros((10, 3))
+    disjoint[:5, 0], disjoint[5:, 1:] = 10, rng.integers(1, 10, size=(5, 2))
+    factors = calc_norm_factors(disjoint, ref=1)
+    assert np.isfinite(factors).all()
+    np.testing.assert_allclose(factors[0] / factors[1], 1)
+
+    lib_size = counts.sum(axis=0).astype(float)
+    expression.EdgeRCPM.edger_cpm(pd.DataFrame(counts), lib_size)
+    np.testing.assert_array_equal(lib_size, counts.sum(axis=0))
+
+def simulate_expression(monkeypatch, n_genes=300, n_samples=40):
+    """log2(count+1) expression, genes by samples, with Ensembl mocked."""
+    rng = np.random.default_rng(0)
+    genes = [f"ENSG{i:05d}" for i in range(n_genes)]
+    counts = (rng.negative_binomial(2, 0.02, size=(n_genes, n_samples))
+              * rng.random((n_genes, 1)) // 1)
+    counts[:5] = 0
+    protein_coding = pd.Index(genes)[rng.random(n_genes) < 0.8]
+    monkeypatch.setattr(expression, "get_ensembl_gene_ids",
+                        lambda assembly, biotypes: protein_coding)
+
+    return pd.DataFrame(np.log2(counts + 1), index=genes,
+                        columns=[f"s{j}" for j in range(n_samples)])
+
+def test_protein_coding(monkeypatch):
+    monkeypatch.setattr(expression, "get_ensembl_gene_ids",
+                        lambda assembly, biotypes: pd.Index(["ENSG2", "ENSG3", "ENSG5"]))
+    X = pd.DataFrame(np.arange(12.).reshape(2, 6),
+                     columns=["ENSG5.1", "ENSG1", "ENSG2", "ENSG3", "ENSG4", "ENSG6"])
+
+    protein_coding = expression.ProteinCoding()
+    assert protein_coding.fit_transform(X).columns.tolist() == ["ENSG5.1", "ENSG2", "ENSG3"]
+    assert protein_coding.get_support().tolist() == [True, False, True, True, False, False]
+
+    # Contiguous genes are a view; other columns leave the fit unchanged
+    values = X.to_numpy()
+    kept = protein_coding.transform(X.iloc[:, 1:])
+    assert kept.columns.tolist() == ["ENSG2", "ENSG3"]
+    assert np.shares_memory(kept.to_numpy(), values)
+    assert protein_coding.get_support().tolist() == [True, False, True, True, False, False]
+
+def test_gtex(monkeypatch):
+    X = simulate_expression(monkeypatch).T
+    pipeline = Pipeline([
+        ("As counts", ToCounts(units="log2(count+1)")),
+        ("TMM", expression.EdgeRCPM()),
+        ("Protein coding", expression.ProteinCoding()),
+        ("Filter low expression", expression.CountThreshold(1, 0.3)),
+        ("Filter low variance", VariationThreshold(0.5)),
+        ("RINT", RINT()),
+    ])
+    expected = pipeline.fit_transform(X)
+
+    gtex = GTEx(cv2_min=0.5)
+    transformed = gtex.fit_transform(X)
+    assert sorted(transformed.columns) == sorted(expected.columns)
+    np.testing.assert_allclose(transformed[expected.columns], expected)
+
+    # Fitted samples transform as they were fitted, with their library sizes
+    pd.testing.assert_frame_equal(gtex.transform(X), transformed)
+    assert gtex.transform(X.iloc[:10, ::-1]).columns.equals(gtex.genes_)
+    lib_size = ToCounts(units="log2(count+1)").transform(X).sum(axis=1) * 1.5
+    gtex.set_params(lib_size=lib_size.to_numpy())
+    pd.testing.assert_frame_equal(gtex.fit(X).transform(X), gtex.fit_transform(X))
+    gtex.set_params(rint=False)
+    pd.testing.assert_frame_equal(gtex.transform(X.iloc[5:]),
+                                  gtex.fit_transform(X).iloc[5:])
+
+    # Batches of samples share the first batch's TMM reference
+    batched = GTEx(cv2_min=0.5).partial_fit(X.iloc[:20]).partial_fit(X.iloc[20:])
+    assert batched.n_samples_seen_ == 40
+    np.testing.assert_array_equal(batched.ref_counts_,
+                                  GTEx().fit(X.iloc[:20]).ref_counts_)
+    counts = ToCounts(units="log2(count+1)").transform(X)
+    cpm = counts / (batched.lib_size_ * batched.tmm_)[:, None] * 1e6
+    np.testing.assert_allclose(batched.cpm_mean_, cpm.mean())
+    np.testing.assert_allclose(batched.cpm_m2_, cpm.var(ddof=0) * 40)
+
+    # Same gene filter as ExpressionThreshold, on protein-coding genes
+    threshold = ExpressionThreshold(cv2_min=0.5, dtype=np.float64).fit(cpm)
+    np.testing.assert_array_equal(
+        batched.support_,
+        np.flatnonzero(threshold.get_support() & batched.protein_coding_)
+    )
+
+def test_gtex_parquet(tmp_path, monkeypatch):
+    # Xena layout, genes by samples
+    raw = simulate_expression(monkeypatch).rename(index=lambda gene: f"{gene}.1")
+    raw = raw.rename_axis("Ensembl_ID").reset_index()
+    raw.to_parquet(tmp_path / "counts.parquet")
+
+    gtex = GTEx(cv2_min=0.5)
+    gtex.fit_transform_parquet(tmp_path / "counts.parquet", tmp_path / "gtex.parquet",
+                               batch_size=64, sample_block_size=7)
+    streamed = pd.read_parquet(tmp_path / "gtex.parquet").set_index("Ensembl_ID").T
+    streamed.columns = streamed.columns.str.split(".").str[0]
+
+    X = raw.set_index("Ensembl_ID").T
+    X.columns = X.columns.str.split(".").str[0]
+    in_memory = GTEx(cv2_min=0.5).fit_transform(X)
+    assert sorted(streamed.columns) == sorted(in_memory.columns)
+    np.testing.assert_allclose(streamed[in_memory.columns], in_memory)
+
+def test_expression_threshold():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.lognormal(sigma=rng.random(50), size=(30, 50)),
+                     columns=[f"g{j}" for j in range(50)])
+    X[X < 0.5] = 0
+    expected = VariationThreshold(0.8).fit_transform(
+        expression.CountThreshold(1, 0.3).fit_transform(X)
+    )
+
+    threshold = ExpressionThreshold(1, 0.3, 0.8, block_size=8, dtype=np.float64)
+    pd.testing.assert_frame_equal(threshold.fit_transform(X), expected)
+    assert threshold.get_feature_names_out().tolist() == expected.columns.tolist()
+    assert threshold.get_support().sum() == expected.shape[1]
+
+def test_to_counts():
+    counts = np.arange(0, 700, 7.).reshape(-1, 4)
+    X = pd.DataFrame(np.log2(counts + 1))
+
+    to_counts = ToCounts(units="log2(count+1)", block_size=8)
+    np.testing.assert_array_equal(to_counts.fit_transform(X), counts)
+    assert to_counts.transform(X).dtypes.eq(np.int64).all()
+    np.testing.assert_allclose(to_counts.inverse_transform(counts), X)
+
+    # In place, and to narrower or unsigned types
+    values = X.to_numpy(copy=True)
+    assert to_counts.transform(values, out=values) is values
+    np.testing.assert_allclose(values, counts)
+    with pytest.raises(TypeError, match="NumPy array"):
+        to_counts.transform(X, out=X)
+    to_counts.set_params(dtype=np.uint32)
+    assert to_counts.transform(np.array([[40., -1., np.nan]])).tolist() == [[2**32 - 1, 0, 0]]
+
+    for units in UNITS:
+        there = convert_units(counts + 1, "counts", units, dtype=np.float32)
+        np.testing.assert_allclose(convert_units(there, units, "abs"), counts + 1, rtol=1e-5)